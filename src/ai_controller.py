@@ -3,6 +3,7 @@ import json
 import pyautogui
 from pynput.mouse import Button, Controller as MouseController
 from pynput.keyboard import Controller as KeyboardController
+from src.text_entry import type_text
 
 try:
     from google import genai
@@ -16,6 +17,7 @@ class AIController:
         self.stop_event = stop_event
         self.mouse = MouseController()
         self.keyboard = KeyboardController()
+        self.typing_mode = 'batched' # see src.text_entry; the agent waits for a new screenshot anyway
         
         self.system_prompt = """You are an autonomous AI Agent controlling a user's computer to achieve a specific GOAL.
 You will be provided with a screenshot of the current screen and the user's GOAL.
@@ -109,7 +111,8 @@ IMPORTANT RULES:
                     self.mouse.click(btn, 1)
                 elif action == "TYPE":
                     text_to_type = action_data.get("text", "")
-                    pyautogui.write(text_to_type, interval=0.05)
+                    type_text(text_to_type, self.typing_mode, keyboard=self.keyboard,
+                              gui=pyautogui, stop_event=self.stop_event)
                 elif action == "PRESS":
                     key = action_data.get("key", "")
                     if key.lower() in ['win', 'windows']:
@@ -0,0 +1,236 @@
+"""
+Batch runner: runs a queue of workflow jobs on a pool of worker processes,
+each bound to its own virtual X display, so N app instances are driven in
+parallel on one Linux box.
+
+Jobs file (JSON list); a job with a list of params expands into one job
+per entry:
+
+    [
+      {"workflow": "login.json", "params": {"user": "alice"}},
+      {"workflow": "login.json", "params": [{"user": "bob"}, {"user": "carol"}]}
+    ]
+
+"{user}" in any string step param is replaced by the job's value.
+
+    python -m src.batch jobs.json --workers 4 --results results.json
+
+Workers are started with the 'spawn' method and set DISPLAY before anything
+imports pyautogui, which binds to the display at import time.
+"""
+import argparse
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_BASE_DISPLAY = 99
+DEFAULT_SCREEN = '1280x1024x24'
+XVFB_START_TIMEOUT = 5.0
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+
+def apply_params(steps, params):
+    """Copy of `steps` with {name} placeholders in string values replaced; unknown names are kept."""
+    if not params: return steps
+
+    def sub(value):
+        if isinstance(value, str):
+            return _PLACEHOLDER.sub(lambda m: str(params[m.group(1)]) if m.group(1) in params else m.group(0), value)
+        if isinstance(value, list):
+            return [sub(v) for v in value]
+        if isinstance(value, dict):
+            return {k: sub(v) for k, v in value.items()}
+        return value
+
+    return sub(steps)
+
+
+def expand_jobs(jobs, base_dir='.'):
+    """Normalizes job dicts: one params dict per job, workflow paths resolved against base_dir, names filled in."""
+    out = []
+    for job in jobs:
+        params_list = job.get('params') or {}
+        if isinstance(params_list, dict):
+            params_list = [params_list]
+        for params in params_list:
+            workflow = os.path.join(base_dir, job['workflow'])
+            name = job.get('name') or os.path.splitext(os.path.basename(workflow))[0]
+            if len(params_list) > 1 or params:
+                name += " " + ",".join(f"{k}={v}" for k, v in params.items())
+            out.append({'name': name, 'workflow': workflow, 'params': params, 'settle': job.get('settle', 'auto')})
+    return out
+
+
+def free_displays(count, base=DEFAULT_BASE_DISPLAY):
+    """`count` display numbers from `base` up with no X server lock file."""
+    displays = []
+    n = base
+    while len(displays) < count:
+        if not os.path.exists(f"/tmp/.X{n}-lock"):
+            displays.append(n)
+        n += 1
+    return displays
+
+
+def start_xvfb(display, screen=DEFAULT_SCREEN):
+    """Starts Xvfb on :display and waits for its socket; returns the Popen."""
+    xvfb = shutil.which('Xvfb')
+    if not xvfb:
+        raise RuntimeError("Xvfb not found; install it or run with --no-xvfb")
+    proc = subprocess.Popen([xvfb, f":{display}", '-screen', '0', screen, '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket = f"/tmp/.X11-unix/X{display}"
+    deadline = time.monotonic() + XVFB_START_TIMEOUT
+    while not os.path.exists(socket):
+        if proc.poll() is not None:
+            raise RuntimeError(f"Xvfb :{display} exited with status {proc.returncode}")
+        if time.monotonic() > deadline:
+            proc.terminate()
+            raise RuntimeError(f"Xvfb :{display} did not start within {XVFB_START_TIMEOUT}s")
+        time.sleep(0.05)
+    return proc
+
+
+# --- worker process ---
+_worker = {}
+
+
+def _init_worker(display_queue, xvfb, screen):
+    """Pool initializer: claims a display (starting Xvfb on it) before any job imports pyautogui."""
+    if xvfb:
+        display = display_queue.get()
+        proc = start_xvfb(display, screen)
+        # Runs at normal interpreter exit; spawn workers exit through sys.exit
+        multiprocessing.util.Finalize(None, proc.terminate, exitpriority=10)
+        os.environ['DISPLAY'] = f":{display}"
+        _worker['xvfb'] = proc
+    _worker['display'] = os.environ.get('DISPLAY', '')
+
+
+def run_job(job):
+    """Runs one job in the current process; returns a result dict (never raises)."""
+    from src.workflow_compiler import WorkflowCompileError
+    from src.workflow_runner import WorkflowRunner
+
+    result = {
+        'name': job['name'], 'workflow': job['workflow'], 'params': job['params'],
+        'pid': os.getpid(), 'display': _worker.get('display', os.environ.get('DISPLAY', '')),
+        'ok': False, 'error': None, 'started': time.time(),
+    }
+    started = time.perf_counter()
+    try:
+        with open(job['workflow'], 'r') as f:
+            steps = apply_params(json.load(f), job['params'])
+        runner = WorkflowRunner(threading.Event())
+        runner.settle = job.get('settle', 'auto')
+        runner.set_steps(steps)
+        runner.compile()
+        runner.run()
+        result['stats'] = runner.stats
+        result['step_errors'] = runner.errors
+        result['step_ms'] = {i: t['total'] * 1000.0 for i, t in runner.profiler.step_totals().items()}
+        result['ok'] = not runner.errors
+        if runner.errors:
+            result['error'] = "; ".join(f"step {i + 1}: {msg}" for i, msg in runner.errors)
+    except (OSError, ValueError, WorkflowCompileError) as e:
+        result['error'] = str(e)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['elapsed'] = time.perf_counter() - started
+    return result
+
+
+# --- parent process ---
+def run_batch(jobs, workers=None, xvfb=True, base_display=DEFAULT_BASE_DISPLAY,
+              screen=DEFAULT_SCREEN, on_result=None):
+    """
+    Runs expanded jobs on `workers` processes (default: CPU count). Returns
+    (results in job order, summary dict). on_result(result) is called in
+    the parent as each job finishes.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    ctx = multiprocessing.get_context('spawn')
+    display_queue = ctx.Queue()
+    if xvfb:
+        for n in free_displays(workers, base_display):
+            display_queue.put(n)
+
+    results = [None] * len(jobs)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(display_queue, xvfb, screen)) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # worker died (e.g. Xvfb failed to start)
+                result = {'name': jobs[i]['name'], 'workflow': jobs[i]['workflow'], 'params': jobs[i]['params'],
+                          'ok': False, 'error': f"{type(e).__name__}: {e}", 'elapsed': 0.0}
+            results[i] = result
+            if on_result: on_result(result)
+    wall = time.perf_counter() - started
+    return results, summarize(results, wall, workers)
+
+
+def summarize(results, wall, workers):
+    busy = sum(r.get('elapsed', 0.0) for r in results)
+    return {
+        'jobs': len(results),
+        'ok': sum(1 for r in results if r.get('ok')),
+        'failed': sum(1 for r in results if not r.get('ok')),
+        'workers': workers,
+        'wall': wall,
+        'job_seconds': busy,
+        'throughput': len(results) / wall if wall > 0 else 0.0,
+        'speedup': busy / wall if wall > 0 else 0.0,  # ideal: `workers`
+    }
+
+
+def format_result(r):
+    status = "ok" if r.get('ok') else f"FAILED ({r.get('error')})"
+    where = f" on {r['display']}" if r.get('display') else ""
+    return f"{r['name']}: {status} in {r.get('elapsed', 0.0):.2f}s{where}"
+
+
+def format_summary(s):
+    return (f"{s['ok']}/{s['jobs']} jobs ok in {s['wall']:.2f}s on {s['workers']} workers; "
+            f"{s['throughput']:.2f} jobs/s, speedup {s['speedup']:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Run workflow jobs in parallel on virtual displays.")
+    parser.add_argument('jobs', help="jobs JSON file")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--no-xvfb', dest='xvfb', action='store_false', help="use the current DISPLAY for every worker")
+    parser.add_argument('--display-base', type=int, default=DEFAULT_BASE_DISPLAY)
+    parser.add_argument('--screen', default=DEFAULT_SCREEN, help="Xvfb screen WxHxDEPTH")
+    parser.add_argument('--results', help="write per-job results and the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.jobs, 'r') as f:
+            jobs = expand_jobs(json.load(f), os.path.dirname(os.path.abspath(args.jobs)))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load {args.jobs}: {e}", file=sys.stderr)
+        return 1
+    results, summary = run_batch(jobs, args.workers, args.xvfb, args.display_base, args.screen,
+                                 on_result=lambda r: print(format_result(r)))
+    print(format_summary(summary))
+    if args.results:
+        with open(args.results, 'w') as f:
+            json.dump({'summary': summary, 'results': results}, f, indent=2)
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
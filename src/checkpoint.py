@@ -0,0 +1,100 @@
+"""
+Checkpoints for resuming long workflow runs.
+
+While a workflow runs, WorkflowRunner saves its position between steps: the
+next step index, the running loops' counters and the image location cache.
+A run that was stopped (F6) or crashed can then resume from the last
+checkpoint instead of step 1. One file per workflow, named after a hash of
+its steps, so an edited workflow never resumes into the wrong step:
+
+    <user data dir>/checkpoints/<workflow key>.json
+
+Every write goes to a temporary file that is fsynced and then renamed over
+the old checkpoint, so a crash mid-write leaves the previous checkpoint
+intact. Writes happen at most every `interval` seconds and are spaced
+further apart if a write takes more than `max_overhead` of the time
+between them, which bounds the cost on long runs with many short steps.
+"""
+import hashlib
+import json
+import os
+import time
+
+VERSION = 1
+DEFAULT_INTERVAL = 10.0  # seconds between periodic checkpoints
+MAX_OVERHEAD = 0.01      # fraction of run time checkpoint writes may take
+
+
+def workflow_key(steps):
+    """Stable id of a workflow's content."""
+    data = json.dumps(steps, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def checkpoint_path(directory, steps):
+    return os.path.join(directory, workflow_key(steps) + '.json')
+
+
+def write_atomic(path, data):
+    """Writes bytes to `path` via a fsynced temporary file and a rename."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+
+def load_checkpoint(path, steps=None):
+    """The saved state, or None if there is none, it is unreadable, or it belongs to other steps."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != VERSION:
+        return None
+    if steps is not None and state.get('workflow') != workflow_key(steps):
+        return None
+    return state
+
+
+class CheckpointWriter:
+    def __init__(self, path, interval=DEFAULT_INTERVAL, max_overhead=MAX_OVERHEAD, clock=time.perf_counter):
+        self.path = path
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.clock = clock
+        self.writes = 0
+        self.seconds = 0.0     # total time spent writing
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.next_due = clock() + interval
+
+    def due(self):
+        return self.clock() >= self.next_due
+
+    def save(self, state):
+        start = self.clock()
+        data = json.dumps(state, separators=(',', ':')).encode('utf-8')
+        write_atomic(self.path, data)
+        end = self.clock()
+        cost = end - start
+        self.writes += 1
+        self.seconds += cost
+        self.max_seconds = max(self.max_seconds, cost)
+        self.bytes = len(data)
+        self.next_due = end + max(self.interval, cost / self.max_overhead)
+
+    def clear(self):
+        """Removes the checkpoint once the workflow has run to the end."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
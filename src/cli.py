@@ -0,0 +1,194 @@
+"""
+Headless command-line runner; imports no Qt and only the modules the
+workflow or macro actually needs, so it starts fast enough for cron and CI
+(e.g. under xvfb-run).
+
+    python -m src.cli run workflow.json [--repeat N] [--settle stable] [--report] [--trace t.json] [--resume]
+    python -m src.cli play macro.acm [--repeat N] [--speed 2] [--start 1.5] [--end 9] [--report]
+
+Ctrl+C stops the current run. A stopped or crashed workflow run continues
+where it left off with --resume. Exit status: 0 done, 1 invalid input, 130 stopped.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import sys
+import threading
+import time
+from src.profiler import cache_hit_rate, typing_rate
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_STOPPED = 130
+
+
+def _install_stop_handler(stop_event):
+    """Ctrl+C sets the stop event instead of raising, so held input is released cleanly."""
+    try:
+        signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    except ValueError:
+        pass  # not the main thread
+
+
+def format_step_report(program, totals):
+    lines = []
+    for step in program:
+        t = totals.get(step.index)
+        if t is None: continue
+        phases = ", ".join(f"{k} {t[k] * 1000.0 / t['runs']:.1f}" for k in ('capture', 'match', 'inject', 'ai', 'settle') if k in t)
+        rate = cache_hit_rate(t)
+        if rate is not None:
+            phases += f"{', ' if phases else ''}cache hits {rate:.0%}"
+        cps = typing_rate(t)
+        if cps is not None:
+            phases += f"{', ' if phases else ''}{cps:.0f} chars/s"
+        lines.append(f"  {step.index + 1:>4}. {step.action:<12} x{t['runs']:<5} avg {t['mean'] * 1000.0:9.1f} ms"
+                     + (f"  ({phases})" if phases else ""))
+    return "\n".join(lines)
+
+
+def format_repeat_summary(durations):
+    if len(durations) < 2: return ""
+    return (f"{len(durations)} runs: mean {statistics.fmean(durations):.2f}s, "
+            f"min {min(durations):.2f}s, max {max(durations):.2f}s")
+
+
+def run_workflow(args, stop_event):
+    from src.workflow_compiler import WorkflowCompileError
+    from src.workflow_runner import WorkflowRunner
+
+    try:
+        with open(args.workflow, 'r') as f:
+            steps = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {args.workflow}: {e}", file=sys.stderr)
+        return EXIT_INVALID
+
+    runner = WorkflowRunner(stop_event)
+    runner.api_key = args.api_key or os.environ.get('GEMINI_API_KEY')
+    runner.settle = args.settle
+    runner.settle_time = args.settle_ms / 1000.0 if args.settle_ms is not None else None
+    if args.checkpoint:
+        from src.paths import user_data_dir
+        runner.checkpoint_dir = user_data_dir('checkpoints')
+    runner.set_steps(steps)
+    try:
+        program = runner.compile()
+    except WorkflowCompileError as e:
+        print(f"Workflow not started:\n{e}", file=sys.stderr)
+        return EXIT_INVALID
+
+    durations = []
+    for i in range(args.repeat):
+        if stop_event.is_set(): break
+        if args.repeat > 1:
+            print(f"Run {i + 1}/{args.repeat}")
+        runner.run(resume=args.resume and i == 0)
+        durations.append(runner.stats.get('elapsed', 0.0))
+        if args.report:
+            print(format_step_report(program, runner.profiler.step_totals()))
+    if args.trace:
+        runner.profiler.export_chrome_trace(args.trace, os.path.basename(args.workflow))
+        print(f"Timeline written to {args.trace}")
+    summary = format_repeat_summary(durations)
+    if summary: print(summary)
+    return EXIT_STOPPED if stop_event.is_set() else EXIT_OK
+
+
+def play_macro(args, stop_event):
+    from src import macro_file
+    from src.player import MacroPlayer, compile_plan, format_lateness_report
+
+    # A .acm file is played while it is decoded, unless paths are smoothed
+    # over the whole macro first
+    stream = not args.smooth and not args.macro.lower().endswith('.json')
+    reader = plan = None
+    try:
+        if stream:
+            reader = macro_file.MacroReader(args.macro)
+        elif args.macro.lower().endswith('.json'):
+            events = macro_file.import_json(args.macro)
+        else:
+            events = macro_file.load_macro(args.macro)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {args.macro}: {e}", file=sys.stderr)
+        return EXIT_INVALID
+    if not stream:
+        if args.smooth:
+            from src.path_engine import smooth_paths
+            events = smooth_paths(events, mode=args.smooth)
+        plan = compile_plan(events)
+
+    player = MacroPlayer(stop_event)
+    durations = []
+    try:
+        for i in range(args.repeat):
+            if stop_event.is_set(): break
+            if plan is None:
+                stats = player.play_chunks(reader.iter_chunks(), args.speed, start=args.start, end=args.end)
+                plan = player.plan  # replays reuse it once every chunk has been compiled
+            else:
+                stats = player.play(plan, args.speed, start=args.start, end=args.end)
+            durations.append(stats['elapsed'])
+            if args.report:
+                prefix = f"Run {i + 1}/{args.repeat}: " if args.repeat > 1 else ""
+                print(prefix + format_lateness_report(stats))
+    except ValueError as e:  # a corrupt chunk further into the file
+        print(f"Could not play {args.macro}: {e}", file=sys.stderr)
+        return EXIT_INVALID
+    finally:
+        if reader: reader.close()
+    summary = format_repeat_summary(durations)
+    if summary: print(summary)
+    return EXIT_STOPPED if stop_event.is_set() else EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Run workflows and play macros without the GUI.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="run a workflow JSON file")
+    run.add_argument('workflow')
+    run.add_argument('--repeat', type=int, default=1, help="run the workflow this many times")
+    run.add_argument('--settle', choices=('auto', 'none', 'fixed', 'stable'), default='auto',
+                     help="pause policy between steps (steps can override it)")
+    run.add_argument('--settle-ms', type=float, help="fixed pause, or the longest wait for a stable screen")
+    run.add_argument('--api-key', help="Gemini key for AI Action steps (default: $GEMINI_API_KEY)")
+    run.add_argument('--report', action='store_true', help="print per-step timings after each run")
+    run.add_argument('--trace', help="write the last run's timeline as Chrome trace JSON")
+    run.add_argument('--resume', action='store_true', help="continue from the checkpoint of a stopped or crashed run")
+    run.add_argument('--no-checkpoint', dest='checkpoint', action='store_false',
+                     help="don't save checkpoints while running")
+
+    play = sub.add_parser('play', help="play a recorded macro (.acm or .json)")
+    play.add_argument('macro')
+    play.add_argument('--repeat', type=int, default=1, help="play the macro this many times")
+    play.add_argument('--speed', type=float, default=1.0)
+    play.add_argument('--start', type=float, default=0.0, help="seconds into the macro to start at")
+    play.add_argument('--end', type=float, help="seconds into the macro to stop at")
+    play.add_argument('--smooth', choices=('straight', 'curve', 'resample'), help="replace recorded mouse paths")
+    play.add_argument('--report', action='store_true', help="print a timing report after each play")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.repeat < 1:
+        print("--repeat must be at least 1", file=sys.stderr)
+        return EXIT_INVALID
+    stop_event = threading.Event()
+    _install_stop_handler(stop_event)
+    started = time.perf_counter()
+    if args.command == 'run':
+        code = run_workflow(args, stop_event)
+    else:
+        code = play_macro(args, stop_event)
+    if args.repeat > 1 or getattr(args, 'report', False):
+        print(f"Total {time.perf_counter() - started:.2f}s")
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,104 @@
 import time
+import math
+import random
 import threading
+from array import array
 from pynput.mouse import Button, Controller as MouseController
 from pynput.keyboard import Key, Controller as KeyboardController
 
+from src.timing import wait_until
+
+
+def _grid_points(spec):
+    x0, y0 = spec.get('origin', (0, 0))
+    dx, dy = spec.get('spacing', (10, 10))
+    cols, rows = int(spec.get('cols', 1)), int(spec.get('rows', 1))
+    return [[(x0 + c * dx, y0 + r * dy) for c in range(cols)] for r in range(rows)]
+
+
+def _path_points(points, step):
+    """Resamples a polyline so consecutive points are `step` pixels apart."""
+    if len(points) < 2 or step <= 0: return list(points)
+    out = [tuple(points[0])]
+    carry = 0.0
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        seg = math.hypot(bx - ax, by - ay)
+        d = step - carry
+        while d <= seg:
+            t = d / seg
+            out.append((ax + (bx - ax) * t, ay + (by - ay) * t))
+            d += step
+        carry = seg - (d - step)
+    if out[-1] != tuple(points[-1]):
+        out.append(tuple(points[-1]))
+    return out
+
+
+def parse_points(text):
+    """'100,200; 300,400' (';' or newline separated) -> [[100, 200], [300, 400]]."""
+    points = []
+    for part in text.replace('\n', ';').split(';'):
+        if not part.strip(): continue
+        try:
+            x, y = (int(v) for v in part.split(','))
+        except ValueError:
+            raise ValueError(f"points must be 'x,y; x,y; ...', got {part.strip()!r}") from None
+        points.append([x, y])
+    return points
+
+
+def compile_pattern(spec, order='sequential'):
+    """
+    Flattens a point pattern into a compact array('i') of x0, y0, x1, y1, ...
+
+    spec dict:
+    - kind (str): 'list', 'grid' or 'path'
+    - points (list of [x, y]): for 'list' and 'path'
+    - origin, spacing ([x, y]), cols, rows (int): for 'grid'
+    - step (float): pixel spacing along a 'path'
+    order (str): 'sequential', 'snake' (alternate grid rows / ping-pong) or
+    'random' (shuffled once here; run_pattern reshuffles each pass)
+    """
+    kind = spec.get('kind', 'list')
+    if kind == 'grid':
+        rows = _grid_points(spec)
+        if order == 'snake':
+            rows = [row if i % 2 == 0 else row[::-1] for i, row in enumerate(rows)]
+        points = [p for row in rows for p in row]
+    else:
+        points = [tuple(p) for p in spec.get('points', [])]
+        if kind == 'path':
+            points = _path_points(points, float(spec.get('step', 0)))
+        if order == 'snake' and len(points) > 2:
+            points = points + points[-2:0:-1]
+
+    if order == 'random':
+        random.shuffle(points)
+
+    flat = array('i')
+    for x, y in points:
+        flat.append(int(round(x)))
+        flat.append(int(round(y)))
+    return flat
+
+
 class Clicker:
     def __init__(self, stop_event):
         self.stop_event = stop_event
         self.mouse = MouseController()
         self.keyboard = KeyboardController()
+        self.hold_stats = None
         
     def resolve_key(self, key_str):
         if len(key_str) == 1: return key_str
         try: return getattr(Key, key_str.replace('Key.', ''))
         except: return None
 
+    def resolve_keys(self, combo_str):
+        """Resolves 'w+a' style combos; returns [] if any part is unknown."""
+        keys = [self.resolve_key(k.strip()) for k in combo_str.split('+') if k.strip()]
+        return keys if all(keys) else []
+
     def run(self, config):
         """
         config dict:
@@ -23,8 +108,14 @@ class Clicker:
         - click_type (str): 'single', 'double'
         - key (str): key to press
         - key_mode (str): 'press', 'hold'
-        - hold_dur (int): ms
+        - hold_dur (int): ms, 0 = hold until stopped
+        - hold_delay (int): ms before the first typematic repeat
+        - hold_rate (float): typematic repeats per second
+        - pattern (dict): optional, see compile_pattern; enables run_pattern
         """
+        if config.get('pattern'):
+            return self.run_pattern(config)
+
         interval = config.get('interval', 1.0)
         
         while not self.stop_event.is_set():
@@ -38,14 +129,14 @@ class Clicker:
                 
             elif act == "key":
                 k_val = config.get('key')
-                if k_val:
+                if k_val and config.get('key_mode') == 'hold':
+                    keys = self.resolve_keys(k_val)
+                    if keys:
+                        self.run_hold(keys, config)
+                elif k_val:
                     key = self.resolve_key(k_val)
                     if key:
                         self.keyboard.press(key)
-                        if config.get('key_mode') == 'hold':
-                            while not self.stop_event.is_set():
-                                self.keyboard.press(key)
-                                time.sleep(0.03) # 30ms typematic repeat rate
                         self.keyboard.release(key)
 
             # Smart Sleep
@@ -53,3 +144,87 @@ class Clicker:
             while time.time() < end:
                 if self.stop_event.is_set(): return
                 time.sleep(0.01)
+
+    def run_pattern(self, config):
+        """
+        Cycles the cursor through a compiled point pattern, clicking at each point.
+
+        Extra config keys:
+        - pattern (dict), order (str): see compile_pattern
+        - dwell (float): ms spent per point; 0 clicks back-to-back
+        - passes (int): number of times to walk the pattern, 0 = until stopped
+        """
+        order = config.get('order', 'sequential')
+        points = compile_pattern(config['pattern'], order)
+        n = len(points) // 2
+        if not n: return
+
+        btn = getattr(Button, config.get('mouse_btn', 'left'))
+        count = 2 if config.get('click_type') == 'double' else 1
+        dwell = config.get('dwell', 0) / 1000.0
+        passes = int(config.get('passes', 0))
+        stop = self.stop_event
+        mouse = self.mouse
+
+        idx = array('I', range(n))
+        done = 0
+        deadline = time.perf_counter()
+        while not stop.is_set():
+            for i in idx:
+                if stop.is_set(): return
+                mouse.position = (points[2 * i], points[2 * i + 1])
+                mouse.click(btn, count)
+                if dwell:
+                    deadline += dwell
+                    if not wait_until(deadline, stop): return
+            done += 1
+            if passes and done >= passes: return
+            if order == 'random':
+                random.shuffle(idx)
+
+    def run_hold(self, keys, config):
+        """
+        Holds every key in `keys` at once and re-presses them like OS typematic
+        repeat: first repeat after hold_delay, then every 1 / hold_rate seconds,
+        all on absolute deadlines. Releases after hold_dur ms (0 = until stopped)
+        and stores the achieved repeat rate in self.hold_stats.
+        """
+        delay = config.get('hold_delay', 0) / 1000.0
+        rate = float(config.get('hold_rate', 1000 / 30))
+        period = 1.0 / rate if rate > 0 else 0.0
+        hold_dur = config.get('hold_dur', 0) / 1000.0
+        stop = self.stop_event
+        kb = self.keyboard
+
+        start = time.perf_counter()
+        end = start + hold_dur if hold_dur > 0 else None
+        repeat_times = []
+        try:
+            for k in keys:
+                kb.press(k)
+            deadline = start + delay
+            while period:
+                if end is not None and deadline >= end:
+                    wait_until(end, stop)
+                    break
+                if not wait_until(deadline, stop): break
+                for k in keys:
+                    kb.press(k)
+                repeat_times.append(time.perf_counter())
+                deadline += period
+            if not period:
+                wait_until(end if end is not None else float('inf'), stop)
+        finally:
+            for k in reversed(keys):
+                kb.release(k)
+
+        achieved = 0.0
+        if len(repeat_times) > 1:
+            achieved = (len(repeat_times) - 1) / (repeat_times[-1] - repeat_times[0])
+        self.hold_stats = {
+            'repeats': len(repeat_times),
+            'target_rate': rate,
+            'achieved_rate': achieved,
+            'held_for': time.perf_counter() - start,
+        }
+        return self.hold_stats
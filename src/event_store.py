@@ -0,0 +1,233 @@
+from array import array
+from collections.abc import Sequence
+
+# Rows per chunk. Chunks are only ever appended to, so every chunk except the
+# last is full and row i lives at chunks[i // CHUNK_SIZE][i % CHUNK_SIZE].
+CHUNK_SIZE = 4096
+
+# Flag bits recording which optional fields a row carries
+F_XY = 0x01
+F_BUTTON = 0x02
+F_PRESSED = 0x04
+F_PRESSED_TRUE = 0x08
+F_SCROLL = 0x10
+F_KEY = 0x20
+
+_COLUMNS = (
+    ('time', 'd'),
+    ('kind', 'H'),   # index into the string table
+    ('flags', 'B'),
+    ('x', 'i'),
+    ('y', 'i'),
+    ('dx', 'h'),
+    ('dy', 'h'),
+    ('label', 'H'),  # button or key name, index into the string table
+)
+
+
+class StringTable:
+    """Interns event types, buttons and key names as small integers."""
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def intern(self, s):
+        i = self.index.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self.index[s] = i
+        return i
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class _Chunk:
+    __slots__ = tuple(name for name, _ in _COLUMNS)
+
+    def __init__(self):
+        for name, code in _COLUMNS:
+            setattr(self, name, array(code))
+
+    def __len__(self):
+        return len(self.time)
+
+
+def _fits(v, bound):
+    return isinstance(v, int) and not isinstance(v, bool) and -bound <= v < bound
+
+
+class EventStore(Sequence):
+    """
+    Columnar, chunked storage for recorded macro events.
+
+    Rows are kept in typed arrays (~25 bytes per event instead of ~270 for a
+    dict), while indexing and iteration hand back plain event dicts so
+    existing consumers keep working unchanged. Fields that don't fit a column
+    (unknown keys, fractional coordinates, out-of-range scroll deltas) are
+    kept per row in `extras`.
+    """
+
+    def __init__(self, events=None):
+        self.strings = StringTable()
+        self.chunks = []
+        self.extras = {}
+        self._len = 0
+        if events is not None:
+            self.extend(events)
+
+    @classmethod
+    def from_dicts(cls, events):
+        return events if isinstance(events, cls) else cls(events)
+
+    # --- Writing ---
+    def add(self, type, time, x=None, y=None, button=None, pressed=None,
+            dx=None, dy=None, key=None, **extra):
+        """Appends one event without building an intermediate dict."""
+        if not self.chunks or len(self.chunks[-1]) >= CHUNK_SIZE:
+            self.chunks.append(_Chunk())
+        c = self.chunks[-1]
+        flags = 0
+        label = 0
+
+        if _fits(x, 2 ** 31) and _fits(y, 2 ** 31):
+            flags |= F_XY
+        else:
+            # Only the coordinates the event has; a missing one stays missing
+            if x is not None: extra['x'] = x
+            if y is not None: extra['y'] = y
+            x = y = None
+        if button is not None:
+            flags |= F_BUTTON
+            label = self.strings.intern(button)
+        if key is not None:
+            if button is None and isinstance(key, str):
+                flags |= F_KEY
+                label = self.strings.intern(key)
+            else:
+                extra['key'] = key
+        if pressed is not None:
+            flags |= F_PRESSED
+            if pressed: flags |= F_PRESSED_TRUE
+        if dx is not None or dy is not None:
+            if _fits(dx, 2 ** 15) and _fits(dy, 2 ** 15):
+                flags |= F_SCROLL
+            else:
+                if dx is not None: extra['dx'] = dx
+                if dy is not None: extra['dy'] = dy
+                dx = dy = None
+
+        c.time.append(time)
+        c.kind.append(self.strings.intern(type))
+        c.flags.append(flags)
+        c.x.append(x if flags & F_XY else 0)
+        c.y.append(y if flags & F_XY else 0)
+        c.dx.append(dx if flags & F_SCROLL else 0)
+        c.dy.append(dy if flags & F_SCROLL else 0)
+        c.label.append(label)
+        if extra:
+            self.extras[self._len] = extra
+        self._len += 1
+
+    def append(self, event):
+        fields = {k: v for k, v in event.items() if k not in ('type', 'time')}
+        self.add(event['type'], event.get('time', 0.0), **fields)
+
+    def extend(self, events):
+        for ev in events:
+            self.append(ev)
+
+    def clear(self):
+        self.__init__()
+
+    # --- Reading ---
+    def __len__(self):
+        return self._len
+
+    def _row(self, c, j, i):
+        strings = self.strings.strings
+        flags = c.flags[j]
+        ev = {'type': strings[c.kind[j]], 'time': c.time[j]}
+        if flags & F_XY:
+            ev['x'] = c.x[j]
+            ev['y'] = c.y[j]
+        if flags & F_BUTTON:
+            ev['button'] = strings[c.label[j]]
+        if flags & F_PRESSED:
+            ev['pressed'] = bool(flags & F_PRESSED_TRUE)
+        if flags & F_SCROLL:
+            ev['dx'] = c.dx[j]
+            ev['dy'] = c.dy[j]
+        if flags & F_KEY:
+            ev['key'] = strings[c.label[j]]
+        if self.extras:
+            extra = self.extras.get(i)
+            if extra: ev.update(extra)
+        return ev
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._slice(*i.indices(self._len))
+        if i < 0: i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("event index out of range")
+        return self._row(self.chunks[i // CHUNK_SIZE], i % CHUNK_SIZE, i)
+
+    def __iter__(self):
+        i = 0
+        for c in self.chunks:
+            for j in range(len(c)):
+                yield self._row(c, j, i)
+                i += 1
+
+    def __eq__(self, other):
+        if isinstance(other, (EventStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def _slice(self, start, stop, step):
+        out = EventStore()
+        if step != 1:
+            out.extend(self[i] for i in range(start, stop, step))
+            return out
+        stop = max(start, stop)
+        out.strings.strings = list(self.strings.strings)
+        out.strings.index = dict(self.strings.index)
+        cols = {name: array(code) for name, code in _COLUMNS}
+        for ci, c in enumerate(self.chunks):
+            base = ci * CHUNK_SIZE
+            lo, hi = max(start - base, 0), min(stop - base, len(c))
+            if lo >= hi: continue
+            for name, _ in _COLUMNS:
+                cols[name].extend(getattr(c, name)[lo:hi])
+        n = stop - start
+        for off in range(0, n, CHUNK_SIZE):
+            chunk = _Chunk()
+            for name, _ in _COLUMNS:
+                setattr(chunk, name, cols[name][off:off + CHUNK_SIZE])
+            out.chunks.append(chunk)
+        out.extras = {i - start: e for i, e in self.extras.items() if start <= i < stop}
+        out._len = n
+        return out
+
+    def column(self, name):
+        """One column across all chunks as a single typed array (e.g. for numpy.frombuffer)."""
+        code = dict(_COLUMNS)[name]
+        out = array(code)
+        for c in self.chunks:
+            out.extend(getattr(c, name))
+        return out
+
+    def to_list(self):
+        return list(self)
+
+    def nbytes(self):
+        """Approximate memory held by the column arrays (excludes extras)."""
+        total = 0
+        for c in self.chunks:
+            for name, _ in _COLUMNS:
+                arr = getattr(c, name)
+                total += arr.buffer_info()[1] * arr.itemsize
+        return total
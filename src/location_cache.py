@@ -0,0 +1,114 @@
+"""
+Last-known-location cache for template images.
+
+After a full-screen search finds a template, its box is remembered. The next
+lookup captures only that box plus a small margin and checks it cheaply:
+
+1. if the region's pixels hash the same as at the last verified hit, it is a
+   hit without any matching;
+2. otherwise the template is matched inside the region only, which also
+   follows small shifts of up to `margin` pixels.
+
+A lookup misses, and the entry is dropped so the caller falls back to a
+full search, when the match is below the step's confidence, when it drops
+more than `max_drop` below the confidence it was cached with, or when the
+active window moved or changed since the entry was stored.
+"""
+import zlib
+import numpy as np
+
+DEFAULT_MARGIN = 16     # pixels searched around the cached box
+DEFAULT_MAX_DROP = 0.15
+
+
+class CachedLocation:
+    __slots__ = ('x', 'y', 'w', 'h', 'confidence', 'window', 'signature')
+
+    def __init__(self, x, y, w, h, confidence, window=None):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.confidence = confidence
+        self.window = window
+        self.signature = None  # crc32 of the region at the last verified hit
+
+    @property
+    def center(self):
+        return (self.x + self.w // 2, self.y + self.h // 2)
+
+
+class LocationCache:
+    def __init__(self, margin=DEFAULT_MARGIN, max_drop=DEFAULT_MAX_DROP):
+        self.margin = margin
+        self.max_drop = max_drop
+        self.entries = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, x, y, w, h, confidence, window=None):
+        self.entries[key] = CachedLocation(x, y, w, h, confidence, window)
+
+    def invalidate(self, key=None):
+        """Drops one entry, or every entry when key is None."""
+        if key is None:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+        elif self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def region(self, entry, screen_size):
+        """(left, top, width, height) of the cached box plus margin, clipped to the screen."""
+        sw, sh = screen_size
+        m = self.margin
+        left, top = max(0, entry.x - m), max(0, entry.y - m)
+        right, bottom = min(sw, entry.x + entry.w + m), min(sh, entry.y + entry.h + m)
+        return (left, top, max(0, right - left), max(0, bottom - top))
+
+    def check_window(self, key, window):
+        """False (and the entry dropped) if the active window differs from when it was cached."""
+        entry = self.entries.get(key)
+        if entry is None: return False
+        if entry.window != window:
+            self.invalidate(key)
+            self.misses += 1
+            return False
+        return True
+
+    def verify(self, key, roi_rgb, region, template, confidence, match=None):
+        """
+        Checks a captured region (RGB array of `region`) for the cached
+        template; returns its screen center on a hit, None on a miss.
+        `match` defaults to vision.match_best.
+        """
+        entry = self.entries.get(key)
+        if entry is None: return None
+        if match is None:
+            from src.vision import match_best as match
+        roi = np.ascontiguousarray(np.asarray(roi_rgb)[..., :3])
+        signature = zlib.crc32(roi)
+        if entry.signature == signature:
+            self.hits += 1
+            return entry.center
+        h, w = template.shape[:2]
+        if roi.shape[0] >= h and roi.shape[1] >= w:
+            max_val, (mx, my) = match(np.ascontiguousarray(roi[..., ::-1]), template)
+            if max_val >= confidence and max_val >= entry.confidence - self.max_drop:
+                x, y = region[0] + mx, region[1] + my
+                # A shifted box gets a new region next time, so only an unmoved one keeps the hash
+                entry.signature = signature if (x, y) == (entry.x, entry.y) else None
+                entry.x, entry.y = x, y
+                self.hits += 1
+                return entry.center
+        self.invalidate(key)
+        self.misses += 1
+        return None
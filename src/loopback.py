@@ -0,0 +1,179 @@
+"""
+Loopback CPS verification: runs the Clicker while a pynput listener
+timestamps the events that actually reach the OS input queue.
+
+Headless usage (e.g. on a virtual X server):
+    xvfb-run python -m src.loopback --interval 0.01 --duration 5
+Set PYNPUT_BACKEND=uinput to measure through the uinput backend instead.
+"""
+import argparse
+import statistics
+import threading
+import time
+from pynput import keyboard as pynput_keyboard
+from pynput import mouse as pynput_mouse
+from src.clicker import Clicker
+from src.timing import percentile
+
+# Inter-arrival histogram bucket edges in milliseconds (last bucket is open-ended)
+DEFAULT_BINS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class _StampingController:
+    """Wraps a pynput controller and records a send timestamp per injected event."""
+
+    def __init__(self, inner, sent):
+        self._inner = inner
+        self._sent = sent
+
+    def click(self, button, count=1):
+        now = time.perf_counter()
+        self._sent.extend([now] * count)
+        self._inner.click(button, count)
+
+    def press(self, key):
+        self._sent.append(time.perf_counter())
+        self._inner.press(key)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def __setattr__(self, name, value):
+        if name in ('_inner', '_sent'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._inner, name, value)
+
+
+def build_report(sent, arrived, target_interval=None, bins_ms=DEFAULT_BINS_MS):
+    """
+    Builds a rate / inter-arrival / latency report from two lists of
+    perf_counter timestamps (seconds). Sends and arrivals are paired in order.
+    """
+    report = {
+        'sent': len(sent),
+        'arrived': len(arrived),
+        'lost': max(0, len(sent) - len(arrived)),
+        'target_rate': (1.0 / target_interval) if target_interval else None,
+        'achieved_rate': 0.0,
+    }
+    if len(arrived) > 1:
+        report['achieved_rate'] = (len(arrived) - 1) / (arrived[-1] - arrived[0])
+
+    gaps = sorted((b - a) * 1000.0 for a, b in zip(arrived, arrived[1:]))
+    counts = [0] * (len(bins_ms) + 1)
+    for g in gaps:
+        i = 0
+        while i < len(bins_ms) and g >= bins_ms[i]:
+            i += 1
+        counts[i] += 1
+    report['inter_arrival_ms'] = {
+        'mean': statistics.fmean(gaps) if gaps else 0.0,
+        'stdev': statistics.pstdev(gaps) if gaps else 0.0,
+        'p50': percentile(gaps, 50),
+        'p95': percentile(gaps, 95),
+        'p99': percentile(gaps, 99),
+        'max': gaps[-1] if gaps else 0.0,
+    }
+    report['histogram'] = {'edges_ms': list(bins_ms), 'counts': counts}
+
+    lat = sorted((a - s) * 1000.0 for s, a in zip(sent, arrived))
+    report['latency_ms'] = {
+        'mean': statistics.fmean(lat) if lat else 0.0,
+        'p50': percentile(lat, 50),
+        'p95': percentile(lat, 95),
+        'max': lat[-1] if lat else 0.0,
+    }
+    return report
+
+
+def format_report(report):
+    ia = report['inter_arrival_ms']
+    lat = report['latency_ms']
+    target = report['target_rate']
+    lines = [
+        f"Achieved {report['achieved_rate']:.1f}/s"
+        + (f" (target {target:.1f}/s)" if target else ""),
+        f"Sent {report['sent']}, arrived {report['arrived']}, lost {report['lost']}",
+        f"Gap ms: mean {ia['mean']:.2f}, p50 {ia['p50']:.2f}, p95 {ia['p95']:.2f}, "
+        f"p99 {ia['p99']:.2f}, max {ia['max']:.2f}",
+        f"Latency ms: mean {lat['mean']:.3f}, p95 {lat['p95']:.3f}, max {lat['max']:.3f}",
+    ]
+    edges = report['histogram']['edges_ms']
+    for i, c in enumerate(report['histogram']['counts']):
+        if not c: continue
+        lo = edges[i - 1] if i else 0
+        label = f"{lo}-{edges[i]}ms" if i < len(edges) else f">={lo}ms"
+        lines.append(f"  {label:>12}: {c}")
+    return "\n".join(lines)
+
+
+class LoopbackMeter:
+    def __init__(self, stop_event=None):
+        self.stop_event = stop_event or threading.Event()
+        self.sent = []
+        self.arrived = []
+
+    def _on_click(self, x, y, button, pressed):
+        if pressed:
+            self.arrived.append(time.perf_counter())
+
+    def _on_press(self, key):
+        self.arrived.append(time.perf_counter())
+
+    def run(self, config, duration=5.0, settle=0.25):
+        """
+        Runs Clicker with `config` for `duration` seconds (or until stop_event)
+        and returns build_report() for what the listener observed.
+        Note: the listener also sees the user's own input during the run.
+        """
+        self.sent = []
+        self.arrived = []
+        is_key = config.get('action_type') == 'key'
+        if is_key:
+            listener = pynput_keyboard.Listener(on_press=self._on_press)
+        else:
+            listener = pynput_mouse.Listener(on_click=self._on_click)
+        listener.start()
+        listener.wait()
+
+        clicker = Clicker(self.stop_event)
+        clicker.mouse = _StampingController(clicker.mouse, self.sent)
+        clicker.keyboard = _StampingController(clicker.keyboard, self.sent)
+
+        timer = threading.Timer(duration, self.stop_event.set)
+        timer.start()
+        try:
+            clicker.run(config)
+        finally:
+            timer.cancel()
+            self.stop_event.set()
+            time.sleep(settle) # let in-flight events reach the listener
+            listener.stop()
+
+        return build_report(self.sent, self.arrived, config.get('interval'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure achieved click/key rate via an input listener.")
+    parser.add_argument('--interval', type=float, default=0.01, help="seconds between actions")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds to run")
+    parser.add_argument('--button', default='left')
+    parser.add_argument('--key', help="measure key presses of this key instead of clicks")
+    args = parser.parse_args(argv)
+
+    config = {
+        'interval': args.interval,
+        'action_type': 'key' if args.key else 'mouse',
+        'mouse_btn': args.button,
+        'click_type': 'single',
+        'key': args.key,
+        'key_mode': 'press',
+    }
+    report = LoopbackMeter().run(config, args.duration)
+    print(format_report(report))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Macro compaction: idle-gap capping and loop folding.
+
+A folded loop is stored as a single event right after its body:
+
+    {'type': 'loop', 'time': t, 'length': L, 'count': k, 'period': p}
+
+meaning "the L events before this one run k times in total, each repeat
+shifted `period` seconds after the previous one"; `time` is when the
+second iteration starts. Events after the loop keep their original
+timestamps. expand_loops() turns loops back into plain events, and
+compile_plan() expands them while building the playback plan.
+"""
+import numpy as np
+from array import array
+from src.event_store import EventStore
+
+LOOP = 'loop'
+
+
+def has_loops(store):
+    return LOOP in store.strings.index
+
+
+def expand_loops(events):
+    """Returns an EventStore with every loop event replaced by its repeats (nested loops included)."""
+    store = EventStore.from_dicts(events)
+    if not has_loops(store): return store
+    out = EventStore()
+    first_out = []  # out position of each input event's expansion
+    for ev in store:
+        first_out.append(len(out))
+        if ev['type'] != LOOP:
+            out.append(ev)
+            continue
+        n = len(first_out) - 1
+        body = out[first_out[n - ev['length']]:]
+        for m in range(1, ev['count']):
+            shift = m * ev['period']
+            for b in body:
+                out.append({**b, 'time': b['time'] + shift})
+    return out
+
+
+def cap_idle_gaps(events, max_gap):
+    """
+    Returns a copy of the macro in which no two consecutive events are more
+    than `max_gap` seconds apart; later events are shifted earlier by the
+    time removed. Loops are expanded first so their periods stay correct.
+    """
+    store = expand_loops(events)
+    store = store[:] if store is events else store
+    if len(store) < 2: return store
+    t = np.frombuffer(store.column('time'), dtype=np.float64)
+    excess = np.maximum(np.diff(t) - max_gap, 0.0)
+    if not excess.any(): return store
+    new_t = t - np.concatenate(([0.0], np.cumsum(excess)))
+    off = 0
+    for c in store.chunks:
+        c.time = array('d', new_t[off:off + len(c)].tobytes())
+        off += len(c)
+    return store
+
+
+def _features(store):
+    """Per-event numpy columns used to compare events for loop detection."""
+    col = lambda name, dtype: np.frombuffer(store.column(name), dtype=dtype)
+    t = col('time', np.float64)
+    x = col('x', np.int32).astype(np.int64)
+    y = col('y', np.int32).astype(np.int64)
+    # Events with extras (odd keys, fractional coordinates) never match anything
+    unique = np.zeros(len(t), dtype=np.int64)
+    for i in store.extras:
+        unique[i] = i + 1
+    return {
+        'kind': col('kind', np.uint16), 'flags': col('flags', np.uint8),
+        'label': col('label', np.uint16), 'dx': col('dx', np.int16), 'dy': col('dy', np.int16),
+        'unique': unique, 'x': x, 'y': y,
+        'gap': np.diff(t, prepend=t[:1]) if len(t) else t,
+        't': t,
+    }
+
+
+def _shift_matches(f, L, tolerance, time_tolerance):
+    """
+    (same, timed): same[j] is True when event j and event j + L are the same
+    action within `tolerance` pixels; timed additionally requires the gaps
+    before them to agree within `time_tolerance` seconds.
+    """
+    a, b = slice(None, -L), slice(L, None)
+    same = (f['kind'][a] == f['kind'][b]) & (f['flags'][a] == f['flags'][b])
+    same &= (f['label'][a] == f['label'][b]) & (f['dx'][a] == f['dx'][b]) & (f['dy'][a] == f['dy'][b])
+    same &= f['unique'][a] == f['unique'][b]
+    same &= (np.abs(f['x'][a] - f['x'][b]) <= tolerance) & (np.abs(f['y'][a] - f['y'][b]) <= tolerance)
+    timed = same & (np.abs(f['gap'][a] - f['gap'][b]) <= time_tolerance)
+    return same, timed
+
+
+def _iterations_within(f, start, L, k, tolerance, time_tolerance):
+    """How many of the k candidate iterations stay within tolerance of the first one."""
+    body = slice(start, start + L)
+    t0 = f['t'][start]
+    period = f['t'][start + L] - t0
+    for m in range(1, k):
+        rep = slice(start + m * L, start + (m + 1) * L)
+        if (np.abs(f['x'][rep] - f['x'][body]).max() > tolerance or
+                np.abs(f['y'][rep] - f['y'][body]).max() > tolerance or
+                np.abs((f['t'][rep] - f['t'][body]) - m * period).max() > time_tolerance * m):
+            return m
+    return k
+
+
+def find_loops(events, tolerance=5, time_tolerance=0.05, max_length=256):
+    """
+    Finds non-overlapping tandem repeats as (start, length, count).
+
+    For every candidate period L the macro is compared with itself shifted
+    by L in one vectorized step; a run of r matching positions starting at
+    `a` means the block [a, a + L) repeats 1 + r // L times. Candidates are
+    taken greedily by events saved, each repeat checked against the first
+    iteration so small offsets can't accumulate. Bodies must contain at
+    least one click, scroll or key so plain mouse paths are never folded.
+    """
+    store = EventStore.from_dicts(events)
+    n = len(store)
+    if n < 2: return []
+    f = _features(store)
+    move = store.strings.index.get('move', -1)
+    actions = np.cumsum(np.concatenate(([0], (f['kind'] != move).astype(np.int64))))
+
+    candidates = []
+    for L in range(1, min(max_length, n // 2) + 1):
+        same, timed = _shift_matches(f, L, tolerance, time_tolerance)
+        edges = np.diff(np.concatenate(([0], timed.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+        ok = lengths >= L
+        for a, r in zip(starts[ok].tolist(), lengths[ok].tolist()):
+            # The gap before the first iteration belongs to whatever preceded the loop
+            if a > 0 and same[a - 1]:
+                a, r = a - 1, r + 1
+            k = 1 + r // L
+            if actions[a + L] - actions[a] == 0: continue
+            candidates.append(((k - 1) * L - 1, a, L, k))
+
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+    taken = np.zeros(n, dtype=bool)
+    loops = []
+    for saving, a, L, k in candidates:
+        if saving <= 0: break
+        if taken[a:a + k * L].any(): continue
+        k = _iterations_within(f, a, L, k, tolerance, time_tolerance)
+        if k < 2 or (k - 1) * L <= 1: continue
+        taken[a:a + k * L] = True
+        loops.append((a, L, k))
+    loops.sort()
+    return loops
+
+
+def fold_loops(events, tolerance=5, time_tolerance=0.05, max_length=256):
+    """Returns a new EventStore with repeated subsequences folded into loop events."""
+    store = expand_loops(events)
+    loops = find_loops(store, tolerance, time_tolerance, max_length)
+    if not loops: return store[:] if store is events else store
+    times = store.column('time')
+    out = EventStore()
+    pos = 0
+    for a, L, k in loops:
+        for i in range(pos, a + L):
+            out.append(store[i])
+        # Average period over all iterations so per-iteration jitter doesn't accumulate
+        period = (times[a + (k - 1) * L] - times[a]) / (k - 1)
+        out.add(LOOP, times[a] + period, length=L, count=k, period=period)
+        pos = a + k * L
+    for i in range(pos, len(store)):
+        out.append(store[i])
+    return out
+
+
+def compact(events, max_gap=None, fold=True, tolerance=5, time_tolerance=0.05):
+    """Idle-gap capping followed by loop folding; returns a new EventStore."""
+    store = EventStore.from_dicts(events)
+    if max_gap is not None:
+        store = cap_idle_gaps(store, max_gap)
+    if fold:
+        store = fold_loops(store, tolerance, time_tolerance)
+    return store if store is not events else store[:]
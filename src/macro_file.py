@@ -0,0 +1,335 @@
+"""
+Binary macro format (.acm).
+
+Layout (little-endian):
+    header   magic 'ACPM', version u16, flags u16, event_count u64,
+             chunk_count u32, footer_offset u64
+    chunks   varint-encoded rows, CHUNK_EVENTS per chunk
+    footer   string table, extras (JSON), chunk index
+
+Each chunk restarts its delta state, so any chunk can be decoded on its own
+from the index. Rows store the interned type, the EventStore flags, the time
+delta in nanoseconds and zigzag x/y deltas against the previous positioned
+row. Timestamps that don't survive a round trip through integer nanoseconds
+(e.g. old JSON recorded with time.time()) set FLAG_RAW_TIME and are stored as
+raw doubles instead, so JSON -> .acm -> JSON is lossless.
+"""
+import json
+import mmap
+import struct
+from src.event_store import (
+    CHUNK_SIZE, EventStore, F_XY, F_BUTTON, F_KEY, F_SCROLL, F_PRESSED, F_PRESSED_TRUE
+)
+
+MAGIC = b'ACPM'
+VERSION = 1
+FLAG_RAW_TIME = 0x01
+CHUNK_EVENTS = 4096
+
+_HEADER = struct.Struct('<4sHHQIQ')
+_INDEX_ENTRY = struct.Struct('<QIIq')  # offset, byte length, event count, first time ns
+_DOUBLE = struct.Struct('<d')
+
+
+class MacroFormatError(ValueError):
+    pass
+
+
+# --- varints ---
+def _put_uvarint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _put_svarint(buf, n):
+    _put_uvarint(buf, -2 * n - 1 if n < 0 else 2 * n)
+
+
+def _get_uvarint(data, pos):
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _get_svarint(data, pos):
+    n, pos = _get_uvarint(data, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+
+def _times_fit_ns(store):
+    for c in store.chunks:
+        for t in c.time:
+            if round(t * 1e9) / 1e9 != t:
+                return False
+    return True
+
+
+def encode_rows(store, start, stop, raw_time=False):
+    """Encodes rows [start, stop) of an EventStore into one chunk payload."""
+    buf = bytearray()
+    last_t = 0
+    last_x = last_y = 0
+    for i in range(start, stop):
+        c = store.chunks[i // CHUNK_SIZE]
+        j = i % CHUNK_SIZE
+        flags = c.flags[j]
+        _put_uvarint(buf, c.kind[j])
+        buf.append(flags)
+        if raw_time:
+            buf += _DOUBLE.pack(c.time[j])
+        else:
+            t = round(c.time[j] * 1e9)
+            _put_svarint(buf, t - last_t)
+            last_t = t
+        if flags & F_XY:
+            x, y = c.x[j], c.y[j]
+            _put_svarint(buf, x - last_x)
+            _put_svarint(buf, y - last_y)
+            last_x, last_y = x, y
+        if flags & (F_BUTTON | F_KEY):
+            _put_uvarint(buf, c.label[j])
+        if flags & F_SCROLL:
+            _put_svarint(buf, c.dx[j])
+            _put_svarint(buf, c.dy[j])
+    return bytes(buf)
+
+
+def decode_rows(data, pos, end, count, strings, raw_time=False, first_index=0, extras=None):
+    """Yields event dicts from one chunk payload; raises MacroFormatError if it is damaged."""
+    try:
+        yield from _decode_rows(data, pos, end, count, strings, raw_time, first_index, extras)
+    except (IndexError, struct.error) as e:
+        raise MacroFormatError(f"corrupt chunk: {e}") from e
+
+
+def _decode_rows(data, pos, end, count, strings, raw_time, first_index, extras):
+    last_t = 0
+    last_x = last_y = 0
+    for n in range(count):
+        kind, pos = _get_uvarint(data, pos)
+        flags = data[pos]
+        pos += 1
+        if raw_time:
+            t = _DOUBLE.unpack_from(data, pos)[0]
+            pos += 8
+        else:
+            d, pos = _get_svarint(data, pos)
+            last_t += d
+            t = last_t / 1e9
+        ev = {'type': strings[kind], 'time': t}
+        if flags & F_XY:
+            d, pos = _get_svarint(data, pos)
+            last_x += d
+            d, pos = _get_svarint(data, pos)
+            last_y += d
+            ev['x'] = last_x
+            ev['y'] = last_y
+        label = None
+        if flags & (F_BUTTON | F_KEY):
+            label, pos = _get_uvarint(data, pos)
+        if flags & F_BUTTON:
+            ev['button'] = strings[label]
+        if flags & F_PRESSED:
+            ev['pressed'] = bool(flags & F_PRESSED_TRUE)
+        if flags & F_SCROLL:
+            ev['dx'], pos = _get_svarint(data, pos)
+            ev['dy'], pos = _get_svarint(data, pos)
+        if flags & F_KEY:
+            ev['key'] = strings[label]
+        if extras:
+            extra = extras.get(first_index + n)
+            if extra: ev.update(extra)
+        yield ev
+    if pos != end:
+        raise MacroFormatError("chunk length mismatch")
+
+
+def encode_block(events):
+    """
+    Encodes events as a self-contained block (own string table and extras),
+    used for append-only logs where there is no shared footer.
+    """
+    store = EventStore.from_dicts(events)
+    raw_time = not _times_fit_ns(store)
+    buf = bytearray([FLAG_RAW_TIME if raw_time else 0])
+    _put_uvarint(buf, len(store))
+    _put_uvarint(buf, len(store.strings))
+    for s in store.strings.strings:
+        b = s.encode('utf-8')
+        _put_uvarint(buf, len(b))
+        buf += b
+    extras = json.dumps({str(k): v for k, v in store.extras.items()}).encode('utf-8')
+    _put_uvarint(buf, len(extras))
+    buf += extras
+    buf += encode_rows(store, 0, len(store), raw_time)
+    return bytes(buf)
+
+
+def decode_block(data):
+    """Yields the events of a block written by encode_block()."""
+    raw_time = bool(data[0] & FLAG_RAW_TIME)
+    count, pos = _get_uvarint(data, 1)
+    n_strings, pos = _get_uvarint(data, pos)
+    strings = []
+    for _ in range(n_strings):
+        ln, pos = _get_uvarint(data, pos)
+        strings.append(bytes(data[pos:pos + ln]).decode('utf-8'))
+        pos += ln
+    ln, pos = _get_uvarint(data, pos)
+    extras = {int(k): v for k, v in json.loads(bytes(data[pos:pos + ln])).items()}
+    pos += ln
+    return decode_rows(data, pos, len(data), count, strings, raw_time, 0, extras)
+
+
+def save_macro(path, events):
+    """Writes events (EventStore or list of dicts) as a .acm file."""
+    store = EventStore.from_dicts(events)
+    raw_time = not _times_fit_ns(store)
+    n = len(store)
+
+    with open(path, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        index = []
+        for start in range(0, n, CHUNK_EVENTS):
+            stop = min(start + CHUNK_EVENTS, n)
+            payload = encode_rows(store, start, stop, raw_time)
+            index.append((f.tell(), len(payload), stop - start, round(store[start]['time'] * 1e9)))
+            f.write(payload)
+
+        footer_offset = f.tell()
+        footer = bytearray()
+        _put_uvarint(footer, len(store.strings))
+        for s in store.strings.strings:
+            b = s.encode('utf-8')
+            _put_uvarint(footer, len(b))
+            footer += b
+        extras = json.dumps({str(k): v for k, v in store.extras.items()}).encode('utf-8')
+        _put_uvarint(footer, len(extras))
+        footer += extras
+        for entry in index:
+            footer += _INDEX_ENTRY.pack(*entry)
+        f.write(footer)
+
+        f.seek(0)
+        flags = FLAG_RAW_TIME if raw_time else 0
+        f.write(_HEADER.pack(MAGIC, VERSION, flags, n, len(index), footer_offset))
+
+
+class MacroReader:
+    """
+    Memory-maps a .acm file and decodes it chunk by chunk. Playing
+    iter_chunks() with MacroPlayer.play_chunks starts playback once the
+    first chunk is decoded, before the rest of the file has been read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise MacroFormatError(f"Empty macro file: {path}")
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        data = self._map
+        if len(data) < _HEADER.size:
+            raise MacroFormatError("file too short")
+        try:
+            self._parse_header(data)
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            # A cut-off or damaged footer; json errors are already ValueErrors
+            raise MacroFormatError(f"truncated or corrupt macro file: {e}") from e
+
+    def _parse_header(self, data):
+        magic, version, self.flags, self.event_count, chunk_count, footer = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise MacroFormatError("not an AutoClicker-Pro macro file")
+        if version > VERSION:
+            raise MacroFormatError(f"unsupported macro version {version}")
+        self.version = version
+        self.raw_time = bool(self.flags & FLAG_RAW_TIME)
+        if not _HEADER.size <= footer <= len(data):
+            raise MacroFormatError("truncated macro file (footer missing)")
+
+        pos = footer
+        count, pos = _get_uvarint(data, pos)
+        self.strings = []
+        for _ in range(count):
+            ln, pos = _get_uvarint(data, pos)
+            self.strings.append(data[pos:pos + ln].decode('utf-8'))
+            pos += ln
+        ln, pos = _get_uvarint(data, pos)
+        if pos + ln > len(data):
+            raise MacroFormatError("truncated macro file (extras cut off)")
+        self.extras = {int(k): v for k, v in json.loads(data[pos:pos + ln]).items()}
+        pos += ln
+        if pos + chunk_count * _INDEX_ENTRY.size > len(data):
+            raise MacroFormatError("truncated macro file (chunk index cut off)")
+        self.index = [_INDEX_ENTRY.unpack_from(data, pos + i * _INDEX_ENTRY.size) for i in range(chunk_count)]
+        self._first_rows = []
+        total = 0
+        for offset, length, count, _ in self.index:
+            if offset < _HEADER.size or offset + length > footer:
+                raise MacroFormatError("corrupt chunk index")
+            self._first_rows.append(total)
+            total += count
+        if total != self.event_count:
+            raise MacroFormatError("corrupt chunk index (event count mismatch)")
+
+    def __len__(self):
+        return self.event_count
+
+    def iter_chunk(self, chunk_no):
+        offset, length, count, _ = self.index[chunk_no]
+        return decode_rows(self._map, offset, offset + length, count, self.strings,
+                           self.raw_time, self._first_rows[chunk_no], self.extras)
+
+    def iter_chunks(self, start_chunk=0):
+        """One lazily decoded iterator of events per chunk."""
+        for i in range(start_chunk, len(self.index)):
+            yield self.iter_chunk(i)
+
+    def iter_events(self, start_chunk=0):
+        for i in range(start_chunk, len(self.index)):
+            yield from self.iter_chunk(i)
+
+    def load(self):
+        return EventStore(self.iter_events())
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_macro(path):
+    with MacroReader(path) as reader:
+        return reader.load()
+
+
+def import_json(path):
+    with open(path, 'r') as f:
+        return EventStore.from_dicts(json.load(f))
+
+
+def export_json(events, path):
+    with open(path, 'w') as f:
+        json.dump(list(events), f, indent=2)
@@ -0,0 +1,130 @@
+"""
+Mouse path engine for replay ("Smart Straight Lines").
+
+Every run of consecutive moves is treated as one segment, from the cursor
+position at the event before it (a click, scroll or key) to the last move
+of the run. Segments are re-sampled on a fixed-rate time grid and either
+follow the recorded path, a straight line, or a smooth curve, with an
+easing applied along the line/curve. All segments of a macro are computed
+together with numpy; only the final write into the EventStore loops.
+"""
+import numpy as np
+from src.event_store import EventStore, F_XY
+from src.macro_analysis import expand_loops
+
+DEFAULT_RATE = 250.0  # Hz, one move per 4ms
+
+MODES = ('straight', 'curve', 'resample')
+
+EASINGS = {
+    'linear': lambda u: u,
+    'ease_in': lambda u: u * u,
+    'ease_out': lambda u: u * (2.0 - u),
+    'ease_in_out': lambda u: u * u * (3.0 - 2.0 * u),
+    'sine': lambda u: 0.5 - 0.5 * np.cos(np.pi * u),
+}
+
+
+def _columns(store):
+    """(time, is_move, has_xy, x, y) numpy arrays for an EventStore."""
+    t = np.frombuffer(store.column('time'), dtype=np.float64)
+    kind = np.frombuffer(store.column('kind'), dtype=np.uint16)
+    flags = np.frombuffer(store.column('flags'), dtype=np.uint8)
+    x = np.frombuffer(store.column('x'), dtype=np.int32).astype(np.float64)
+    y = np.frombuffer(store.column('y'), dtype=np.int32).astype(np.float64)
+    has_xy = (flags & F_XY) != 0
+    for i, extra in store.extras.items():
+        if extra.get('x') is not None and extra.get('y') is not None:
+            x[i], y[i] = extra['x'], extra['y']
+            has_xy[i] = True
+    move = store.strings.index.get('move')
+    is_move = (kind == move) & has_xy if move is not None else np.zeros(len(t), dtype=bool)
+    return t, is_move, has_xy, x, y
+
+
+def smooth_paths(events, mode='straight', easing='ease_in_out', rate=DEFAULT_RATE):
+    """
+    Returns a new EventStore in which every run of moves is replaced by
+    samples 1/rate seconds apart (the last one landing on the run's final
+    move). Non-move events are copied unchanged and in order.
+
+    mode: 'straight' (line from start to end), 'curve' (quadratic curve
+    through the recorded midpoint) or 'resample' (recorded path, evenly
+    re-timed). easing only applies to 'straight' and 'curve'. Folded
+    loops are expanded first.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown path mode: {mode}")
+    ease = EASINGS[easing]
+    store = expand_loops(events)
+    n = len(store)
+    if not n: return EventStore()
+    t, is_move, has_xy, x, y = _columns(store)
+
+    # Runs of consecutive moves: [starts[i], ends[i]] inclusive
+    edges = np.diff(np.concatenate(([0], is_move.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    if not len(starts): return store[:]
+
+    # Last positioned row before each run; a run with none starts from its own first move
+    idx = np.arange(n)
+    last_xy = np.maximum.accumulate(np.where(has_xy, idx, -1))
+    prev = np.where(starts > 0, last_xy[np.maximum(starts - 1, 0)], -1)
+    no_prior = (starts == 0) | (prev < 0)
+    anchor = np.where(no_prior, starts, prev)
+    t0 = np.where(no_prior, t[starts], t[np.maximum(starts - 1, 0)])
+    t1 = t[ends]
+    dur = np.maximum(t1 - t0, 0.0)
+
+    # Fixed-rate grid per run: k = 1..count, clipped to the run's end time
+    counts = np.maximum(np.ceil(dur * rate - 1e-9), 1).astype(np.int64)
+    run_of = np.repeat(np.arange(len(starts)), counts)
+    first = np.cumsum(counts) - counts
+    k = np.arange(counts.sum()) - first[run_of] + 1
+    ts = np.minimum(t0[run_of] + k / rate, t1[run_of])
+    last = k == counts[run_of]
+    ts[last] = t1[run_of][last]
+
+    x0, y0 = x[anchor][run_of], y[anchor][run_of]
+    x1, y1 = x[ends][run_of], y[ends][run_of]
+    d = dur[run_of]
+    u = np.where(d > 0, (ts - t0[run_of]) / np.where(d > 0, d, 1.0), 1.0)
+
+    if mode == 'resample':
+        pt, px, py = t[has_xy], x[has_xy], y[has_xy]
+        sx, sy = np.interp(ts, pt, px), np.interp(ts, pt, py)
+    else:
+        v = ease(u)
+        if mode == 'straight':
+            sx = x0 + (x1 - x0) * v
+            sy = y0 + (y1 - y0) * v
+        else:
+            # Control point chosen so the curve passes through the recorded
+            # position at the run's time midpoint
+            pt, px, py = t[has_xy], x[has_xy], y[has_xy]
+            tm = t0 + dur / 2.0
+            mx, my = np.interp(tm, pt, px)[run_of], np.interp(tm, pt, py)[run_of]
+            cx = 2.0 * mx - (x0 + x1) / 2.0
+            cy = 2.0 * my - (y0 + y1) / 2.0
+            a, b, c = (1.0 - v) ** 2, 2.0 * (1.0 - v) * v, v * v
+            sx = a * x0 + b * cx + c * x1
+            sy = a * y0 + b * cy + c * y1
+    sx = np.rint(sx).astype(np.int64).tolist()
+    sy = np.rint(sy).astype(np.int64).tolist()
+    ts = ts.tolist()
+
+    out = EventStore()
+    pos = 0
+    for r, (s, e) in enumerate(zip(starts.tolist(), ends.tolist())):
+        for i in range(pos, s):
+            out.append(store[i])
+        if no_prior[r] and dur[r] > 0:
+            out.append(store[s])
+        lo = int(first[r])
+        for j in range(lo, lo + int(counts[r])):
+            out.add('move', ts[j], sx[j], sy[j])
+        pos = e + 1
+    for i in range(pos, n):
+        out.append(store[i])
+    return out
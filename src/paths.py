@@ -0,0 +1,21 @@
+import os
+import sys
+
+APP_DIR_NAME = "AutoClickerPro"
+
+
+def user_data_dir(*parts) -> str:
+    """
+    Per-user writable data directory (created on demand):
+    %APPDATA%\\AutoClickerPro on Windows, ~/Library/Application Support on
+    macOS, $XDG_DATA_HOME (or ~/.local/share) elsewhere.
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    path = os.path.join(base, APP_DIR_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,526 @@
+import argparse
+import statistics
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from pynput.mouse import Button, Controller as MouseController
+from pynput.keyboard import Key, KeyCode, Controller as KeyboardController
+from src.timing import wait_until, percentile
+from src.macro_analysis import LOOP
+
+# Moves running later than this are dropped to catch up; clicks, scrolls and
+# keys are never dropped.
+DEFAULT_CATCH_UP = 0.008
+# Above 1x, moves whose scaled deadlines fall within one injection tick are
+# merged into the last of them (250 Hz, about what a desktop pointer reports)
+DEFAULT_MOVE_TICK = 0.004
+# While behind schedule the stop event is checked once per this many events
+STOP_POLL = 64
+
+# Plan opcodes
+OP_MOVE = 0
+OP_BUTTON_DOWN = 1
+OP_BUTTON_UP = 2
+OP_SCROLL = 3
+OP_KEY_DOWN = 4
+OP_KEY_UP = 5
+
+
+def resolve_key(name):
+    """Maps a recorded key string ('a', 'Key.space', '<65>') to a pynput key, or None."""
+    if not name: return None
+    if len(name) == 1: return name
+    if name.startswith('Key.'):
+        return getattr(Key, name[4:], None)
+    if name.startswith('<') and name.endswith('>') and name[1:-1].isdigit():
+        return KeyCode.from_vk(int(name[1:-1]))
+    return None
+
+
+class PlaybackPlan:
+    """
+    A macro compiled for replay: parallel arrays of opcode, time offset and
+    x/y (or scroll dx/dy), plus the pre-resolved Button/Key object per row.
+    `times` is non-decreasing, so it doubles as the seek index, and `src`
+    maps each row back to its position in the original event list.
+    """
+
+    def __init__(self):
+        self.ops = array('B')
+        self.times = array('d')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.dxs = array('i')
+        self.dys = array('i')
+        self.args = []
+        self.src = array('I')
+        self.skipped = 0  # events with an unknown type or key
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _add(self, op, t, x=0, y=0, dx=0, dy=0, arg=None, src=0):
+        self.ops.append(op)
+        self.times.append(t)
+        self.xs.append(int(x))
+        self.ys.append(int(y))
+        self.dxs.append(int(dx))
+        self.dys.append(int(dy))
+        self.args.append(arg)
+        self.src.append(src)
+
+    def _repeat(self, lo, hi, count, period, src):
+        """Appends rows [lo, hi) count - 1 more times, each shifted by period."""
+        for m in range(1, count):
+            shift = m * period
+            for r in range(lo, hi):
+                self._add(self.ops[r], self.times[r] + shift, self.xs[r], self.ys[r],
+                          self.dxs[r], self.dys[r], self.args[r], src)
+
+    def _copy_row(self, src, i):
+        self._add(src.ops[i], src.times[i], src.xs[i], src.ys[i], src.dxs[i], src.dys[i], src.args[i], src.src[i])
+
+    # --- Seeking ---
+    def index_at(self, t):
+        """First row at or after time offset `t` (seconds from the first event)."""
+        return bisect_left(self.times, t)
+
+    def index_after(self, t):
+        """First row strictly after time offset `t`."""
+        return bisect_right(self.times, t)
+
+    def time_of_event(self, n):
+        """Time offset of original event `n` (or of the next playable one)."""
+        i = bisect_left(self.src, n)
+        return self.times[i] if i < len(self.times) else self.duration
+
+    def state_at(self, i):
+        """
+        (cursor position or None, held) just before row i, where held lists
+        (OP_BUTTON_DOWN, button) and (OP_KEY_DOWN, key) pairs across both
+        devices in the order they were pressed, so Shift held before a drag
+        is restored before the button.
+        """
+        pos = None
+        held = {}
+        for op, x, y, arg in islice(zip(self.ops, self.xs, self.ys, self.args), i):
+            if op <= OP_SCROLL: pos = (x, y)
+            if op == OP_BUTTON_DOWN or op == OP_KEY_DOWN: held[(op, arg)] = None
+            elif op == OP_BUTTON_UP: held.pop((OP_BUTTON_DOWN, arg), None)
+            elif op == OP_KEY_UP: held.pop((OP_KEY_DOWN, arg), None)
+        return pos, list(held)
+
+    @property
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+
+
+class PlanCompiler:
+    """
+    Compiles event dicts into one PlaybackPlan a batch at a time, so a macro
+    can be compiled chunk by chunk while it is decoded. Times stay relative
+    to the very first event, and a folded loop may repeat rows compiled from
+    earlier batches.
+    """
+
+    def __init__(self):
+        self.plan = PlaybackPlan()
+        self.buttons = {}
+        self.keys = {}
+        self.t0 = None
+        self.count = 0  # events fed so far
+
+    def feed(self, events):
+        """Compiles `events` onto the end of self.plan and returns the plan."""
+        plan, buttons, keys = self.plan, self.buttons, self.keys
+        t0 = self.t0
+        n = self.count - 1
+        try:
+            for n, ev in enumerate(events, self.count):
+                kind = ev['type']
+                t = ev['time']
+                if t0 is None: t0 = self.t0 = t
+                t -= t0
+                if kind == 'move':
+                    plan._add(OP_MOVE, t, ev['x'], ev['y'], src=n)
+                elif kind == 'click':
+                    name = ev.get('button', 'left')
+                    if name not in buttons:
+                        buttons[name] = getattr(Button, name, Button.left)
+                    op = OP_BUTTON_DOWN if ev.get('pressed', False) else OP_BUTTON_UP
+                    plan._add(op, t, ev['x'], ev['y'], arg=buttons[name], src=n)
+                elif kind == 'scroll':
+                    plan._add(OP_SCROLL, t, ev['x'], ev['y'], ev.get('dx', 0), ev.get('dy', 0), src=n)
+                elif kind in ('key_press', 'key_release'):
+                    name = ev.get('key')
+                    if name not in keys:
+                        keys[name] = resolve_key(name)
+                    if keys[name] is None:
+                        plan.skipped += 1
+                        continue
+                    plan._add(OP_KEY_DOWN if kind == 'key_press' else OP_KEY_UP, t, arg=keys[name], src=n)
+                elif kind == LOOP:
+                    lo = bisect_left(plan.src, n - ev['length'])
+                    plan._repeat(lo, len(plan), ev['count'], ev['period'], n)
+                else:
+                    plan.skipped += 1
+        finally:
+            self.count = n + 1
+        return plan
+
+
+def compile_plan(events):
+    """
+    Compiles any iterable of event dicts into a PlaybackPlan (times relative
+    to the first event). Folded loops (see macro_analysis) are unrolled.
+    """
+    return PlanCompiler().feed(events)
+
+
+def iter_batches(events, size=4096):
+    """Splits any iterable of event dicts into lists of `size`, for MacroPlayer.play_chunks."""
+    it = iter(events)
+    while True:
+        batch = list(islice(it, size))
+        if not batch: return
+        yield batch
+
+
+def coalesce_plan(plan, speed, tick=DEFAULT_MOVE_TICK, lo=0, out=None):
+    """
+    Returns a copy of `plan` in which runs of moves that land in the same
+    `tick` of real (speed-scaled) time collapse to their last position.
+    Every non-move row is kept in order, and the move right before it is
+    always flushed first, so the cursor is where it was recorded at each
+    click, scroll or key. With `lo` and `out`, only rows from `lo` on are
+    coalesced and appended to `out` (for plans compiled chunk by chunk).
+    """
+    if out is None:
+        out = PlaybackPlan()
+    out.skipped = plan.skipped
+    scale = 1.0 / (speed * tick)
+    pending = -1  # index of the move waiting to be emitted
+    pending_slot = None
+    for i, op in enumerate(plan.ops[lo:], lo):
+        if op == OP_MOVE:
+            slot = int(plan.times[i] * scale)
+            if pending >= 0 and slot != pending_slot:
+                out._copy_row(plan, pending)
+            pending, pending_slot = i, slot
+        else:
+            if pending >= 0:
+                out._copy_row(plan, pending)
+                pending = -1
+            out._copy_row(plan, i)
+    if pending >= 0:
+        out._copy_row(plan, pending)
+    return out
+
+
+class MacroPlayer:
+    """
+    Replays recorded events on absolute deadlines: event i fires at
+    start + (t_i - t_0) / speed, so sleep overshoot and injection time never
+    accumulate into drift over a long macro.
+    """
+
+    def __init__(self, stop_event, mouse=None, keyboard=None):
+        self.stop_event = stop_event
+        self.mouse = mouse or MouseController()
+        self.keyboard = keyboard or KeyboardController()
+        self.catch_up = DEFAULT_CATCH_UP
+        self.move_tick = DEFAULT_MOVE_TICK  # 0 disables coalescing
+        self.stats = None
+        self.plan = None  # set by play_chunks
+
+    def play(self, events, speed=1.0, start=0.0, end=None):
+        """
+        Plays a PlaybackPlan, or compiles and plays any iterable of event
+        dicts (list, EventStore). Returns and stores a lateness report.
+        Above 1x, moves are first coalesced to one per move_tick so the
+        replay keeps up with the requested speed.
+
+        start/end (seconds from the first event) play only part of the
+        macro: the cursor, held buttons and held keys are restored to their
+        state at `start`, and anything still held when playback stops
+        before the end of the macro is released.
+        """
+        plan = events if isinstance(events, PlaybackPlan) else compile_plan(events)
+        n = len(plan)
+        if speed > 1.0 and self.move_tick:
+            plan = coalesce_plan(plan, speed, self.move_tick)
+        self._play_segments(((plan, len(plan)),), speed, start, end)
+        self.stats['coalesced_moves'] = n - len(plan)
+        return self.stats
+
+    def play_chunks(self, chunks, speed=1.0, start=0.0, end=None):
+        """
+        Like play(), but compiles the macro while it plays: `chunks` yields
+        iterables of event dicts (MacroReader.iter_chunks(), iter_batches()),
+        and each one is compiled onto the same plan only once the rows
+        before it have been sent. The first event goes out as soon as the
+        first chunk is decoded; loops and held buttons/keys carry across
+        chunk boundaries. Afterwards self.plan is the complete compiled plan,
+        ready to replay with play(), or None if playback ended before every
+        chunk was read.
+        """
+        compiler = PlanCompiler()
+        coalesce = speed > 1.0 and self.move_tick
+        out = PlaybackPlan() if coalesce else compiler.plan
+        read_all = []
+
+        def segments():
+            for events in chunks:
+                lo = len(compiler.plan)
+                compiler.feed(events)
+                if coalesce:
+                    coalesce_plan(compiler.plan, speed, self.move_tick, lo, out)
+                yield out, len(out)
+            read_all.append(True)
+
+        self.plan = None
+        self._play_segments(segments(), speed, start, end)
+        self.plan = compiler.plan if read_all else None
+        self.stats['coalesced_moves'] = len(compiler.plan) - len(out)
+        return self.stats
+
+    def _play_segments(self, segments, speed, start, end):
+        """
+        Plays the rows of (plan, available) pairs: one plan, or the same
+        plan growing chunk by chunk, of which rows before `available` are
+        compiled. Stores the lateness report in self.stats.
+        """
+        stop = self.stop_event
+        mouse, keyboard = self.mouse, self.keyboard
+        catch_up = self.catch_up
+        scale = 1.0 / speed
+        clock = time.perf_counter
+        lateness = []
+        late_append = lateness.append
+        dropped = 0
+        move, button_down, button_up = OP_MOVE, OP_BUTTON_DOWN, OP_BUTTON_UP
+        key_down, key_up = OP_KEY_DOWN, OP_KEY_UP
+        plan = t_start = None
+        base = last_deadline = 0.0
+        i = 0
+        reached = 0
+        played_all = True
+        try:
+            for plan, hi in segments:
+                if t_start is None:
+                    i0 = plan.index_at(start) if start else 0
+                    if i0 >= hi: continue  # not at `start` yet
+                    if i0:
+                        self._restore(plan.state_at(i0))
+                    t_start = last_deadline = clock()
+                    base = t_start - plan.times[i0] * scale if i0 else t_start
+                    reached = i0
+                i1 = min(plan.index_after(end), hi) if end is not None else hi
+
+                # Hot loop: only array reads, integer compares with locals and backend calls
+                rows = zip(plan.ops[reached:i1], plan.times[reached:i1], plan.xs[reached:i1], plan.ys[reached:i1],
+                           plan.dxs[reached:i1], plan.dys[reached:i1], plan.args[reached:i1])
+                for reached, (op, t, x, y, dx, dy, arg) in enumerate(rows, reached):
+                    deadline = base + t * scale
+                    now = clock()
+                    if now < deadline:
+                        if not wait_until(deadline, stop): break
+                        now = clock()
+                    else:
+                        # Running behind: nothing waits, so poll stop every STOP_POLL events
+                        if not i % STOP_POLL and stop.is_set(): break
+                        i += 1
+                    last_deadline = deadline
+                    late = now - deadline
+                    if op == move:
+                        if late > catch_up:
+                            dropped += 1
+                            continue
+                        mouse.position = (x, y)
+                    elif op == key_down:
+                        keyboard.press(arg)
+                    elif op == key_up:
+                        keyboard.release(arg)
+                    else:
+                        mouse.position = (x, y)
+                        if op == button_down: mouse.press(arg)
+                        elif op == button_up: mouse.release(arg)
+                        else: mouse.scroll(dx, dy)
+                    late_append(late)
+                else:
+                    reached = i1
+                    if i1 == hi: continue  # the whole chunk was played
+                played_all = False  # stopped, or reached `end`
+                break
+        except BaseException:
+            # e.g. a corrupt chunk further into the file: let go of what this play pressed
+            if t_start is not None:
+                self._release(plan.state_at(reached))
+            raise
+
+        if t_start is None:
+            self.stats = build_lateness_report(lateness, 0, 0.0, 0.0)
+            return
+        if not played_all or reached < len(plan):
+            self._release(plan.state_at(reached))
+        self.stats = build_lateness_report(lateness, dropped, clock() - t_start, last_deadline - t_start)
+
+    def _restore(self, state):
+        pos, held = state
+        if pos is not None:
+            self.mouse.position = pos
+        for op, arg in held:
+            if op == OP_KEY_DOWN: self.keyboard.press(arg)
+            else: self.mouse.press(arg)
+
+    def _release(self, state):
+        _, held = state
+        for op, arg in reversed(held):
+            if op == OP_KEY_DOWN: self.keyboard.release(arg)
+            else: self.mouse.release(arg)
+
+
+def build_lateness_report(lateness, dropped_moves, elapsed, target_elapsed):
+    """Summarizes per-event lateness (seconds) into a millisecond report."""
+    ms = sorted(x * 1000.0 for x in lateness)
+    return {
+        'events': len(ms),
+        'dropped_moves': dropped_moves,
+        'elapsed': elapsed,
+        'target_elapsed': target_elapsed,
+        'lateness_ms': {
+            'mean': statistics.fmean(ms) if ms else 0.0,
+            'p50': percentile(ms, 50),
+            'p95': percentile(ms, 95),
+            'p99': percentile(ms, 99),
+            'max': ms[-1] if ms else 0.0,
+        },
+    }
+
+
+def format_lateness_report(stats):
+    lat = stats['lateness_ms']
+    return (
+        f"Played {stats['events']} events in {stats['elapsed']:.2f}s "
+        f"(target {stats['target_elapsed']:.2f}s), dropped {stats['dropped_moves']} moves"
+        + (f", merged {stats['coalesced_moves']}" if stats.get('coalesced_moves') else "") + "; "
+        f"late ms p50 {lat['p50']:.2f} / p95 {lat['p95']:.2f} / max {lat['max']:.2f}"
+    )
+
+
+# --- benchmark ---
+class NullBackend:
+    """Mouse/keyboard stand-in that discards input, for measuring dispatch cost."""
+
+    def __init__(self):
+        self.position = (0, 0)
+
+    def press(self, arg): pass
+    def release(self, arg): pass
+    def scroll(self, dx, dy): pass
+
+
+def _play_dicts(events, mouse, keyboard, stop, speed=1.0, catch_up=DEFAULT_CATCH_UP):
+    """The pre-plan player loop (per-event dict dispatch); kept as the benchmark baseline."""
+    clock = time.perf_counter
+    lateness = []
+    t0 = None
+    start = clock()
+    for ev in events:
+        t = ev['time']
+        if t0 is None: t0 = t
+        deadline = start + (t - t0) / speed
+        if not wait_until(deadline, stop): break
+        kind = ev['type']
+        late = clock() - deadline
+        if kind == 'move':
+            if late > catch_up: continue
+            mouse.position = (ev['x'], ev['y'])
+        elif kind == 'click':
+            mouse.position = (ev['x'], ev['y'])
+            btn = getattr(Button, ev['button'], Button.left)
+            if ev.get('pressed', False): mouse.press(btn)
+            else: mouse.release(btn)
+        elif kind == 'scroll':
+            mouse.position = (ev['x'], ev['y'])
+            mouse.scroll(ev['dx'], ev['dy'])
+        elif kind == 'key_press':
+            keyboard.press(ev['key'])
+        elif kind == 'key_release':
+            keyboard.release(ev['key'])
+        lateness.append(late)
+    return build_lateness_report(lateness, 0, clock() - start, 0.0)
+
+
+def synthetic_macro(n):
+    """n events of mostly moves with periodic clicks, scrolls and keys."""
+    events = []
+    for i in range(n):
+        t = i * 0.001
+        r = i % 50
+        if r == 10:
+            events.append({'type': 'click', 'time': t, 'x': i % 1920, 'y': i % 1080, 'button': 'left', 'pressed': True})
+        elif r == 11:
+            events.append({'type': 'click', 'time': t, 'x': i % 1920, 'y': i % 1080, 'button': 'left', 'pressed': False})
+        elif r == 20:
+            events.append({'type': 'scroll', 'time': t, 'x': i % 1920, 'y': i % 1080, 'dx': 0, 'dy': -1})
+        elif r == 30:
+            events.append({'type': 'key_press', 'time': t, 'key': 'Key.space'})
+        elif r == 31:
+            events.append({'type': 'key_release', 'time': t, 'key': 'Key.space'})
+        else:
+            events.append({'type': 'move', 'time': t, 'x': i % 1920, 'y': i % 1080})
+    return events
+
+
+def benchmark(events, repeats=3):
+    """
+    Events per second through the null backend at infinite speed (deadlines
+    are always due): the old dict-dispatch loop vs the compiled plan loop.
+    """
+    n = len(events)
+    null = NullBackend()
+
+    def best(fn):
+        times = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t)
+        return n / min(times)
+
+    stop = _NeverSet()
+    player = MacroPlayer(stop, mouse=null, keyboard=null)
+    player.catch_up = float('inf')
+    player.move_tick = 0
+    t = time.perf_counter()
+    plan = compile_plan(events)
+    compile_time = time.perf_counter() - t
+    return {
+        'events': n,
+        'compile_ms': compile_time * 1000.0,
+        'dict_eps': best(lambda: _play_dicts(events, null, null, stop, float('inf'), float('inf'))),
+        'plan_eps': best(lambda: player.play(plan, float('inf'))),
+    }
+
+
+class _NeverSet:
+    def is_set(self):
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark macro playback dispatch with a null input backend.")
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args(argv)
+    result = benchmark(synthetic_macro(args.events), args.repeats)
+    print(f"{result['events']} events, compile {result['compile_ms']:.1f} ms")
+    print(f"dict dispatch: {result['dict_eps']:,.0f} events/s")
+    print(f"compiled plan: {result['plan_eps']:,.0f} events/s")
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Per-step workflow profiler.
+
+WorkflowRunner opens a record for every executed step (a step inside a loop
+gets one record per iteration) and times the phases inside it:
+
+    capture - screenshots and pixel reads
+    match   - template matching
+    inject  - mouse/keyboard input
+    ai      - AI round trips
+    settle  - waiting after the step (see settle policies)
+
+plus counters such as `polls`, the characters a Type Text step typed
+(`chars`) and the location cache's `cache_hits` / `cache_misses`. The
+timeline can be exported as Chrome trace JSON, which chrome://tracing and
+https://ui.perfetto.dev both open.
+
+Per-step totals are summed as each step ends, and only the last
+`max_records` records are kept for the timeline, so a workflow that loops
+for hours uses constant memory.
+"""
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PHASES = ('capture', 'match', 'inject', 'ai', 'settle')
+DEFAULT_MAX_RECORDS = 10000  # step records kept for the trace export
+MAX_SPANS = 1000  # phase spans kept per record (a long Wait Image polls many times)
+
+
+class StepRecord:
+    __slots__ = ('index', 'action', 'start', 'end', 'phases', 'counters', 'spans')
+
+    def __init__(self, index, action, start):
+        self.index = index
+        self.action = action
+        self.start = start
+        self.end = None
+        self.phases = {}    # phase -> seconds
+        self.counters = {}  # name -> count
+        self.spans = []     # (phase, start, end)
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else self.start) - self.start
+
+
+class StepProfiler:
+    def __init__(self, clock=time.perf_counter, max_records=DEFAULT_MAX_RECORDS):
+        self.clock = clock
+        self.max_records = max_records
+        self.reset()
+
+    def reset(self):
+        self.records = deque(maxlen=self.max_records)  # the most recent steps, for the timeline
+        self.totals = {}  # step index -> running totals, see step_totals()
+        self.dropped = 0  # records that fell out of `records`
+        self.current = None
+        self.origin = self.clock()
+
+    def begin(self, index, action):
+        record = StepRecord(index, action, self.clock())
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append(record)
+        self.current = record
+        return record
+
+    def end(self):
+        record = self.current
+        if record is None: return
+        record.end = self.clock()
+        self.current = None
+        t = self.totals.get(record.index)
+        if t is None:
+            t = self.totals[record.index] = {'action': record.action, 'runs': 0, 'total': 0.0}
+        t['runs'] += 1
+        t['total'] += record.duration
+        for name, value in record.phases.items():
+            t[name] = t.get(name, 0.0) + value
+        for name, value in record.counters.items():
+            t[name] = t.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        """Times the with-block as `name` in the current step (ignored outside a step)."""
+        record = self.current
+        start = self.clock()
+        try:
+            yield
+        finally:
+            if record is not None:
+                end = self.clock()
+                record.phases[name] = record.phases.get(name, 0.0) + (end - start)
+                if len(record.spans) < MAX_SPANS:
+                    record.spans.append((name, start, end))
+
+    def count(self, name, n=1):
+        record = self.current
+        if record is not None:
+            record.counters[name] = record.counters.get(name, 0) + n
+
+    def step_totals(self):
+        """
+        {step index: {'runs', 'total', 'mean', <phase>..., <counter>...}} in
+        seconds, summed over every finished execution of the step.
+        """
+        totals = {}
+        for index, t in self.totals.items():
+            totals[index] = dict(t, mean=t['total'] / t['runs'])
+        return totals
+
+    def to_chrome_trace(self, name="Workflow"):
+        """Trace Event Format dict: one complete ('X') event per step, phases nested inside."""
+        us = lambda t: round((t - self.origin) * 1e6, 3)
+        events = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': name}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'steps'}},
+        ]
+        for r in self.records:
+            end = r.end if r.end is not None else r.start
+            args = {'index': r.index}
+            args.update({f"{k}_ms": round(v * 1000.0, 3) for k, v in r.phases.items()})
+            args.update(r.counters)
+            events.append({
+                'name': f"{r.index + 1}. {r.action}", 'cat': 'step', 'ph': 'X',
+                'ts': us(r.start), 'dur': round((end - r.start) * 1e6, 3),
+                'pid': 1, 'tid': 1, 'args': args,
+            })
+            for phase, start, stop in r.spans:
+                events.append({
+                    'name': phase, 'cat': 'phase', 'ph': 'X',
+                    'ts': us(start), 'dur': round((stop - start) * 1e6, 3),
+                    'pid': 1, 'tid': 1,
+                })
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        if self.dropped:
+            trace['otherData'] = {'dropped_steps': self.dropped}  # older steps than the timeline shows
+        return trace
+
+    def export_chrome_trace(self, path, name="Workflow"):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(name), f)
+
+
+def format_step_timing(totals):
+    """Short per-step summary for the workflow list, e.g. '12.3 ms' or 'x10, avg 4.1 ms'."""
+    mean = totals['mean'] * 1000.0
+    return f"{mean:.1f} ms" if totals['runs'] == 1 else f"x{totals['runs']}, avg {mean:.1f} ms"
+
+
+def format_phase_breakdown(totals):
+    """Multi-line breakdown (per-run averages) for a tooltip."""
+    runs = totals['runs']
+    lines = [f"{totals['action']}: {runs} run(s), {totals['total'] * 1000.0:.1f} ms total"]
+    for phase in PHASES:
+        if phase in totals:
+            lines.append(f"  {phase}: {totals[phase] * 1000.0 / runs:.1f} ms")
+    if 'polls' in totals:
+        lines.append(f"  polls: {totals['polls'] / runs:.1f}")
+    rate = typing_rate(totals)
+    if rate is not None:
+        lines.append(f"  typed: {totals['chars'] / runs:.0f} chars at {rate:.0f} chars/s")
+    rate = cache_hit_rate(totals)
+    if rate is not None:
+        hits = totals.get('cache_hits', 0)
+        lines.append(f"  location cache: {hits}/{hits + totals.get('cache_misses', 0)} hits ({rate:.0%})")
+    return "\n".join(lines)
+
+
+def cache_hit_rate(totals):
+    """Location-cache hit rate of a step_totals() entry, None if the cache was never checked."""
+    hits, misses = totals.get('cache_hits', 0), totals.get('cache_misses', 0)
+    return hits / (hits + misses) if hits + misses else None
+
+
+def typing_rate(totals):
+    """Characters per second of injection time for a Type Text step_totals() entry, None if nothing was typed."""
+    chars, seconds = totals.get('chars', 0), totals.get('inject', 0.0)
+    return chars / seconds if chars and seconds > 0 else None
@@ -1,27 +1,190 @@
+import itertools
+import math
+import os
+import threading
 import time
 from pynput import keyboard as pynput_keyboard
 from pynput import mouse as pynput_mouse
 from pynput.keyboard import Key
+from src.event_store import EventStore
+from src import macro_analysis
+from src.macro_analysis import LOOP, has_loops
+from src.recording_log import RecordingLog, new_log_path, read_log
+
+# Raw callback records: (seq, perf_counter_ns, kind, a, b, c, d)
+_MOVE, _CLICK, _SCROLL, _KEY_PRESS, _KEY_RELEASE = range(5)
+
+
+def rdp_keep(points, epsilon):
+    """
+    Ramer-Douglas-Peucker over a list of (x, y). Returns a list of booleans
+    marking which points to keep; endpoints are always kept.
+    """
+    n = len(points)
+    keep = [False] * n
+    if n == 0: return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2: continue
+        ax, ay = points[a]
+        bx, by = points[b]
+        vx, vy = bx - ax, by - ay
+        seg_len = math.hypot(vx, vy)
+        far_i, far_d = -1, -1.0
+        for i in range(a + 1, b):
+            px, py = points[i]
+            if seg_len:
+                d = abs(vx * (ay - py) - vy * (ax - px)) / seg_len
+            else:
+                d = math.hypot(px - ax, py - ay)
+            if d > far_d:
+                far_i, far_d = i, d
+        if far_d > epsilon:
+            keep[far_i] = True
+            stack.append((a, far_i))
+            stack.append((far_i, b))
+    return keep
+
+
+def simplify_moves(events, epsilon):
+    """
+    Simplifies every run of consecutive 'move' events with RDP (error bound in
+    pixels). Non-move events and the first/last move of each run are kept.
+    Runs never cross a folded loop's body boundary, and loop lengths are
+    updated to the simplified body. Returns a new EventStore.
+    """
+    store = EventStore.from_dicts(events)
+    body_pos = {}
+    if has_loops(store):
+        body_pos = {n - ev['length']: 0 for n, ev in enumerate(store) if ev['type'] == LOOP}
+    out = EventStore()
+    run = []
+
+    def flush():
+        if not run: return
+        keep = rdp_keep([(ev['x'], ev['y']) for ev in run], epsilon)
+        for ev, k in zip(run, keep):
+            if k: out.append(ev)
+        run.clear()
+
+    for n, ev in enumerate(store):
+        if n in body_pos:
+            flush()
+            body_pos[n] = len(out)
+        if ev['type'] == 'move' and 'x' in ev:
+            run.append(ev)
+            continue
+        flush()
+        if ev['type'] == LOOP:
+            ev['length'] = len(out) - body_pos[n - ev['length']]
+        out.append(ev)
+    flush()
+    return out
+
+
+class EventRing:
+    """
+    Preallocated ring buffer fed from pynput listener threads.
+
+    Producers claim a slot with next() on an itertools.count, which is atomic
+    under the GIL, and store one tuple; no lock is taken on the hook path.
+    A single consumer drains slots in sequence order. If producers lap the
+    consumer, the overwritten records are counted in `dropped`.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.mask = capacity - 1
+        self.slots = [None] * capacity
+        self._seq = itertools.count()
+        self.read_seq = 0
+        self.dropped = 0
+
+    def push(self, t_ns, kind, a=None, b=None, c=None, d=None):
+        seq = next(self._seq)
+        self.slots[seq & self.mask] = (seq, t_ns, kind, a, b, c, d)
+
+    def drain(self):
+        """Returns all records published since the last drain, in order."""
+        out = []
+        slots, mask = self.slots, self.mask
+        while True:
+            rec = slots[self.read_seq & mask]
+            if rec is None or rec[0] < self.read_seq:
+                break # not written yet
+            if rec[0] > self.read_seq:
+                # Lapped: skip ahead to the oldest record that can still be intact
+                skip_to = max(self.read_seq + 1, rec[0] - mask)
+                self.dropped += skip_to - self.read_seq
+                self.read_seq = skip_to
+                continue
+            out.append(rec)
+            self.read_seq += 1
+        return out
+
 
 class Recorder:
+    # How often the background consumer drains the ring
+    DRAIN_INTERVAL = 0.005
+
     def __init__(self):
-        self.events = []
+        self.events = EventStore()
         self.recording = False
-        self.start_time = 0
+        self.start_time = 0     # wall clock, informational
+        self.start_ns = 0       # perf_counter_ns origin for event times
         self.mouse_listener = None
         self.key_listener = None
         # Keys to ignore (Control keys)
         self.ignore_keys = [] 
+        # Move decimation (0 disables each check)
+        self.min_move_interval = 0.0  # seconds between kept moves
+        self.min_move_distance = 0.0  # pixels between kept moves
+        self.simplify_epsilon = 0.0   # RDP error bound in pixels, applied on stop
+        self.raw_event_count = 0
+        self._last_move = None
+        self._pending_move = None
+        self.ring = EventRing()
+        self._drain_lock = threading.Lock()
+        self._consumer = None
+        self._reset_callback_stats()
+        # Streaming mode: spill events to an append-only log in stream_dir
+        self.stream_dir = None
+        self.stream_interval = 1.0  # seconds between spills
+        self.log = None
+        self._last_spill = 0.0
+        # Events as they were before compact(), for restore_original()
+        self.original_events = None
+
+    def _reset_callback_stats(self):
+        self.callback_count = 0
+        self.callback_ns_total = 0
+        self.callback_ns_max = 0
         
     def start(self):
-        self.events = []
+        self.events = EventStore()
+        self.original_events = None
+        self.raw_event_count = 0
+        self._last_move = None
+        self._pending_move = None
+        self.ring = EventRing()
+        self._reset_callback_stats()
         self.recording = True
         self.start_time = time.time()
+        self.start_ns = time.perf_counter_ns()
+        if self.stream_dir:
+            self.log = RecordingLog(new_log_path(self.stream_dir))
+            self._last_spill = time.monotonic()
         
         # Define keys to ignore dynamically
         # We ignore F6 (Safety) and F7 (Record Toggle)
         self.ignore_keys = [Key.f6, Key.f7]
 
+        self._consumer = threading.Thread(target=self._consume, daemon=True)
+        self._consumer.start()
+
         self.mouse_listener = pynput_mouse.Listener(
             on_move=self.on_move,
             on_click=self.on_click,
@@ -39,6 +202,15 @@ class Recorder:
         self.recording = False
         if self.mouse_listener: self.mouse_listener.stop()
         if self.key_listener: self.key_listener.stop()
+        if self._consumer:
+            self._consumer.join()
+            self._consumer = None
+        self.flush()
+        if self._pending_move:
+            self.events.add("move", *self._pending_move)
+            self._pending_move = None
+        if self.log:
+            self._finish_log()
         
         if remove_last_click and self.events:
             # Remove the last click sequence (press and release)
@@ -54,33 +226,132 @@ class Recorder:
                      # Remove everything after the start of that click
                      self.events = self.events[:second_last]
 
+        if self.simplify_epsilon > 0:
+            self.simplify(self.simplify_epsilon)
+
+    def simplify(self, epsilon):
+        self.events = simplify_moves(self.events, epsilon)
+
+    def compact(self, max_gap=None, fold=True):
+        """
+        Caps idle gaps and folds repeated sequences into loops (see
+        macro_analysis). The uncompacted events stay in original_events.
+        """
+        if self.original_events is None:
+            self.original_events = self.events
+        self.events = macro_analysis.compact(self.original_events, max_gap, fold)
+
+    def restore_original(self):
+        if self.original_events is None: return False
+        self.events = self.original_events
+        self.original_events = None
+        return True
+
+    def reduction_ratio(self):
+        """Fraction of raw listener events that were dropped (0.0 - 1.0)."""
+        if not self.raw_event_count: return 0.0
+        return max(0.0, 1.0 - len(self.events) / self.raw_event_count)
+
+    def callback_stats(self):
+        """Time spent inside listener callbacks, in microseconds (approximate)."""
+        n = self.callback_count
+        return {
+            'count': n,
+            'mean_us': (self.callback_ns_total / n / 1000.0) if n else 0.0,
+            'max_us': self.callback_ns_max / 1000.0,
+            'dropped': self.ring.dropped,
+        }
+
+    # --- Consumer side ---
+    def _consume(self):
+        while self.recording:
+            self.flush()
+            if self.log and time.monotonic() - self._last_spill >= self.stream_interval:
+                self.spill()
+            time.sleep(self.DRAIN_INTERVAL)
+
+    def spill(self):
+        """Appends buffered events to the stream log and frees them from memory."""
+        with self._drain_lock:
+            self.log.append(self.events)
+            self.events = EventStore()
+            self._last_spill = time.monotonic()
+
+    def _finish_log(self):
+        """Closes the stream log cleanly and reloads the full session from it."""
+        self.spill()
+        self.log.close()
+        self.events, _ = read_log(self.log.path)
+        try: os.remove(self.log.path)
+        except OSError: pass
+        self.log = None
+
+    def flush(self):
+        """Drains the ring and normalizes raw callback records into self.events."""
+        with self._drain_lock:
+            for _, t_ns, kind, a, b, c, d in self.ring.drain():
+                if kind >= _KEY_PRESS and a in self.ignore_keys: continue
+                t = (t_ns - self.start_ns) / 1e9
+                self.raw_event_count += 1
+                if kind == _MOVE:
+                    self._store(t, "move", x=a, y=b)
+                elif kind == _CLICK:
+                    self._store(t, "click", x=a, y=b, button=str(c).replace('Button.', ''), pressed=d)
+                elif kind == _SCROLL:
+                    self._store(t, "scroll", x=a, y=b, dx=c, dy=d)
+                else:
+                    try: k = a.char
+                    except: k = str(a)
+                    self._store(t, "key_press" if kind == _KEY_PRESS else "key_release", key=k)
+
     def _add_event(self, type, **kwargs):
+        """Stores one event stamped now (synchronous path, bypasses the ring)."""
         if not self.recording: return
-        event = {
-            "type": type,
-            "time": time.time() - self.start_time,
-            **kwargs
-        }
-        self.events.append(event)
+        self.raw_event_count += 1
+        self._store((time.perf_counter_ns() - self.start_ns) / 1e9, type, **kwargs)
+
+    def _store(self, t, type, **kwargs):
+        if type == "move":
+            self._add_move(t, kwargs['x'], kwargs['y'])
+            return
+        if self._pending_move:
+            # Keep the exact position the cursor rested at before this action
+            self.events.add("move", *self._pending_move)
+            self._pending_move = None
+        self.events.add(type, t, **kwargs)
+
+    def _add_move(self, t, x, y):
+        last = self._last_move
+        if last is not None and (
+            t - last[0] < self.min_move_interval
+            or math.hypot(x - last[1], y - last[2]) < self.min_move_distance
+        ):
+            self._pending_move = (t, x, y)
+            return
+        self._pending_move = None
+        self._last_move = (t, x, y)
+        self.events.add("move", t, x=x, y=y)
+
+    # --- Listener callbacks (hook path: stamp, enqueue, return) ---
+    def _push(self, kind, a, b=None, c=None, d=None):
+        t0 = time.perf_counter_ns()
+        self.ring.push(t0, kind, a, b, c, d)
+        cost = time.perf_counter_ns() - t0
+        self.callback_count += 1
+        self.callback_ns_total += cost
+        if cost > self.callback_ns_max: self.callback_ns_max = cost
 
     def on_move(self, x, y):
-        self._add_event("move", x=x, y=y)
+        if self.recording: self._push(_MOVE, x, y)
 
     def on_click(self, x, y, button, pressed):
-        btn_str = str(button).replace('Button.', '')
-        self._add_event("click", x=x, y=y, button=btn_str, pressed=pressed)
+        if self.recording: self._push(_CLICK, x, y, button, pressed)
 
     def on_scroll(self, x, y, dx, dy):
-        self._add_event("scroll", x=x, y=y, dx=dx, dy=dy)
+        if self.recording: self._push(_SCROLL, x, y, dx, dy)
         
     def on_press(self, key):
-        if key in self.ignore_keys: return
-        try: k = key.char
-        except: k = str(key)
-        self._add_event("key_press", key=k)
+        if self.recording: self._push(_KEY_PRESS, key)
 
     def on_release(self, key):
-        if key in self.ignore_keys: return
-        try: k = key.char
-        except: k = str(key)
-        self._add_event("key_release", key=k)
+        if self.recording: self._push(_KEY_RELEASE, key)
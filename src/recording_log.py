@@ -0,0 +1,175 @@
+"""
+Append-only on-disk log for streaming recordings (.acpl).
+
+    header  magic 'ACPL', version u16
+    frames  payload length u32, crc32 u32, payload (macro_file.encode_block)
+    end     END_FRAME (zero length + 'ACPE') written on a clean close
+
+A crash leaves a log without the end frame, possibly with a torn last
+frame; read_log() keeps every frame whose length and CRC check out. Log
+names carry the writer's pid, so a log another running instance is still
+writing is never mistaken for a crashed one.
+"""
+import glob
+import os
+import re
+import sys
+import struct
+import time
+import zlib
+from src.event_store import EventStore
+from src.macro_file import encode_block, decode_block
+
+MAGIC = b'ACPL'
+VERSION = 1
+LOG_EXT = '.acpl'
+RECOVERED_EXT = '.recovered'
+RECOVERED_MAX_AGE = 7 * 24 * 3600  # seconds a recovered log is kept
+
+_PID = re.compile(r'-(\d+)' + re.escape(LOG_EXT) + '$')
+
+_HEADER = struct.Struct('<4sH')
+_FRAME = struct.Struct('<II')
+END_FRAME = b'\0\0\0\0ACPE'
+
+
+class RecordingLog:
+    def __init__(self, path, fsync_interval=1.0):
+        """
+        Creates a new log at `path`. Frames are flushed to the OS on every
+        append; fsync is batched to at most once per `fsync_interval` seconds.
+        """
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.frames = 0
+        self.events = 0
+        self.fsyncs = 0
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._last_sync = time.monotonic()
+
+    def append(self, events):
+        if not len(events): return
+        payload = encode_block(events)
+        self._file.write(_FRAME.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+        self.frames += 1
+        self.events += len(events)
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file.closed: return
+        self._file.write(END_FRAME)
+        self._file.flush()
+        self._sync()
+        self._file.close()
+
+
+def read_log(path):
+    """Returns (EventStore, clean) with every intact frame of the log."""
+    store = EventStore()
+    clean = False
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size or data[:4] != MAGIC:
+        return store, False
+
+    pos = _HEADER.size
+    while pos + _FRAME.size <= len(data):
+        if data[pos:pos + _FRAME.size] == END_FRAME:
+            clean = True
+            break
+        length, crc = _FRAME.unpack_from(data, pos)
+        pos += _FRAME.size
+        if not length: break
+        payload = data[pos:pos + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break # torn or corrupt tail
+        store.extend(decode_block(payload))
+        pos += length
+    return store, clean
+
+
+def new_log_path(directory):
+    return os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S") + f"-{os.getpid()}{LOG_EXT}")
+
+
+def pid_alive(pid):
+    """True if a process with this pid is running (or can't be checked)."""
+    if pid == os.getpid(): return True
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # access denied: it exists
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # e.g. EPERM: someone else's process
+    return True
+
+
+def writer_alive(path):
+    """True if the process that created the log (per its name) is still running."""
+    m = _PID.search(os.path.basename(path))
+    return bool(m) and pid_alive(int(m.group(1)))
+
+
+def unfinished_logs(directory, include_live=False):
+    """
+    Logs in `directory` that were never closed cleanly, newest first. Logs
+    whose writer is still running are skipped unless include_live is set.
+    """
+    found = []
+    for path in glob.glob(os.path.join(directory, '*' + LOG_EXT)):
+        if not include_live and writer_alive(path):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size >= _HEADER.size + len(END_FRAME):
+                    f.seek(size - len(END_FRAME))
+                    if f.read(len(END_FRAME)) == END_FRAME:
+                        continue
+        except OSError:
+            continue
+        found.append(path)
+    found.sort(key=os.path.getmtime, reverse=True)
+    return found
+
+
+def mark_recovered(path):
+    """Renames a log so it isn't offered again; prune_recovered() deletes it later."""
+    os.replace(path, path + RECOVERED_EXT)
+    os.utime(path + RECOVERED_EXT)  # the age counts from recovery
+
+
+def prune_recovered(directory, max_age=RECOVERED_MAX_AGE):
+    """Deletes recovered logs older than max_age seconds; returns how many."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in glob.glob(os.path.join(directory, '*' + LOG_EXT + RECOVERED_EXT)):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,176 @@
+"""
+Text entry strategies for Type Text steps and the AI TYPE action.
+
+    interval - pyautogui.write with a pause between characters (the old
+               behaviour, 50 ms by default)
+    batched  - every character injected back-to-back through pynput
+    rate     - pynput, one character every 1/cps seconds on absolute
+               deadlines, for apps that drop input arriving too fast
+    paste    - copy the text, press Ctrl+V (Cmd+V on macOS), then put the
+               previous clipboard text back
+
+pyperclip only reads text, so a clipboard holding an image or other non-text
+content reads as empty and could not be put back. When the clipboard reads as
+empty, paste asks the platform whether it holds anything at all: an empty
+clipboard is restored as empty, one with other content raises ClipboardError
+instead of being erased.
+
+pyautogui.write silently skips characters without a key on a US layout, so
+'interval' types text like 'café' or '你好' through pynput at the same pace
+instead. pynput types any Unicode character it can map; when the keyboard
+layout can't produce one, 'batched' and 'rate' paste the rest of the text.
+"""
+import os
+import subprocess
+import sys
+import time
+from src.timing import wait_until
+
+MODES = ('interval', 'batched', 'rate', 'paste')
+DEFAULT_INTERVAL = 0.05
+DEFAULT_CPS = 20.0
+PASTE_DELAY = 0.15  # time the target app gets to read the clipboard before it's restored
+
+
+class ClipboardError(RuntimeError):
+    pass
+
+
+def can_write(text):
+    """True if pyautogui.write types every character of `text`."""
+    return all(' ' <= c <= '~' or c in '\n\t' for c in text)
+
+
+def _keyboard():
+    from pynput.keyboard import Controller
+    return Controller()
+
+
+def _gui():
+    import pyautogui
+    return pyautogui
+
+
+def _type_rate(text, keyboard, cps, stop_event):
+    """Types one character per 1/cps seconds; returns how many were typed before a stop."""
+    period = 1.0 / cps
+    start = time.perf_counter()
+    for i, ch in enumerate(text):
+        if i and not wait_until(start + i * period, stop_event):
+            return i
+        try:
+            keyboard.type(ch)
+        except keyboard.InvalidCharacterException:
+            raise keyboard.InvalidCharacterException(i, ch)
+    return len(text)
+
+
+def _clipboard_empty():
+    """True/False where the platform can tell if the clipboard holds anything at all, else None."""
+    if sys.platform == 'win32':
+        import ctypes
+        return ctypes.windll.user32.CountClipboardFormats() == 0
+    if sys.platform == 'darwin':
+        cmd = ['osascript', '-e', 'clipboard info']
+    elif os.environ.get('WAYLAND_DISPLAY'):
+        cmd = ['wl-paste', '--list-types']
+    else:
+        cmd = ['xclip', '-selection', 'clipboard', '-t', 'TARGETS', '-o']
+    try:
+        # Each lists the clipboard's formats and prints nothing when it is empty
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=1.0).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return not out.strip()
+
+
+def paste_text(text, gui, paste_delay=PASTE_DELAY):
+    """
+    Pastes `text` through the clipboard and restores the clipboard's previous
+    text (an empty clipboard is left empty). Raises ClipboardError, leaving
+    the clipboard alone, when it holds content other than text.
+    """
+    import pyperclip
+    try:
+        previous = pyperclip.paste()
+    except pyperclip.PyperclipException:
+        previous = None
+    if not previous and _clipboard_empty() is False:
+        raise ClipboardError("Paste mode would erase the clipboard: it holds no text (maybe an image "
+                             "or other content). Copy some text or choose another typing mode.")
+    pyperclip.copy(text)
+    try:
+        gui.hotkey('command' if sys.platform == 'darwin' else 'ctrl', 'v')
+        time.sleep(paste_delay)
+    finally:
+        pyperclip.copy(previous or '')
+    return len(text)
+
+
+def type_text(text, mode='interval', interval=DEFAULT_INTERVAL, cps=DEFAULT_CPS,
+              keyboard=None, gui=None, stop_event=None, paste_delay=PASTE_DELAY):
+    """
+    Types `text` with one of MODES. keyboard is a pynput keyboard Controller
+    and gui the pyautogui module; either is created on first use if not
+    given. Returns {'mode', 'chars', 'seconds', 'cps', 'fallback'}, where
+    fallback names the strategy that took over (None if there was none).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown typing mode: {mode}")
+    fallback = None
+    typed = 0
+    start = time.perf_counter()
+    try:
+        if mode == 'interval' and can_write(text):
+            gui = gui or _gui()
+            gui.write(text, interval=interval)
+            typed = len(text)
+        elif mode == 'paste':
+            gui = gui or _gui()
+            typed = paste_text(text, gui, paste_delay)
+        else:
+            keyboard = keyboard or _keyboard()
+            if mode == 'interval':
+                fallback = 'rate' if interval > 0 else 'batched'
+                cps = 1.0 / interval if interval > 0 else None
+            elif mode == 'batched':
+                cps = None
+            if cps:
+                typed = _type_rate(text, keyboard, cps, stop_event)
+            else:
+                keyboard.type(text)
+                typed = len(text)
+    except Exception as e:
+        # pynput raises InvalidCharacterException(index, character) for characters the layout lacks
+        if keyboard is None or not isinstance(e, keyboard.InvalidCharacterException):
+            raise
+        done = e.args[0] if e.args and isinstance(e.args[0], int) else 0
+        fallback = 'paste'
+        typed = done + paste_text(text[done:], gui or _gui(), paste_delay)
+    seconds = time.perf_counter() - start
+    return {'mode': mode, 'chars': typed, 'seconds': seconds,
+            'cps': typed / seconds if seconds > 0 else 0.0, 'fallback': fallback}
+
+
+def format_typing_result(r):
+    note = f", fell back to {r['fallback']}" if r['fallback'] else ""
+    return f"{r['mode']}: {r['chars']} chars in {r['seconds']:.3f}s ({r['cps']:.0f} chars/s{note})"
+
+
+def main(argv=None):
+    """Types a sample with each mode into the focused field and prints the measured rates."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m src.text_entry", description=main.__doc__)
+    parser.add_argument('--text', default="The quick brown fox jumps over the lazy dog. Café, naïve, 你好.\n")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--cps', type=float, default=200.0, help="rate for the 'rate' mode")
+    parser.add_argument('--delay', type=float, default=3.0, help="seconds to focus a text field first")
+    args = parser.parse_args(argv)
+    time.sleep(args.delay)
+    for mode in args.modes:
+        print(format_typing_result(type_text(args.text, mode, cps=args.cps)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
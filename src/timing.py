@@ -0,0 +1,30 @@
+import time
+
+# Below this much remaining time we stop sleeping and spin on perf_counter.
+# OS sleep granularity is ~1ms on Linux/macOS and up to ~15ms on Windows
+# without a raised timer resolution, so a short spin tail keeps deadlines tight.
+SPIN_THRESHOLD = 0.002
+# Longest single sleep so a stop request is noticed quickly
+MAX_SLEEP_SLICE = 0.05
+
+
+def wait_until(deadline: float, stop_event=None) -> bool:
+    """
+    Block until time.perf_counter() reaches `deadline` (sleep, then spin).
+    Returns False if `stop_event` was set while waiting, True otherwise.
+    """
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            return False
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return True
+        if remaining > SPIN_THRESHOLD:
+            time.sleep(min(remaining - SPIN_THRESHOLD, MAX_SLEEP_SLICE))
+
+
+def percentile(sorted_vals, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0.0 if empty)."""
+    if not sorted_vals: return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(pct / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
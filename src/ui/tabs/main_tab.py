@@ -5,7 +5,8 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, Signal, QThread, Slot
 import threading
-from src.clicker import Clicker
+from src.clicker import Clicker, parse_points
+from src.loopback import LoopbackMeter, format_report
 
 class ClickerThread(QThread):
     """
@@ -28,6 +29,29 @@ class ClickerThread(QThread):
         finally:
             self.finished.emit()
 
+class MeasureThread(QThread):
+    """
+    Runs a loopback CPS measurement so the listener and clicker don't block the GUI.
+    """
+    finished = Signal()
+    error = Signal(str)
+    report_ready = Signal(str)
+
+    def __init__(self, meter, config, duration):
+        super().__init__()
+        self.meter = meter
+        self.config = config
+        self.duration = duration
+
+    def run(self):
+        try:
+            report = self.meter.run(self.config, self.duration)
+            self.report_ready.emit(format_report(report))
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+
 class MainTab(QWidget):
     # Signals for UI updates from hotkeys
     status_changed = Signal(bool)
@@ -110,8 +134,73 @@ class MainTab(QWidget):
         mode_layout.addWidget(self.radio_hold)
         kb_layout.addLayout(mode_layout)
 
+        # Typematic hold settings (only used in Hold mode)
+        hold_layout = QHBoxLayout()
+        self.spin_hold_dur = self.create_spinbox("Hold ms (0 = until stop)", 0, 3600000, 0)
+        self.spin_hold_delay = self.create_spinbox("Repeat Delay ms", 0, 5000, 0)
+        self.spin_hold_rate = self.create_spinbox("Repeat Rate /s", 0, 1000, 33)
+        hold_layout.addWidget(self.spin_hold_dur)
+        hold_layout.addWidget(self.spin_hold_delay)
+        hold_layout.addWidget(self.spin_hold_rate)
+        kb_layout.addLayout(hold_layout)
+
+        self.lbl_hold_stats = QLabel("")
+        self.lbl_hold_stats.setObjectName("SectionLabel")
+        kb_layout.addWidget(self.lbl_hold_stats)
+
         layout.addWidget(kb_group)
 
+        # --- Pattern Group ---
+        self.pattern_group = QGroupBox("Pattern Mode (Mouse only, replaces the interval)")
+        pattern_layout = QVBoxLayout(self.pattern_group)
+
+        pattern_opts = QHBoxLayout()
+        self.combo_pattern = QComboBox()
+        self.combo_pattern.addItems(["Off", "List", "Grid", "Path"])
+        self.combo_pattern.currentTextChanged.connect(self.update_pattern_inputs)
+        self.combo_order = QComboBox()
+        self.combo_order.addItems(["Sequential", "Snake", "Random"])
+        self.combo_order.setToolTip("Snake alternates grid rows / walks lists and paths back and forth;\n"
+                                    "Random reshuffles the points every pass")
+        pattern_opts.addWidget(QLabel("Pattern:", objectName="SectionLabel"))
+        pattern_opts.addWidget(self.combo_pattern)
+        pattern_opts.addWidget(QLabel("Order:", objectName="SectionLabel"))
+        pattern_opts.addWidget(self.combo_order)
+        self.spin_dwell = self.create_spinbox("Dwell ms per point", 0, 60000, 100)
+        self.spin_passes = self.create_spinbox("Passes (0 = until stop)", 0, 1000000, 0)
+        pattern_opts.addWidget(self.spin_dwell)
+        pattern_opts.addWidget(self.spin_passes)
+        pattern_layout.addLayout(pattern_opts)
+
+        # List / Path: the points, plus the resampling step for a path
+        self.pattern_points = QWidget()
+        points_layout = QHBoxLayout(self.pattern_points)
+        points_layout.setContentsMargins(0, 0, 0, 0)
+        self.input_points = QLineEdit()
+        self.input_points.setPlaceholderText("x,y; x,y; ... e.g. 100,200; 300,200; 300,400")
+        points_layout.addWidget(self.input_points)
+        self.spin_path_step = self.create_spinbox("Path step px", 0, 5000, 20)
+        points_layout.addWidget(self.spin_path_step)
+        pattern_layout.addWidget(self.pattern_points)
+
+        # Grid: origin, spacing and size
+        self.pattern_grid = QWidget()
+        grid_layout = QHBoxLayout(self.pattern_grid)
+        grid_layout.setContentsMargins(0, 0, 0, 0)
+        self.spin_grid_x = self.create_spinbox("Origin X", -10000, 10000, 100)
+        self.spin_grid_y = self.create_spinbox("Origin Y", -10000, 10000, 100)
+        self.spin_grid_dx = self.create_spinbox("Spacing X", 1, 5000, 50)
+        self.spin_grid_dy = self.create_spinbox("Spacing Y", 1, 5000, 50)
+        self.spin_grid_cols = self.create_spinbox("Cols", 1, 1000, 3)
+        self.spin_grid_rows = self.create_spinbox("Rows", 1, 1000, 3)
+        for w in (self.spin_grid_x, self.spin_grid_y, self.spin_grid_dx,
+                  self.spin_grid_dy, self.spin_grid_cols, self.spin_grid_rows):
+            grid_layout.addWidget(w)
+        pattern_layout.addWidget(self.pattern_grid)
+
+        layout.addWidget(self.pattern_group)
+        self.update_pattern_inputs(self.combo_pattern.currentText())
+
         # --- Action Buttons ---
         action_layout = QHBoxLayout()
         self.btn_start = QPushButton("Start (F6)")
@@ -120,8 +209,19 @@ class MainTab(QWidget):
         self.btn_start.clicked.connect(self.toggle_clicking)
         
         action_layout.addWidget(self.btn_start)
+
+        self.btn_measure = QPushButton("Measure CPS (5s)")
+        self.btn_measure.setMinimumHeight(50)
+        self.btn_measure.setToolTip("Run the current settings for 5 seconds and report the rate the OS actually receives")
+        self.btn_measure.clicked.connect(self.start_measure)
+        action_layout.addWidget(self.btn_measure)
         layout.addLayout(action_layout)
 
+        self.lbl_measure = QLabel("")
+        self.lbl_measure.setObjectName("SectionLabel")
+        self.lbl_measure.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.lbl_measure)
+
         layout.addStretch()
 
     def create_spinbox(self, label_text, min_val, max_val, default_val):
@@ -141,6 +241,34 @@ class MainTab(QWidget):
         layout.addWidget(spinbox)
         return widget
 
+    def update_pattern_inputs(self, kind):
+        """Shows only the inputs the selected pattern kind uses."""
+        self.combo_order.setEnabled(kind != "Off")
+        self.spin_dwell.setEnabled(kind != "Off")
+        self.spin_passes.setEnabled(kind != "Off")
+        self.pattern_points.setVisible(kind in ("List", "Path"))
+        self.spin_path_step.setVisible(kind == "Path")
+        self.pattern_grid.setVisible(kind == "Grid")
+
+    def build_pattern(self, kind) -> dict:
+        """compile_pattern spec from the pattern inputs; raises ValueError for unusable points."""
+        value = lambda w: w.findChild(QSpinBox).value()
+        if kind == 'grid':
+            return {
+                'kind': 'grid',
+                'origin': [value(self.spin_grid_x), value(self.spin_grid_y)],
+                'spacing': [value(self.spin_grid_dx), value(self.spin_grid_dy)],
+                'cols': value(self.spin_grid_cols),
+                'rows': value(self.spin_grid_rows),
+            }
+        points = parse_points(self.input_points.text())
+        if not points:
+            raise ValueError("Pattern needs at least one point")
+        spec = {'kind': kind, 'points': points}
+        if kind == 'path':
+            spec['step'] = value(self.spin_path_step)
+        return spec
+
     def get_interval_seconds(self) -> float:
         h = self.spin_hours.findChild(QSpinBox).value()
         m = self.spin_mins.findChild(QSpinBox).value()
@@ -155,9 +283,7 @@ class MainTab(QWidget):
         else:
             self.stop_clicking()
 
-    def start_clicking(self):
-        if self.is_running: return
-
+    def build_config(self) -> dict:
         interval = self.get_interval_seconds()
         if interval <= 0: interval = 0.01
 
@@ -170,9 +296,32 @@ class MainTab(QWidget):
             'mouse_btn': self.combo_button.currentText().lower(),
             'click_type': self.combo_type.currentText().lower(),
             'key': kb_key if is_kb else None,
-            'key_mode': 'hold' if self.radio_hold.isChecked() else 'press'
+            'key_mode': 'hold' if self.radio_hold.isChecked() else 'press',
+            'hold_dur': self.spin_hold_dur.findChild(QSpinBox).value(),
+            'hold_delay': self.spin_hold_delay.findChild(QSpinBox).value(),
+            'hold_rate': self.spin_hold_rate.findChild(QSpinBox).value()
         }
+        kind = self.combo_pattern.currentText().lower()
+        if kind != 'off' and not is_kb:
+            config['pattern'] = self.build_pattern(kind)
+            config['order'] = self.combo_order.currentText().lower()
+            config['dwell'] = self.spin_dwell.findChild(QSpinBox).value()
+            config['passes'] = self.spin_passes.findChild(QSpinBox).value()
+        return config
+
+    def config_or_report(self):
+        """build_config(), or None after showing why the settings can't run."""
+        try:
+            return self.build_config()
+        except ValueError as e:
+            self.lbl_measure.setText(str(e))
+            return None
+
+    def start_clicking(self):
+        if self.is_running: return
 
+        config = self.config_or_report()
+        if config is None: return
         self.stop_event.clear()
         self.clicker = Clicker(self.stop_event)
         
@@ -183,6 +332,23 @@ class MainTab(QWidget):
 
         self.status_changed.emit(True)
 
+    def start_measure(self):
+        if self.is_running: return
+
+        config = self.config_or_report()
+        if config is None: return
+        self.stop_event.clear()
+        self.clicker = None
+        self.lbl_measure.setText("Measuring...")
+
+        self.clicker_thread = MeasureThread(LoopbackMeter(self.stop_event), config, 5.0)
+        self.clicker_thread.report_ready.connect(self.lbl_measure.setText)
+        self.clicker_thread.error.connect(lambda e: self.lbl_measure.setText(f"Measurement failed: {e}"))
+        self.clicker_thread.finished.connect(self.on_thread_finished)
+        self.clicker_thread.start()
+
+        self.status_changed.emit(True)
+
     def stop_clicking(self):
         if not self.is_running: return
         self.stop_event.set()
@@ -190,6 +356,12 @@ class MainTab(QWidget):
 
     def on_thread_finished(self):
         self.status_changed.emit(False)
+        stats = self.clicker.hold_stats if self.clicker else None
+        if stats:
+            self.lbl_hold_stats.setText(
+                f"Hold: {stats['repeats']} repeats, {stats['achieved_rate']:.1f}/s "
+                f"(target {stats['target_rate']:.1f}/s)"
+            )
 
     def update_ui_state(self, is_running: bool):
         self.is_running = is_running
@@ -214,6 +386,8 @@ class MainTab(QWidget):
         self.input_kb_key.setEnabled(not is_running)
         self.radio_press.setEnabled(not is_running)
         self.radio_hold.setEnabled(not is_running)
-
-
-
+        self.btn_measure.setEnabled(not is_running)
+        self.spin_hold_dur.setEnabled(not is_running)
+        self.spin_hold_delay.setEnabled(not is_running)
+        self.spin_hold_rate.setEnabled(not is_running)
+        self.pattern_group.setEnabled(not is_running)
@@ -1,65 +1,147 @@
-import json
+import os
 import threading
-import time
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, 
-    QSlider, QListWidget, QPushButton, QFileDialog
+    QSlider, QListView, QPushButton, QFileDialog, QSpinBox, QDoubleSpinBox, QComboBox, QMessageBox
 )
-from PySide6.QtCore import Qt, Signal, QThread, Slot
+from PySide6.QtCore import Qt, Signal, QThread, Slot, QAbstractListModel, QModelIndex
+import numpy as np
+from src.event_store import EventStore
 from src.recorder import Recorder
-from pynput.mouse import Button, Controller as MouseController
-from pynput.keyboard import Controller as KeyboardController
+from src import macro_file, recording_log
+from src.paths import user_data_dir
+from src.player import MacroPlayer, format_lateness_report, iter_batches
+from src.path_engine import smooth_paths, EASINGS
 
 class MacroPlayerThread(QThread):
     finished = Signal()
     error = Signal(str)
+    report = Signal(object)
 
-    def __init__(self, events, speed_multiplier, stop_event):
+    def __init__(self, events, speed_multiplier, stop_event, smooth=None, start=0.0, path=None):
         super().__init__()
         self.events = events
         self.speed = speed_multiplier
+        self.start_at = start
+        self.smooth = smooth # path_engine.smooth_paths kwargs, or None
+        self.path = path # .acm file holding exactly `events`, streamed chunk by chunk
         self.stop_event = stop_event
-        self.mouse = MouseController()
-        self.keyboard = KeyboardController()
+        self.player = MacroPlayer(stop_event)
 
     def run(self):
         try:
             if not self.events: return
-            
-            last_time = self.events[0]['time']
-            for ev in self.events:
-                if self.stop_event.is_set(): break
-                
-                delay = ev['time'] - last_time
-                if delay > 0: 
-                    time.sleep(delay / self.speed)
-                last_time = ev['time']
-                
-                if self.stop_event.is_set(): break
-                
-                if ev['type'] == 'move':
-                    self.mouse.position = (ev['x'], ev['y'])
-                elif ev['type'] == 'click':
-                    self.mouse.position = (ev['x'], ev['y'])
-                    btn = getattr(Button, ev['button'], Button.left)
-                    if ev.get('pressed', False): 
-                        self.mouse.press(btn)
-                    else: 
-                        self.mouse.release(btn)
-                elif ev['type'] == 'scroll':
-                    self.mouse.position = (ev['x'], ev['y'])
-                    self.mouse.scroll(ev['dx'], ev['dy'])
-                elif ev['type'] == 'key_press':
-                    self.keyboard.press(ev['key'])
-                elif ev['type'] == 'key_release':
-                    self.keyboard.release(ev['key'])
-                    
+            if self.path and not self.smooth:
+                with macro_file.MacroReader(self.path) as reader:
+                    stats = self.player.play_chunks(reader.iter_chunks(), self.speed, start=self.start_at)
+            else:
+                events = smooth_paths(self.events, **self.smooth) if self.smooth else self.events
+                stats = self.player.play_chunks(iter_batches(events), self.speed, start=self.start_at)
+            self.report.emit(stats)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+
+
+class CompactThread(QThread):
+    """Compacts the recording (loop folding over the whole macro can take a second) off the GUI thread."""
+    finished = Signal()
+    error = Signal(str)
+    compacted = Signal(int, int)  # events before, after
+
+    def __init__(self, recorder, max_gap, fold):
+        super().__init__()
+        self.recorder = recorder
+        self.max_gap = max_gap
+        self.fold = fold
+
+    def run(self):
+        try:
+            before = len(self.recorder.original_events or self.recorder.events)
+            self.recorder.compact(self.max_gap, self.fold)
+            self.compacted.emit(before, len(self.recorder.events))
         except Exception as e:
             self.error.emit(str(e))
         finally:
             self.finished.emit()
 
 
+def format_event(i, ev):
+    info = f"{i:03d}: "
+    if ev['type'] == 'click':
+        action = 'Down' if ev.get('pressed') else 'Up'
+        info += f"Click {ev.get('button')} {action} at ({ev.get('x')}, {ev.get('y')})"
+    elif ev['type'] == 'key_press':
+        info += f"Key Press: {ev.get('key')}"
+    elif ev['type'] == 'key_release':
+        info += f"Key Release: {ev.get('key')}"
+    elif ev['type'] == 'scroll':
+        info += f"Scroll at ({ev.get('x')}, {ev.get('y')}) delta ({ev.get('dx')}, {ev.get('dy')})"
+    elif ev['type'] == 'move':
+        info += f"Move to ({ev.get('x')}, {ev.get('y')})"
+    elif ev['type'] == 'loop':
+        info += f"Loop: previous {ev.get('length')} events x{ev.get('count')}"
+    return info
+
+
+# Event list filters: label -> visible event types (None = everything)
+EVENT_FILTERS = {
+    "Actions": ('click', 'scroll', 'key_press', 'key_release', 'loop'),
+    "Clicks": ('click',),
+    "Keys": ('key_press', 'key_release'),
+    "Scrolls": ('scroll',),
+    "Moves": ('move',),
+    "All": None,
+}
+
+
+class EventListModel(QAbstractListModel):
+    """
+    Read-only list model over an EventStore. Only the visible row -> event
+    index mapping is materialized (one numpy pass over the kind column);
+    row text is formatted on demand for the rows the view actually paints.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = EventStore()
+        self.types = EVENT_FILTERS["Actions"]
+        self.rows = np.zeros(0, dtype=np.int64)
+
+    def set_events(self, events):
+        self.beginResetModel()
+        self.store = EventStore.from_dicts(events)
+        self._filter()
+        self.endResetModel()
+
+    def set_types(self, types):
+        self.beginResetModel()
+        self.types = types
+        self._filter()
+        self.endResetModel()
+
+    def _filter(self):
+        n = len(self.store)
+        if self.types is None:
+            self.rows = np.arange(n)
+            return
+        kind = np.frombuffer(self.store.column('kind'), dtype=np.uint16)
+        codes = [self.store.strings.index[t] for t in self.types if t in self.store.strings.index]
+        self.rows = np.flatnonzero(np.isin(kind, codes))
+
+    def event_index(self, row):
+        return int(self.rows[row])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid(): return None
+        i = self.event_index(index.row())
+        return format_event(i, self.store[i])
+
+
 class RecordTab(QWidget):
     status_changed = Signal(bool) # playing back
     recording_changed = Signal(bool) # active recording
@@ -69,6 +151,8 @@ class RecordTab(QWidget):
         
         self.recorder = Recorder()
         self.player_thread = None
+        self.compact_thread = None
+        self.macro_source = (None, None) # (.acm path, the events loaded from or saved to it)
         self.stop_event = threading.Event()
         
         self.is_playing = False
@@ -76,6 +160,7 @@ class RecordTab(QWidget):
         self.setup_ui()
         self.status_changed.connect(self.update_playback_ui)
         self.recording_changed.connect(self.update_recording_ui)
+        self.check_interrupted_recordings()
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -109,11 +194,30 @@ class RecordTab(QWidget):
         self.lbl_rec_status.setStyleSheet("font-size: 14px; color: #B0B0B0;")
         layout.addWidget(self.lbl_rec_status)
 
+        self.btn_recover = QPushButton("Recover Interrupted Recording")
+        self.btn_recover.setToolTip("Load events streamed to disk by a recording that crashed")
+        self.btn_recover.clicked.connect(self.recover_interrupted_recording)
+        self.btn_recover.setVisible(False)
+        layout.addWidget(self.btn_recover)
+
         # Options
         opts_layout = QHBoxLayout()
         self.chk_straight_line = QCheckBox("Global Smart Move") 
-        self.chk_straight_line.setToolTip("Interpolate mouse movements into straight lines (Visual placeholder)")
+        self.chk_straight_line.setToolTip("Replace recorded mouse paths between clicks with lines or curves, replayed at 250 Hz")
         opts_layout.addWidget(self.chk_straight_line)
+        self.combo_path_mode = QComboBox()
+        self.combo_path_mode.addItems(["Straight", "Curve", "Resample"])
+        self.combo_path_mode.setToolTip("Straight line, smooth curve through the recorded path, or the recorded path re-timed")
+        opts_layout.addWidget(self.combo_path_mode)
+        self.combo_easing = QComboBox()
+        self.combo_easing.addItems(list(EASINGS))
+        self.combo_easing.setCurrentText("ease_in_out")
+        opts_layout.addWidget(self.combo_easing)
+
+        self.chk_stream = QCheckBox("Stream to Disk")
+        self.chk_stream.setToolTip("Write the recording to disk every second so a crash or very long session loses nothing")
+        self.chk_stream.setChecked(True)
+        opts_layout.addWidget(self.chk_stream)
         
         opts_layout.addStretch()
         
@@ -129,8 +233,75 @@ class RecordTab(QWidget):
         
         layout.addLayout(opts_layout)
 
+        # Move decimation (applied while recording) and path simplification (on stop / save)
+        dec_layout = QHBoxLayout()
+        dec_layout.addWidget(QLabel("Min Move (ms):"))
+        self.spin_min_move_ms = QSpinBox()
+        self.spin_min_move_ms.setRange(0, 1000)
+        self.spin_min_move_ms.setToolTip("Drop mouse moves closer together in time than this")
+        dec_layout.addWidget(self.spin_min_move_ms)
+        dec_layout.addWidget(QLabel("Min Move (px):"))
+        self.spin_min_move_px = QSpinBox()
+        self.spin_min_move_px.setRange(0, 100)
+        self.spin_min_move_px.setToolTip("Drop mouse moves closer together in distance than this")
+        dec_layout.addWidget(self.spin_min_move_px)
+        dec_layout.addWidget(QLabel("Simplify (px):"))
+        self.spin_simplify = QDoubleSpinBox()
+        self.spin_simplify.setRange(0.0, 50.0)
+        self.spin_simplify.setSingleStep(0.5)
+        self.spin_simplify.setToolTip("Ramer-Douglas-Peucker error bound applied to mouse paths on stop and save (0 = off)")
+        dec_layout.addWidget(self.spin_simplify)
+        dec_layout.addStretch()
+        layout.addLayout(dec_layout)
+
+        # Compaction: cap idle gaps and fold repeated sequences into loops
+        compact_layout = QHBoxLayout()
+        compact_layout.addWidget(QLabel("Max Idle (s):"))
+        self.spin_max_idle = QDoubleSpinBox()
+        self.spin_max_idle.setRange(0.0, 600.0)
+        self.spin_max_idle.setValue(2.0)
+        self.spin_max_idle.setToolTip("Shorten pauses longer than this when compacting (0 = keep pauses)")
+        compact_layout.addWidget(self.spin_max_idle)
+        self.chk_fold_loops = QCheckBox("Fold Loops")
+        self.chk_fold_loops.setChecked(True)
+        self.chk_fold_loops.setToolTip("Replace repeated click/key sequences with a single loop")
+        compact_layout.addWidget(self.chk_fold_loops)
+        self.btn_compact = QPushButton("Compact")
+        self.btn_compact.clicked.connect(self.compact_macro)
+        compact_layout.addWidget(self.btn_compact)
+        self.btn_restore = QPushButton("Restore Original")
+        self.btn_restore.clicked.connect(self.restore_macro)
+        compact_layout.addWidget(self.btn_restore)
+        compact_layout.addStretch()
+        layout.addLayout(compact_layout)
+
+        # Scrub: start playback part-way through the macro
+        seek_layout = QHBoxLayout()
+        seek_layout.addWidget(QLabel("Start At:"))
+        self.slider_seek = QSlider(Qt.Horizontal)
+        self.slider_seek.setRange(0, 0)
+        self.slider_seek.setToolTip("Playback starts here; held keys and buttons are restored")
+        self.lbl_seek_val = QLabel("0:00.0")
+        self.slider_seek.valueChanged.connect(lambda v: self.lbl_seek_val.setText(self.format_seek(v)))
+        seek_layout.addWidget(self.slider_seek)
+        seek_layout.addWidget(self.lbl_seek_val)
+        layout.addLayout(seek_layout)
+
         # Event List Display
-        self.list_events = QListWidget()
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Show:"))
+        self.combo_event_filter = QComboBox()
+        self.combo_event_filter.addItems(list(EVENT_FILTERS))
+        self.combo_event_filter.currentTextChanged.connect(
+            lambda label: self.event_model.set_types(EVENT_FILTERS[label]))
+        filter_layout.addWidget(self.combo_event_filter)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        self.event_model = EventListModel(self)
+        self.list_events = QListView()
+        self.list_events.setUniformItemSizes(True)
+        self.list_events.setModel(self.event_model)
         layout.addWidget(self.list_events)
 
         # Play Button
@@ -140,9 +311,53 @@ class RecordTab(QWidget):
         self.btn_play_macro.clicked.connect(self.toggle_playback)
         layout.addWidget(self.btn_play_macro)
 
+    def interrupted_logs(self):
+        """Stream logs left by crashed sessions (not ones another instance is writing), newest first."""
+        try:
+            directory = user_data_dir('recordings')
+            recording_log.prune_recovered(directory)
+            return recording_log.unfinished_logs(directory)
+        except OSError:
+            return []
+
+    def check_interrupted_recordings(self):
+        """Offers recovery when crashed sessions left logs behind; nothing is loaded or renamed here."""
+        logs = self.interrupted_logs()
+        self.btn_recover.setVisible(bool(logs))
+        if logs:
+            self.btn_recover.setText("Recover Interrupted Recording" + (f" ({len(logs)})" if len(logs) > 1 else ""))
+
+    def recover_interrupted_recording(self):
+        """Loads the newest crash log; older ones stay offered until they are recovered too."""
+        logs = self.interrupted_logs()
+        if not logs:
+            self.check_interrupted_recordings()
+            return
+        if len(self.recorder.events) and QMessageBox.question(
+                self, "Recover Recording", "Replace the current events with the recovered recording?"
+        ) != QMessageBox.StandardButton.Yes:
+            return
+        path = logs[0]
+        try:
+            events, _ = recording_log.read_log(path)
+            recording_log.mark_recovered(path)
+        except OSError as e:
+            self.lbl_rec_status.setText(f"Could not recover {os.path.basename(path)}: {e}")
+            self.lbl_rec_status.setStyleSheet("color: #EF4444;")
+            return
+        self.recorder.events = events
+        self.refresh_rec_list()
+        self.lbl_rec_status.setText(f"Recovered {len(events)} events from an interrupted recording - save them now")
+        self.lbl_rec_status.setStyleSheet("color: #F59E0B;")
+        self.check_interrupted_recordings()
+
     def toggle_recording(self):
         if not self.recorder.recording:
             # Start
+            self.recorder.min_move_interval = self.spin_min_move_ms.value() / 1000.0
+            self.recorder.min_move_distance = self.spin_min_move_px.value()
+            self.recorder.simplify_epsilon = self.spin_simplify.value()
+            self.recorder.stream_dir = user_data_dir('recordings') if self.chk_stream.isChecked() else None
             self.recorder.start()
             self.recording_changed.emit(True)
         else:
@@ -162,7 +377,14 @@ class RecordTab(QWidget):
         self.stop_event.clear()
         
         speed = self.slider_speed.value() / 10.0
-        self.player_thread = MacroPlayerThread(self.recorder.events, speed, self.stop_event)
+        smooth = None
+        if self.chk_straight_line.isChecked():
+            smooth = {'mode': self.combo_path_mode.currentText().lower(), 'easing': self.combo_easing.currentText()}
+        start = self.slider_seek.value() / 1000.0
+        path, events = self.macro_source
+        path = path if events is self.recorder.events else None
+        self.player_thread = MacroPlayerThread(self.recorder.events, speed, self.stop_event, smooth, start, path)
+        self.player_thread.report.connect(self.on_playback_report)
         self.player_thread.finished.connect(self.on_playback_finished)
         self.player_thread.start()
         
@@ -176,6 +398,10 @@ class RecordTab(QWidget):
     def on_playback_finished(self):
         self.status_changed.emit(False)
 
+    def on_playback_report(self, stats):
+        self.lbl_rec_status.setText(format_lateness_report(stats))
+        self.lbl_rec_status.setStyleSheet("color: #B0B0B0;")
+
     def update_recording_ui(self, is_recording):
         if is_recording:
             self.btn_rec.setText("STOP RECORDING (F7)")
@@ -185,7 +411,12 @@ class RecordTab(QWidget):
         else:
             self.btn_rec.setText("RECORD (F7)")
             count = len(self.recorder.events)
-            self.lbl_rec_status.setText(f"Recorded {count} events ({count} operations)")
+            raw = self.recorder.raw_event_count
+            hook = self.recorder.callback_stats()
+            self.lbl_rec_status.setText(
+                f"Recorded {count} events from {raw} raw ({self.recorder.reduction_ratio():.0%} reduced), "
+                f"hook avg {hook['mean_us']:.1f}us / max {hook['max_us']:.1f}us"
+            )
             self.lbl_rec_status.setStyleSheet("color: #10B981;") # green success
             self.btn_play_macro.setEnabled(True)
             
@@ -203,42 +434,91 @@ class RecordTab(QWidget):
         self.btn_play_macro.style().unpolish(self.btn_play_macro)
         self.btn_play_macro.style().polish(self.btn_play_macro)
 
+    @staticmethod
+    def format_seek(ms):
+        return f"{ms // 60000}:{ms % 60000 / 1000:04.1f}"
+
+    def update_seek_range(self):
+        events = self.recorder.events
+        duration = events[-1]['time'] - events[0]['time'] if len(events) else 0.0
+        self.slider_seek.setRange(0, int(duration * 1000))
+        self.slider_seek.setValue(0)
+
     def refresh_rec_list(self):
-        self.list_events.clear()
-        for i, ev in enumerate(self.recorder.events):
-            if ev['type'] == 'move': continue # Ignore spammy moves for visualization
-            
-            # Format visual log
-            info = f"{i:03d}: "
-            if ev['type'] == 'click':
-                action = 'Down' if ev.get('pressed') else 'Up'
-                info += f"Click {ev.get('button')} {action} at ({ev.get('x')}, {ev.get('y')})"
-            elif ev['type'] == 'key_press':
-                info += f"Key Press: {ev.get('key')}"
-            elif ev['type'] == 'key_release':
-                info += f"Key Release: {ev.get('key')}"
-            elif ev['type'] == 'scroll':
-                info += f"Scroll at ({ev.get('x')}, {ev.get('y')}) delta ({ev.get('dx')}, {ev.get('dy')})"
-                
-            self.list_events.addItem(info)
+        self.update_seek_range()
+        self.event_model.set_events(self.recorder.events)
         self.list_events.scrollToBottom()
 
+    def compact_macro(self):
+        if not self.recorder.events or self.compact_thread is not None: return
+        max_gap = self.spin_max_idle.value() or None
+        self.compact_thread = CompactThread(self.recorder, max_gap, self.chk_fold_loops.isChecked())
+        self.compact_thread.compacted.connect(self.on_compacted)
+        self.compact_thread.error.connect(self.on_compact_error)
+        self.compact_thread.finished.connect(self.on_compact_finished)
+        self.btn_compact.setEnabled(False)
+        self.btn_restore.setEnabled(False)
+        self.lbl_rec_status.setText("Compacting...")
+        self.lbl_rec_status.setStyleSheet("color: #B0B0B0;")
+        self.compact_thread.start()
+
+    def on_compacted(self, before, after):
+        self.lbl_rec_status.setText(f"Compacted {before} -> {after} events")
+        self.lbl_rec_status.setStyleSheet("color: #10B981;")
+
+    def on_compact_error(self, msg):
+        self.lbl_rec_status.setText(f"Could not compact: {msg}")
+        self.lbl_rec_status.setStyleSheet("color: #EF4444;")
+
+    def on_compact_finished(self):
+        if self.compact_thread is None: return  # QThread's own finished() arrives as well
+        self.compact_thread.wait()
+        self.compact_thread = None
+        self.btn_compact.setEnabled(True)
+        self.btn_restore.setEnabled(True)
+        self.refresh_rec_list()
+
+    def restore_macro(self):
+        if self.compact_thread is not None: return
+        if self.recorder.restore_original():
+            self.refresh_rec_list()
+            self.lbl_rec_status.setText(f"Restored original {len(self.recorder.events)} events")
+
     def save_macro(self):
         if not self.recorder.events: return
-        f, _ = QFileDialog.getSaveFileName(self, "Save Macro", "", "JSON (*.json)")
+        f, _ = QFileDialog.getSaveFileName(self, "Save Macro", "", "Macro (*.acm);;JSON (*.json)")
         if f:
-            with open(f, 'w') as file: 
-                json.dump(self.recorder.events, file, indent=2)
-            self.lbl_rec_status.setText(f"Macro saved to {f}")
+            msg = f"Macro saved to {f}"
+            eps = self.spin_simplify.value()
+            if eps > 0:
+                before = len(self.recorder.events)
+                self.recorder.simplify(eps)
+                self.refresh_rec_list()
+                msg += f" (simplified {before} -> {len(self.recorder.events)} events)"
+            if f.lower().endswith('.json'):
+                macro_file.export_json(self.recorder.events, f)
+            else:
+                macro_file.save_macro(f, self.recorder.events)
+                self.macro_source = (f, self.recorder.events)
+            self.lbl_rec_status.setText(msg)
             
     def load_macro(self):
-        f, _ = QFileDialog.getOpenFileName(self, "Load Macro", "", "JSON (*.json)")
+        f, _ = QFileDialog.getOpenFileName(self, "Load Macro", "", "Macros (*.acm *.json);;Macro (*.acm);;JSON (*.json)")
         if f:
-            with open(f, 'r') as file:
-                self.recorder.events = json.load(file)
-                self.refresh_rec_list()
-                self.lbl_rec_status.setText(f"Loaded {len(self.recorder.events)} events from {f}")
-                self.lbl_rec_status.setStyleSheet("color: #3B82F6;")
+            try:
+                if f.lower().endswith('.json'):
+                    self.recorder.events = macro_file.import_json(f)
+                else:
+                    self.recorder.events = macro_file.load_macro(f)
+                    self.macro_source = (f, self.recorder.events)
+                self.recorder.original_events = None
+            except (ValueError, OSError) as e:
+                self.lbl_rec_status.setText(f"Could not load {f}: {e}")
+                self.lbl_rec_status.setStyleSheet("color: #EF4444;")
+                return
+            self.refresh_rec_list()
+            self.lbl_rec_status.setText(f"Loaded {len(self.recorder.events)} events from {f}")
+            self.lbl_rec_status.setStyleSheet("color: #3B82F6;")
 
     # Interface used by main_window.py global hotkeys
     @Slot()
@@ -1,6 +1,7 @@
 import json
 import os
 import threading
+import time
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
     QPushButton, QDoubleSpinBox, QFileDialog,
@@ -9,7 +10,10 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QKeySequence, QAction, QShortcut
 from PySide6.QtCore import Qt, Signal, QThread, QTimer, Slot
-from src.workflow_runner import WorkflowRunner
+from src.workflow_runner import WorkflowRunner, SETTLE_POLICIES, format_run_stats
+from src.workflow_compiler import WorkflowCompileError
+from src.profiler import format_step_timing, format_phase_breakdown
+from src.paths import user_data_dir
 
 class ReorderableListWidget(QListWidget):
     order_changed = Signal()
@@ -36,22 +40,25 @@ class ReorderableListWidget(QListWidget):
         else:
             super().keyPressEvent(event)
 
+CONTROL_ACTIONS = ("Loop", "End Loop", "Label", "Goto", "If Image", "If Pixel", "Else", "End If", "Wait Any")
+
 class WorkflowThread(QThread):
     finished = Signal()
     error = Signal(str)
-    step_highlight = Signal(int)
+    step_highlight = Signal(int, list) # step index, [(iteration, count)] of running loops
     ai_debug = Signal(str)
 
-    def __init__(self, runner_instance, steps):
+    def __init__(self, runner_instance, steps, resume=False):
         super().__init__()
         self.runner = runner_instance
+        self.resume = resume
         self.runner.set_steps(steps)
         self.runner.highlight_callback = self.step_highlight.emit
         self.runner.ai_debug_callback = self.ai_debug.emit
 
     def run(self):
         try:
-            self.runner.run()
+            self.runner.run(resume=self.resume)
         except Exception as e:
             self.error.emit(str(e))
         finally:
@@ -66,10 +73,15 @@ class WorkflowTab(QWidget):
 
         self.workflow_steps = []
         self.wf_selected_index = -1
+        self.highlighted_row = -1 # row showing loop counters while running
         self.is_running = False
 
         self.stop_event = threading.Event()
         self.runner = WorkflowRunner(self.stop_event)
+        try:
+            self.runner.checkpoint_dir = user_data_dir('checkpoints')
+        except OSError:
+            pass # runs just can't be resumed
         self.worker_thread = None
 
         self.setup_ui()
@@ -118,6 +130,22 @@ class WorkflowTab(QWidget):
         sl_layout.addWidget(btn_s); sl_layout.addWidget(btn_l)
         lf_layout.addLayout(sl_layout)
 
+        # Workflow settle policy (steps can override it)
+        settle_layout = QHBoxLayout()
+        settle_layout.addWidget(QLabel("Settle between steps:"))
+        self.combo_wf_settle = QComboBox()
+        self.combo_wf_settle.addItems(list(SETTLE_POLICIES))
+        self.combo_wf_settle.setToolTip("auto: short pause after clicks only\n"
+                                        "fixed: sleep the given time\n"
+                                        "stable: wait until the screen stops changing (up to the given time)")
+        settle_layout.addWidget(self.combo_wf_settle)
+        self.spin_wf_settle = QSpinBox()
+        self.spin_wf_settle.setRange(0, 60000)
+        self.spin_wf_settle.setSuffix(" ms")
+        self.spin_wf_settle.setSpecialValueText("default")
+        settle_layout.addWidget(self.spin_wf_settle)
+        lf_layout.addLayout(settle_layout)
+
         # Action Buttons
         run_layout = QHBoxLayout()
         self.btn_start_wf = QPushButton("RUN WORKFLOW (F6)")
@@ -127,6 +155,18 @@ class WorkflowTab(QWidget):
         run_layout.addWidget(self.btn_start_wf)
         
         lf_layout.addLayout(run_layout)
+
+        stats_layout = QHBoxLayout()
+        self.lbl_wf_stats = QLabel("")
+        self.lbl_wf_stats.setObjectName("SectionLabel")
+        self.lbl_wf_stats.setWordWrap(True)
+        stats_layout.addWidget(self.lbl_wf_stats, 1)
+        self.btn_export_trace = QPushButton("Export Timeline")
+        self.btn_export_trace.setToolTip("Save the last run's per-step timeline as Chrome trace JSON\n(open in chrome://tracing or ui.perfetto.dev)")
+        self.btn_export_trace.setEnabled(False)
+        self.btn_export_trace.clicked.connect(self.export_timeline)
+        stats_layout.addWidget(self.btn_export_trace)
+        lf_layout.addLayout(stats_layout)
         
         # Debug Panel (Hidden by default)
         self.debug_panel = QFrame()
@@ -160,7 +200,8 @@ class WorkflowTab(QWidget):
         action_layout = QHBoxLayout()
         action_layout.addWidget(QLabel("Action Type:"))
         self.combo_wf_action = QComboBox()
-        self.combo_wf_action.addItems(["Delay", "Click", "Key Press", "Type Text", "Wait Image", "Click Image", "AI Action"])
+        self.combo_wf_action.addItems(["Delay", "Click", "Key Press", "Type Text", "Wait Image", "Click Image", "AI Action",
+                                       "Loop", "End Loop", "Label", "Goto", "If Image", "If Pixel", "Else", "End If", "Wait Any"])
         self.combo_wf_action.currentTextChanged.connect(self.on_action_combo_changed)
         action_layout.addWidget(self.combo_wf_action)
         rf_layout.addLayout(action_layout)
@@ -257,6 +298,13 @@ class WorkflowTab(QWidget):
         elif action_name == "Type Text":
             self.wf_opts_layout.addWidget(QLabel("Text:"))
             le = bind_change(QLineEdit()); self.wf_opts_layout.addWidget(le); self.wf_inputs['text'] = le
+            h = QHBoxLayout()
+            h.addWidget(QLabel("Mode:")); m = bind_change(QComboBox()); m.addItems(["interval", "batched", "rate", "paste"]); h.addWidget(m); self.wf_inputs['mode'] = m
+            iv = bind_change(QSpinBox()); iv.setRange(0, 10000); iv.setValue(50); iv.setSuffix(" ms/char"); h.addWidget(iv); self.wf_inputs['interval'] = iv
+            cps = bind_change(QSpinBox()); cps.setRange(1, 10000); cps.setValue(20); cps.setSuffix(" chars/s"); h.addWidget(cps); self.wf_inputs['cps'] = cps
+            m.setToolTip("interval: pause between characters\nbatched: as fast as possible\n"
+                         "rate: limited to chars/s\npaste: via the clipboard (restored afterwards; refused while it holds an image)")
+            self.wf_opts_layout.addLayout(h)
             
         elif action_name in ["Wait Image", "Click Image"]:
             self.wf_opts_layout.addWidget(QLabel("Image Path:"))
@@ -276,6 +324,58 @@ class WorkflowTab(QWidget):
             self.wf_opts_layout.addWidget(QLabel("Prompt (e.g. 'Open Notepad'):"))
             le = bind_change(QLineEdit()); self.wf_opts_layout.addWidget(le); self.wf_inputs['prompt'] = le
 
+        elif action_name == "Loop":
+            self.wf_opts_layout.addWidget(QLabel("Repeat count (0 = until stopped):"))
+            sb = bind_change(QSpinBox()); sb.setRange(0, 10000000); sb.setValue(10); self.wf_opts_layout.addWidget(sb); self.wf_inputs['count'] = sb
+
+        elif action_name in ["Label", "Goto"]:
+            key = 'name' if action_name == "Label" else 'label'
+            self.wf_opts_layout.addWidget(QLabel("Label name:"))
+            le = bind_change(QLineEdit()); self.wf_opts_layout.addWidget(le); self.wf_inputs[key] = le
+
+        elif action_name == "If Image":
+            self.wf_opts_layout.addWidget(QLabel("Image Path:"))
+            le = bind_change(QLineEdit()); self.wf_opts_layout.addWidget(le); self.wf_inputs['image_path'] = le
+            btn_b = QPushButton("Browse"); btn_b.clicked.connect(lambda: self.browse_file_for_input(le))
+            self.wf_opts_layout.addWidget(btn_b)
+            h = QHBoxLayout()
+            h.addWidget(QLabel("When:")); w = bind_change(QComboBox()); w.addItems(["found", "not found"]); h.addWidget(w); self.wf_inputs['when'] = w
+            h.addWidget(QLabel("Confidence:")); sb = bind_change(QDoubleSpinBox()); sb.setValue(0.8); sb.setSingleStep(0.05); h.addWidget(sb); self.wf_inputs['confidence'] = sb
+            self.wf_opts_layout.addLayout(h)
+
+        elif action_name == "If Pixel":
+            h = QHBoxLayout()
+            h.addWidget(QLabel("X:")); x = bind_change(QSpinBox()); x.setRange(0, 9999); h.addWidget(x); self.wf_inputs['x'] = x
+            h.addWidget(QLabel("Y:")); y = bind_change(QSpinBox()); y.setRange(0, 9999); h.addWidget(y); self.wf_inputs['y'] = y
+            self.wf_opts_layout.addLayout(h)
+            h2 = QHBoxLayout()
+            h2.addWidget(QLabel("Color:")); le = bind_change(QLineEdit()); le.setPlaceholderText("#RRGGBB"); h2.addWidget(le); self.wf_inputs['color'] = le
+            h2.addWidget(QLabel("Tol:")); t = bind_change(QSpinBox()); t.setRange(0, 255); t.setValue(10); h2.addWidget(t); self.wf_inputs['tolerance'] = t
+            h2.addWidget(QLabel("When:")); w = bind_change(QComboBox()); w.addItems(["matches", "differs"]); h2.addWidget(w); self.wf_inputs['when'] = w
+            self.wf_opts_layout.addLayout(h2)
+            btn_pick = QPushButton("Pick Position && Color (F8)")
+            btn_pick.clicked.connect(self.pick_pos_trigger)
+            self.wf_opts_layout.addWidget(btn_pick)
+
+        elif action_name == "Wait Any":
+            self.wf_opts_layout.addWidget(QLabel("Watch (first match wins; '-> label' jumps there):"))
+            le = bind_change(QLineEdit()); le.setPlaceholderText("ok.png -> done; pixel 10,20 #FF0000 -> failed")
+            self.wf_opts_layout.addWidget(le); self.wf_inputs['watch'] = le
+            h = QHBoxLayout()
+            h.addWidget(QLabel("Timeout (s):")); sb = bind_change(QDoubleSpinBox()); sb.setRange(0, 86400); sb.setValue(10.0); h.addWidget(sb); self.wf_inputs['timeout'] = sb
+            h.addWidget(QLabel("then ->")); tl = bind_change(QLineEdit()); tl.setPlaceholderText("label"); h.addWidget(tl); self.wf_inputs['timeout_label'] = tl
+            self.wf_opts_layout.addLayout(h)
+            self.wf_opts_layout.addWidget(QLabel("Confidence:"))
+            sb2 = bind_change(QDoubleSpinBox()); sb2.setValue(0.8); sb2.setSingleStep(0.05); self.wf_opts_layout.addWidget(sb2); self.wf_inputs['confidence'] = sb2
+
+        if action_name in CONTROL_ACTIONS: return
+
+        h_settle = QHBoxLayout()
+        h_settle.addWidget(QLabel("Settle after:"))
+        cs = bind_change(QComboBox()); cs.addItems(["default", "none", "fixed", "stable"]); h_settle.addWidget(cs); self.wf_inputs['settle'] = cs
+        ss = bind_change(QSpinBox()); ss.setRange(0, 60000); ss.setSuffix(" ms"); ss.setSpecialValueText("default"); h_settle.addWidget(ss); self.wf_inputs['settle_ms'] = ss
+        self.wf_opts_layout.addLayout(h_settle)
+
     def clear_layout_recursive(self, layout):
         if layout is None: return
         while layout.count():
@@ -294,6 +394,9 @@ class WorkflowTab(QWidget):
         if 'x' in self.wf_inputs:
             self.wf_inputs['x'].setValue(int(x))
             self.wf_inputs['y'].setValue(int(y))
+            if 'color' in self.wf_inputs:
+                r, g, b = pyautogui.pixel(int(x), int(y))[:3]
+                self.wf_inputs['color'].setText(f"#{r:02X}{g:02X}{b:02X}")
             self.commit_step_edit() # Auto save since we captured
         QMessageBox.information(self, "Captured", f"Captured: {x}, {y}")
 
@@ -331,12 +434,30 @@ class WorkflowTab(QWidget):
             txt += f" {p.get('button', 'left')} ({p.get('x', 0)},{p.get('y', 0)})"
         elif "Image" in step['action']: 
             txt += f" {os.path.basename(str(p.get('image_path', '')))}"
+            if step['action'] == "If Image" and p.get('when') == "not found":
+                txt += " not found"
         elif step['action'] == "Type Text": 
             txt += f" '{p.get('text', '')}'"
+            if p.get('mode', 'interval') != 'interval':
+                txt += f" ({p['mode']})"
         elif step['action'] == "Key Press": 
             txt += f" [{p.get('key', '')}]"
         elif step['action'] == "AI Action":
             txt += f" '{p.get('prompt', '')}'"
+        elif step['action'] == "Loop":
+            count = int(p.get('count', 1))
+            txt += f" x{count}" if count else " (until stopped)"
+        elif step['action'] == "Label":
+            txt += f" {p.get('name', '')}:"
+        elif step['action'] == "Goto":
+            txt += f" {p.get('label', '')}"
+        elif step['action'] == "Wait Any":
+            watch = p.get('watch', '')
+            txt += f" [{watch if isinstance(watch, str) else f'{len(watch)} watchers'}] {p.get('timeout', 10)}s"
+        elif step['action'] == "If Pixel":
+            txt += f" ({p.get('x', 0)},{p.get('y', 0)}) {p.get('when', 'matches')} {p.get('color', '')}"
+        if p.get('settle', 'default') != 'default':
+            txt += f" ~{p['settle']}"
         return txt
 
     def save_wf_step(self):
@@ -462,11 +583,32 @@ class WorkflowTab(QWidget):
         if self.is_running or not self.workflow_steps: return
         
         self.runner.api_key = self.le_api.text().strip()
+        self.runner.settle = self.combo_wf_settle.currentText()
+        self.runner.settle_time = (self.spin_wf_settle.value() / 1000.0) or None
+        self.runner.set_steps(self.workflow_steps)
+        try:
+            self.runner.compile()
+        except WorkflowCompileError as e:
+            QMessageBox.warning(self, "Workflow Errors", f"Fix these steps before running:\n\n{e}")
+            return
+
+        resume = False
+        saved = self.runner.saved_checkpoint()
+        if saved:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(saved.get('saved', 0)))
+            answer = QMessageBox.question(
+                self, "Resume Workflow",
+                f"This workflow was interrupted at step {saved['pc'] + 1} ({when}).\n\n"
+                "Resume from there? Choose No to start from step 1.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel)
+            if answer == QMessageBox.StandardButton.Cancel: return
+            resume = answer == QMessageBox.StandardButton.Yes
         
         self.stop_event.clear()
         self.txt_debug.clear()
+        self.lbl_wf_stats.setText("")
         
-        self.worker_thread = WorkflowThread(self.runner, self.workflow_steps)
+        self.worker_thread = WorkflowThread(self.runner, self.workflow_steps, resume)
         self.worker_thread.step_highlight.connect(self.highlight_exec_step)
         self.worker_thread.ai_debug.connect(self.append_debug_log)
         self.worker_thread.finished.connect(self.on_thread_finished)
@@ -483,17 +625,48 @@ class WorkflowTab(QWidget):
     def on_thread_finished(self):
         self.status_changed.emit(False)
         self.clear_execution_highlights()
+        if self.runner.stats:
+            self.lbl_wf_stats.setText(format_run_stats(self.runner.stats))
+        self.show_step_timings()
+
+    def show_step_timings(self):
+        """Appends each step's measured time from the last run to its row."""
+        totals = self.runner.profiler.step_totals()
+        for i in range(min(self.wf_list.count(), len(self.workflow_steps))):
+            item = self.wf_list.item(i)
+            text = self.format_step_text(self.workflow_steps[i])
+            t = totals.get(i)
+            if t:
+                text += f"   \u23f1 {format_step_timing(t)}"
+                item.setToolTip(format_phase_breakdown(t))
+            else:
+                item.setToolTip("")
+            item.setText(text)
+        self.btn_export_trace.setEnabled(bool(totals))
+
+    def export_timeline(self):
+        f, _ = QFileDialog.getSaveFileName(self, "Export Timeline", "workflow_trace.json", "JSON (*.json)")
+        if f:
+            self.runner.profiler.export_chrome_trace(f)
 
-    def highlight_exec_step(self, index):
+    def highlight_exec_step(self, index, loops=()):
         self.clear_execution_highlights()
         if 0 <= index < self.wf_list.count():
             item = self.wf_list.item(index)
             # Give it a bold blue background to indicate it is running
             item.setBackground(Qt.GlobalColor.darkBlue)
+            if loops:
+                counters = ", ".join(f"{i}/{c}" if c else f"{i}/\u221e" for i, c in loops)
+                item.setText(f"{self.format_step_text(self.workflow_steps[index])}  [loop {counters}]")
+                self.highlighted_row = index
 
     def clear_execution_highlights(self):
         for i in range(self.wf_list.count()):
             self.wf_list.item(i).setBackground(Qt.GlobalColor.transparent)
+        row = self.highlighted_row
+        if 0 <= row < min(self.wf_list.count(), len(self.workflow_steps)):
+            self.wf_list.item(row).setText(self.format_step_text(self.workflow_steps[row]))
+        self.highlighted_row = -1
 
     @Slot(str)
     def append_debug_log(self, msg):
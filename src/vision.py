@@ -4,6 +4,18 @@ import pyautogui
 import time
 import threading
 
+
+def match_best(screen, template):
+    """
+    (max_val, (x, y)) of the best TM_CCOEFF_NORMED match of `template` on
+    `screen`; both must be BGR, or both grayscale. Shared by every image
+    search: the Image Clicker, Wait Any watchers and workflow steps.
+    """
+    res = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(res)
+    return max_val, max_loc
+
+
 class ImageSearcher:
     def __init__(self, stop_event, update_callback=None):
         self.stop_event = stop_event
@@ -49,8 +61,7 @@ class ImageSearcher:
                     check_img = cv2.cvtColor(screen_bgr, cv2.COLOR_BGR2GRAY)
                 
                 # Match
-                res = cv2.matchTemplate(check_img, template, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+                max_val, max_loc = match_best(check_img, template)
                 
                 # Update UI callback
                 if self.update_callback:
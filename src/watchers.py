@@ -0,0 +1,165 @@
+"""
+Concurrent screen watchers for the "Wait Any" workflow step.
+
+One FrameStream grabs the screen at a fixed interval while watchers are
+running; every watcher checks each new frame, so three conditions cost one
+screenshot per tick, not three. wait_any() runs the watchers together,
+returns the first one that matches and cancels the rest. Template matching
+runs in worker threads (OpenCV releases the GIL), so several image watchers
+check a frame in parallel.
+"""
+import asyncio
+from abc import ABC, abstractmethod
+import numpy as np
+
+DEFAULT_INTERVAL = 0.1  # seconds between frames
+STOP_POLL = 0.05        # seconds between stop_event checks
+
+
+def match_template(screen_bgr, template, confidence):
+    """Center of the best match of `template` on the screen, or None below `confidence`."""
+    from src.vision import match_best
+    max_val, max_loc = match_best(screen_bgr, template)
+    if max_val < confidence: return None
+    h, w = template.shape[:2]
+    return (max_loc[0] + w // 2, max_loc[1] + h // 2)
+
+
+class Frame:
+    """One screenshot; the BGR copy for template matching is made on first use."""
+
+    def __init__(self, image):
+        self.rgb = np.asarray(image)
+        self._bgr = None
+
+    @property
+    def bgr(self):
+        if self._bgr is None:
+            self._bgr = np.ascontiguousarray(self.rgb[..., 2::-1])
+        return self._bgr
+
+
+class FrameStream:
+    """Grabs frames with `grab()` and hands each one to every waiting watcher."""
+
+    def __init__(self, grab, interval=DEFAULT_INTERVAL):
+        self.grab = grab
+        self.interval = interval
+        self.frame = None
+        self.seq = 0
+        self._cond = asyncio.Condition()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            image = await asyncio.to_thread(self.grab)
+            async with self._cond:
+                self.frame = Frame(image)
+                self.seq += 1
+                self._cond.notify_all()
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    async def next(self, seq):
+        """Waits for a frame newer than `seq`; returns (seq, frame)."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.seq > seq)
+            return self.seq, self.frame
+
+
+class Watcher(ABC):
+    """Base watcher: check() every new frame until it returns something other than None."""
+    needs_frames = True
+
+    async def watch(self, stream):
+        seq = 0
+        while True:
+            seq, frame = await stream.next(seq)
+            result = await self.check(frame)
+            if result is not None:
+                return result
+
+    @abstractmethod
+    async def check(self, frame):
+        """Result for a match on `frame`, or None."""
+
+
+class ImageWatcher(Watcher):
+    def __init__(self, template, confidence=0.8, name=''):
+        self.template = template
+        self.confidence = confidence
+        self.name = name
+
+    async def check(self, frame):
+        return await asyncio.to_thread(match_template, frame.bgr, self.template, self.confidence)
+
+
+class PixelWatcher(Watcher):
+    def __init__(self, x, y, color, tolerance=10, name=''):
+        self.x, self.y = x, y
+        self.color = color
+        self.tolerance = tolerance
+        self.name = name
+
+    async def check(self, frame):
+        h, w = frame.rgb.shape[:2]
+        if not (0 <= self.x < w and 0 <= self.y < h):
+            return None  # off this screen: never matches, rather than wrapping or raising
+        pixel = frame.rgb[self.y, self.x]
+        if all(abs(int(a) - b) <= self.tolerance for a, b in zip(pixel[:3], self.color)):
+            return (self.x, self.y)
+        return None
+
+
+class TimeoutWatcher(Watcher):
+    needs_frames = False
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.name = 'timeout'
+
+    async def watch(self, stream):
+        await asyncio.sleep(self.seconds)
+        return True
+
+    async def check(self, frame):
+        return None  # fires on time alone; watch() never reads frames
+
+
+async def _wait_stop(stop_event):
+    while not stop_event.is_set():
+        await asyncio.sleep(STOP_POLL)
+
+
+async def wait_any(watchers, grab, stop_event=None, interval=DEFAULT_INTERVAL):
+    """
+    Runs all watchers on one frame stream. Returns (index, result) of the
+    first watcher to match (the lowest index if several match on the same
+    frame), or None if stop_event is set first. The other watchers are
+    cancelled before returning; errors from watchers or grab() are raised.
+    """
+    stream = FrameStream(grab, interval)
+    tasks = [asyncio.create_task(w.watch(stream)) for w in watchers]
+    others = []
+    if any(w.needs_frames for w in watchers):
+        others.append(asyncio.create_task(stream.run()))
+    if stop_event is not None:
+        others.append(asyncio.create_task(_wait_stop(stop_event)))
+    try:
+        done, _ = await asyncio.wait(tasks + others, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks + others:
+            t.cancel()
+        await asyncio.gather(*tasks, *others, return_exceptions=True)
+    for i, t in enumerate(tasks):
+        if t in done:
+            return i, t.result()
+    for t in others:
+        if t in done and t.exception() is not None:
+            raise t.exception()
+    return None
+
+
+def run_wait_any(watchers, grab, stop_event=None, interval=DEFAULT_INTERVAL):
+    """Blocking wait_any() for the runner thread."""
+    return asyncio.run(wait_any(watchers, grab, stop_event, interval))
@@ -0,0 +1,515 @@
+"""
+Workflow compiler: validates the step dicts saved by WorkflowTab and turns
+them into typed step objects with every parameter parsed, every button and
+key combo resolved and every template image loaded, so the runner does no
+parsing or file I/O between steps and bad params are reported before the
+first step runs.
+
+Control flow (Loop/End Loop, Label/Goto, If Image/If Pixel/Else/End If) is
+linked into step indices here, so the runner only follows a precomputed
+jump: a step's handler returns the index of the next step, or None to fall
+through.
+"""
+import os
+from pynput.mouse import Button
+from src.text_entry import MODES as _TYPING_MODES
+from src.watchers import ImageWatcher, PixelWatcher, TimeoutWatcher
+
+BUTTONS = {'left': Button.left, 'right': Button.right, 'middle': Button.middle}
+
+# What to wait for after a step before starting the next one:
+#   none   - start the next step immediately
+#   fixed  - sleep settle_time seconds
+#   stable - wait until two consecutive screen frames match, at most settle_time
+SETTLE_MODES = ('none', 'fixed', 'stable')
+SETTLE_DEFAULT_MS = {'none': 0, 'fixed': 100, 'stable': 2000}
+TYPING_MODES = {m: m for m in _TYPING_MODES}  # see src.text_entry
+
+
+class WorkflowCompileError(ValueError):
+    """Raised with every validation error of a workflow, not just the first."""
+
+    def __init__(self, errors):
+        self.errors = errors  # [(step index, action, message)]
+        super().__init__("\n".join(f"Step {i + 1} ({action}): {msg}" for i, action, msg in errors))
+
+
+class Step:
+    action = None
+    control = False  # control-flow steps never settle
+    __slots__ = ('index', 'settle', 'settle_time')
+
+    def __init__(self, index):
+        self.index = index
+        self.settle = None  # None: use the workflow's policy
+        self.settle_time = 0.0
+
+
+class DelayStep(Step):
+    action = 'Delay'
+    __slots__ = ('seconds',)
+
+
+class ClickStep(Step):
+    action = 'Click'
+    __slots__ = ('x', 'y', 'button', 'clicks')
+
+
+class KeyPressStep(Step):
+    action = 'Key Press'
+    __slots__ = ('keys',)
+
+
+class TypeTextStep(Step):
+    action = 'Type Text'
+    __slots__ = ('text', 'mode', 'interval', 'cps')
+
+
+class WaitImageStep(Step):
+    action = 'Wait Image'
+    __slots__ = ('image_path', 'template', 'timeout', 'confidence')
+
+
+class ClickImageStep(Step):
+    action = 'Click Image'
+    __slots__ = ('image_path', 'template', 'timeout', 'confidence', 'button')
+
+
+class AIActionStep(Step):
+    action = 'AI Action'
+    __slots__ = ('prompt',)
+
+
+class LoopStep(Step):
+    action = 'Loop'
+    control = True
+    __slots__ = ('count', 'end')  # count 0 repeats until stopped; end: index of End Loop
+
+
+class EndLoopStep(Step):
+    action = 'End Loop'
+    control = True
+    __slots__ = ('start', 'count')  # start: index of the matching Loop
+
+
+class LabelStep(Step):
+    action = 'Label'
+    control = True
+    __slots__ = ('name',)
+
+
+class GotoStep(Step):
+    action = 'Goto'
+    control = True
+    __slots__ = ('label', 'target')
+
+
+class IfImageStep(Step):
+    action = 'If Image'
+    control = True
+    # target: where to continue when the condition is false
+    __slots__ = ('image_path', 'template', 'confidence', 'negate', 'target')
+
+
+class IfPixelStep(Step):
+    action = 'If Pixel'
+    control = True
+    __slots__ = ('x', 'y', 'color', 'tolerance', 'negate', 'target')
+
+
+class ElseStep(Step):
+    action = 'Else'
+    control = True
+    __slots__ = ('target',)  # reached at the end of the true branch: skip past End If
+
+
+class EndIfStep(Step):
+    action = 'End If'
+    control = True
+    __slots__ = ()
+
+
+class WaitAnyStep(Step):
+    action = 'Wait Any'
+    control = True
+    # watchers end with the TimeoutWatcher; targets[i] is where to go when
+    # watchers[i] fires (None: fall through), labels[i] its label name
+    __slots__ = ('watchers', 'labels', 'targets', 'timeout')
+
+
+class _Params:
+    """Reads typed values out of a params dict, collecting errors instead of raising."""
+
+    def __init__(self, params, errors):
+        self.params = params
+        self.errors = errors
+
+    def number(self, name, default, kind=float, lo=None, hi=None):
+        raw = self.params.get(name, default)
+        try:
+            value = kind(raw) if kind is float else kind(float(raw))
+        except (TypeError, ValueError):
+            self.errors.append(f"{name} must be a number, got {raw!r}")
+            return kind(default)
+        if (lo is not None and value < lo) or (hi is not None and value > hi):
+            bound = f"at least {lo}" if hi is None else f"at most {hi}" if lo is None else f"between {lo} and {hi}"
+            self.errors.append(f"{name} must be {bound}, got {value}")
+        return value
+
+    def text(self, name, required=True):
+        value = str(self.params.get(name, '') or '')
+        if required and not value.strip():
+            self.errors.append(f"{name} is empty")
+        return value
+
+    def choice(self, name, default, choices):
+        value = self.params.get(name) or default
+        if value not in choices:
+            self.errors.append(f"{name} must be one of {', '.join(choices)}, got {value!r}")
+            return choices[default]
+        return choices[value]
+
+
+def imread(path):
+    import cv2
+    return cv2.imread(path)
+
+
+def file_stamp(path):
+    """(mtime_ns, size) of a file, None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _Context:
+    """Per-compile state: template cache, image loader and the error list."""
+
+    def __init__(self, templates, loader, errors, on_reload=None):
+        self.templates = {} if templates is None else templates
+        self.loader = loader or imread
+        self.errors = errors
+        self.on_reload = on_reload
+        self.current = {}  # path -> image, each file checked once per compile
+
+    def template(self, path):
+        """
+        Loads (and caches) a template image; None if it can't be read. A
+        cached image is reloaded when the file's mtime or size changed, and
+        on_reload(path) is called so stale match locations can be dropped.
+        """
+        if path in self.current:
+            return self.current[path]
+        stamp = file_stamp(path)
+        cached = self.templates.get(path)
+        if cached is not None and cached[0] == stamp:
+            image = cached[1]
+        else:
+            image = self.loader(path)
+            if image is not None:
+                self.templates[path] = (stamp, image)
+            else:
+                self.templates.pop(path, None)
+            if cached is not None and self.on_reload:
+                self.on_reload(path)
+        self.current[path] = image
+        return image
+
+
+def _compile_delay(step, p, ctx):
+    step.seconds = p.number('duration', 1000, lo=0) / 1000.0
+
+
+def _compile_click(step, p, ctx):
+    step.x = p.number('x', 0, int)
+    step.y = p.number('y', 0, int)
+    step.button = p.choice('button', 'left', BUTTONS)
+    step.clicks = p.choice('type', 'single', {'single': 1, 'double': 2})
+
+
+# Empty key, text and prompt fields are allowed and make the step do
+# nothing, as they did before workflows were compiled; only fields a step
+# can't work without at all (image paths, label names) are required.
+
+def _compile_key_press(step, p, ctx):
+    keys = [k.strip().lower() for k in p.text('key', required=False).split('+') if k.strip()]
+    step.keys = tuple('win' if k == 'windows' else k for k in keys)
+
+
+def _compile_type_text(step, p, ctx):
+    step.text = p.text('text', required=False)  # typed verbatim, so " " is valid
+    step.mode = p.choice('mode', 'interval', TYPING_MODES)
+    step.interval = p.number('interval', 50, lo=0, hi=10000) / 1000.0
+    step.cps = p.number('cps', 20, lo=1, hi=10000)
+
+
+def _compile_image(step, p, ctx, timeout):
+    step.image_path = p.text('image_path')
+    step.timeout = p.number('timeout', timeout, lo=0)
+    step.confidence = p.number('confidence', 0.8, lo=0, hi=1)
+    step.template = None
+    if step.image_path:
+        step.template = ctx.template(step.image_path)
+        if step.template is None:
+            p.errors.append(f"cannot read image '{step.image_path}'")
+
+
+def _compile_wait_image(step, p, ctx):
+    _compile_image(step, p, ctx, 10)
+
+
+def _compile_click_image(step, p, ctx):
+    _compile_image(step, p, ctx, 5)
+    step.button = p.choice('button', 'left', BUTTONS)
+
+
+def _compile_ai_action(step, p, ctx):
+    step.prompt = p.text('prompt', required=False).strip()
+
+
+def _compile_loop(step, p, ctx):
+    step.count = p.number('count', 1, int, lo=0)
+    step.end = None
+
+
+def _compile_label(step, p, ctx):
+    step.name = p.text('name').strip()
+
+
+def _compile_goto(step, p, ctx):
+    step.label = p.text('label').strip()
+    step.target = None
+
+
+def _compile_if_image(step, p, ctx):
+    step.image_path = p.text('image_path')
+    step.confidence = p.number('confidence', 0.8, lo=0, hi=1)
+    step.negate = p.choice('when', 'found', {'found': False, 'not found': True})
+    step.template = None
+    step.target = None
+    if step.image_path:
+        step.template = ctx.template(step.image_path)
+        if step.template is None:
+            p.errors.append(f"cannot read image '{step.image_path}'")
+
+
+def parse_color(value):
+    """'#RRGGBB', 'RRGGBB' or 'r,g,b' -> (r, g, b); raises ValueError."""
+    value = str(value).strip()
+    if ',' in value:
+        rgb = tuple(int(c) for c in value.split(','))
+    else:
+        h = value.lstrip('#')
+        if len(h) != 6: raise ValueError(value)
+        rgb = tuple(int(h[i:i + 2], 16) for i in (0, 2, 4))
+    if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+        raise ValueError(value)
+    return rgb
+
+
+def _compile_if_pixel(step, p, ctx):
+    step.x = p.number('x', 0, int)
+    step.y = p.number('y', 0, int)
+    step.tolerance = p.number('tolerance', 10, int, lo=0, hi=255)
+    step.negate = p.choice('when', 'matches', {'matches': False, 'differs': True})
+    step.target = None
+    try:
+        step.color = parse_color(p.text('color'))
+    except ValueError:
+        step.color = (0, 0, 0)
+        if p.params.get('color'):
+            p.errors.append(f"color must be #RRGGBB or r,g,b, got {p.params['color']!r}")
+
+
+def parse_watch_spec(spec):
+    """
+    'ok.png -> done; pixel 10,20 #FF0000 -> failed' -> list of watch dicts.
+    Entries are separated by ';' or newlines; '-> label' is optional.
+    """
+    watch = []
+    for entry in spec.replace('\n', ';').split(';'):
+        target, _, label = entry.partition('->')
+        target, label = target.strip(), label.strip()
+        if not target: continue
+        if target.lower().startswith('pixel '):
+            pos, _, color = target[6:].strip().partition(' ')
+            x, _, y = pos.partition(',')
+            watch.append({'x': x.strip(), 'y': y.strip(), 'color': color.strip(), 'label': label})
+        else:
+            watch.append({'image_path': target, 'label': label})
+    return watch
+
+
+def _compile_wait_any(step, p, ctx):
+    raw = p.params.get('watch') or []
+    if isinstance(raw, str):
+        raw = parse_watch_spec(raw)
+    confidence = p.number('confidence', 0.8, lo=0, hi=1)
+    tolerance = p.number('tolerance', 10, int, lo=0, hi=255)
+    step.timeout = p.number('timeout', 10, lo=0)
+    step.watchers, step.labels, step.targets = [], [], []
+    if not raw:
+        p.errors.append("watch needs at least one image or pixel")
+    for w in raw:
+        wp = _Params(w, p.errors)
+        if 'image_path' in w:
+            path = wp.text('image_path')
+            template = ctx.template(path) if path else None
+            if path and template is None:
+                p.errors.append(f"cannot read image '{path}'")
+            watcher = ImageWatcher(template, wp.number('confidence', confidence, lo=0, hi=1), path)
+        else:
+            x, y = wp.number('x', 0, int, lo=0), wp.number('y', 0, int, lo=0)  # frames start at 0,0
+            try:
+                color = parse_color(w.get('color', ''))
+            except ValueError:
+                p.errors.append(f"color must be #RRGGBB or r,g,b, got {w.get('color')!r}")
+                color = (0, 0, 0)
+            watcher = PixelWatcher(x, y, color, wp.number('tolerance', tolerance, int, lo=0, hi=255), f"pixel {x},{y}")
+        step.watchers.append(watcher)
+        step.labels.append(str(w.get('label') or '').strip())
+    step.watchers.append(TimeoutWatcher(step.timeout))
+    step.labels.append(str(p.params.get('timeout_label') or '').strip())
+    step.targets = [None] * len(step.labels)
+
+
+def _compile_marker(step, p, ctx):
+    for name in type(step).__slots__:
+        setattr(step, name, None)  # filled in by _link()
+
+
+# action name -> (step class, compile function)
+COMPILERS = {
+    'Delay': (DelayStep, _compile_delay),
+    'Click': (ClickStep, _compile_click),
+    'Key Press': (KeyPressStep, _compile_key_press),
+    'Type Text': (TypeTextStep, _compile_type_text),
+    'Wait Image': (WaitImageStep, _compile_wait_image),
+    'Click Image': (ClickImageStep, _compile_click_image),
+    'AI Action': (AIActionStep, _compile_ai_action),
+    'Loop': (LoopStep, _compile_loop),
+    'End Loop': (EndLoopStep, _compile_marker),
+    'Label': (LabelStep, _compile_label),
+    'Goto': (GotoStep, _compile_goto),
+    'If Image': (IfImageStep, _compile_if_image),
+    'If Pixel': (IfPixelStep, _compile_if_pixel),
+    'Else': (ElseStep, _compile_marker),
+    'End If': (EndIfStep, _compile_marker),
+    'Wait Any': (WaitAnyStep, _compile_wait_any),
+}
+
+IF_ACTIONS = ('If Image', 'If Pixel')
+
+
+def _link(steps, errors):
+    """Matches block steps and resolves every jump target, appending errors for broken structure."""
+    def error(step, msg):
+        errors.append((step.index, step.action, msg))
+
+    labels = {}
+    blocks = []  # open Loop / If steps; an If's Else is tracked in `elses`
+    elses = {}
+    for step in steps:
+        if step is None: continue
+        action = step.action
+        if action == 'Loop' or action in IF_ACTIONS:
+            blocks.append(step)
+        elif action == 'End Loop':
+            if not blocks or blocks[-1].action != 'Loop':
+                error(step, "End Loop without a matching Loop" if not blocks else
+                      f"End Loop closes {blocks[-1].action} at step {blocks[-1].index + 1}")
+                continue
+            loop = blocks.pop()
+            step.start, step.count = loop.index, loop.count
+            loop.end = step.index
+        elif action == 'Else':
+            if not blocks or blocks[-1].action not in IF_ACTIONS or blocks[-1].index in elses:
+                error(step, "Else without a matching If")
+                continue
+            elses[blocks[-1].index] = step
+            blocks[-1].target = step.index + 1
+        elif action == 'End If':
+            if not blocks or blocks[-1].action not in IF_ACTIONS:
+                error(step, "End If without a matching If" if not blocks else
+                      f"End If closes {blocks[-1].action} at step {blocks[-1].index + 1}")
+                continue
+            cond = blocks.pop()
+            if cond.index in elses:
+                elses[cond.index].target = step.index + 1
+            else:
+                cond.target = step.index + 1
+        elif action == 'Label' and step.name:
+            if step.name in labels:
+                error(step, f"label '{step.name}' already defined at step {labels[step.name] + 1}")
+            else:
+                labels[step.name] = step.index
+    for step in blocks:
+        error(step, f"{step.action} is never closed with {'End Loop' if step.action == 'Loop' else 'End If'}")
+    for step in steps:
+        if step is None: continue
+        if step.action == 'Goto' and step.label:
+            if step.label in labels:
+                step.target = labels[step.label]
+            else:
+                error(step, f"unknown label '{step.label}'")
+        elif step.action == 'Wait Any':
+            for i, label in enumerate(step.labels):
+                if not label: continue
+                if label in labels:
+                    step.targets[i] = labels[label]
+                else:
+                    error(step, f"unknown label '{label}'")
+
+
+def _compile_settle(step, p):
+    mode = p.params.get('settle') or 'default'
+    if mode == 'default': return
+    if mode not in SETTLE_MODES:
+        p.errors.append(f"settle must be one of default, {', '.join(SETTLE_MODES)}, got {mode!r}")
+        return
+    ms = p.number('settle_ms', 0, lo=0) or SETTLE_DEFAULT_MS[mode]
+    step.settle = mode
+    step.settle_time = ms / 1000.0
+
+
+def _compile_one(raw, index, ctx):
+    action = raw.get('action') if isinstance(raw, dict) else None
+    if action not in COMPILERS:
+        ctx.errors.append((index, action, f"unknown action {action!r}"))
+        return None
+    cls, fn = COMPILERS[action]
+    step = cls(index)
+    messages = []
+    p = _Params(raw.get('params') or {}, messages)
+    fn(step, p, ctx)
+    _compile_settle(step, p)
+    ctx.errors.extend((index, action, m) for m in messages)
+    return step
+
+
+def compile_step(raw, index=0, templates=None, loader=None):
+    """Compiles one step dict; raises WorkflowCompileError if it is invalid."""
+    ctx = _Context(templates, loader, [])
+    step = _compile_one(raw, index, ctx)
+    if ctx.errors:
+        raise WorkflowCompileError(ctx.errors)
+    return step
+
+
+def compile_workflow(raw_steps, templates=None, loader=None, on_reload=None):
+    """
+    Compiles a list of step dicts. Template images are read with `loader`
+    (cv2.imread by default) into `templates` (path -> (file stamp, image)),
+    which callers can keep between runs; an image whose file changed since
+    is read again and reported to on_reload(path). Raises
+    WorkflowCompileError listing every invalid step.
+    """
+    ctx = _Context(templates, loader, [], on_reload)
+    steps = [_compile_one(raw, i, ctx) for i, raw in enumerate(raw_steps)]
+    _link(steps, ctx.errors)
+    if ctx.errors:
+        ctx.errors.sort(key=lambda e: e[0])
+        raise WorkflowCompileError(ctx.errors)
+    return steps
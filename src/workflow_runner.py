@@ -1,148 +1,502 @@
+import importlib
+import os
 import time
-import pyautogui
-import cv2
 import numpy as np
-from pynput.mouse import Button, Controller as MouseController
+from pynput.keyboard import Controller as KeyboardController
+from pynput.mouse import Controller as MouseController
+from src.checkpoint import VERSION as CHECKPOINT_VERSION, CheckpointWriter, checkpoint_path, load_checkpoint, workflow_key
+from src.location_cache import LocationCache
+from src.profiler import StepProfiler
+from src.text_entry import type_text
+from src.watchers import run_wait_any
+from src.workflow_compiler import (
+    SETTLE_DEFAULT_MS, Step, WorkflowCompileError, compile_step, compile_workflow,
+)
+
+# pyautogui (which needs a display) and cv2 are slow to import, so they are
+# loaded by _require() when a workflow first needs them; a headless run of
+# key presses never imports cv2. Tests patch these attributes directly.
+pyautogui = None
+cv2 = None
+
+# Optional modules each action needs
+REQUIRES = {
+    'Click': ('pyautogui',),
+    'Key Press': ('pyautogui',),
+    'Type Text': ('pyautogui',),
+    'Wait Image': ('pyautogui', 'cv2'),
+    'Click Image': ('pyautogui', 'cv2'),
+    'If Image': ('pyautogui', 'cv2'),
+    'If Pixel': ('pyautogui',),
+    'Wait Any': ('pyautogui',),
+}
+
+
+def _require(*names):
+    g = globals()
+    for name in names:
+        if g[name] is None:
+            g[name] = importlib.import_module(name)
+
+
+# Settle used by the 'auto' workflow policy for steps that don't set their
+# own: only clicks give the UI time to react, keys and text are queued by
+# the OS in order and image steps already poll the screen.
+AUTO_SETTLE = {
+    'Click': ('fixed', 0.1),
+    'Click Image': ('fixed', 0.1),
+}
+SETTLE_POLICIES = ('auto', 'none', 'fixed', 'stable')
+
+STABLE_POLL = 0.03     # seconds between frames while waiting for a stable screen
+STABLE_THRESHOLD = 1.0 # mean absolute grey-level difference counted as "no change"
+STABLE_STRIDE = 8      # frames are compared on every 8th pixel in each direction
 
 class WorkflowRunner:
+    """
+    Runs a compiled workflow. highlight_callback(index, loops) is called
+    before each step; loops lists (iteration, count) for every loop being
+    run, outermost first, with count 0 for loops that repeat until stopped.
+    """
+
     def __init__(self, stop_event, highlight_callback=None, ai_debug_callback=None):
         self.stop_event = stop_event
         self.highlight_callback = highlight_callback
         self.ai_debug_callback = ai_debug_callback
         self.steps = []
+        self.program = []
+        self.templates = {} # image path -> (file stamp, template), kept between runs
         self.current_step_index = 0
         self.running = False
         self.mouse = MouseController()
+        self.keyboard = KeyboardController()
         self.api_key = None
+        self.settle = 'auto' # workflow settle policy, see SETTLE_POLICIES
+        self.settle_time = None # seconds; None uses the policy's default
+        self.stats = {}
+        self.errors = [] # (step index, message) of steps that raised in the last run
+        self._ai = None
+        self._dispatch = {
+            'Delay': self._run_delay,
+            'Click': self._run_click,
+            'Key Press': self._run_key_press,
+            'Type Text': self._run_type_text,
+            'Wait Image': self._run_wait_image,
+            'Click Image': self._run_click_image,
+            'AI Action': self._run_ai_action,
+            'Loop': self._run_loop,
+            'End Loop': self._run_end_loop,
+            'Label': self._run_noop,
+            'Goto': self._run_goto,
+            'If Image': self._run_if_image,
+            'If Pixel': self._run_if_pixel,
+            'Else': self._run_jump,
+            'End If': self._run_noop,
+            'Wait Any': self._run_wait_any,
+        }
+        self.loop_counters = {} # Loop step index -> [iteration, count], innermost last
+        self.last_match = None # (watcher name, result) of the last Wait Any
+        self.profiler = StepProfiler()
+        self.locations = LocationCache() # last match box per template, kept between runs
+        self.checkpoint_dir = None # where resumable checkpoints are saved; None disables them
+        self.checkpoint_interval = None # seconds; None uses checkpoint.DEFAULT_INTERVAL
+        self.checkpoints = None # CheckpointWriter of the last run
         
     def set_steps(self, steps):
         self.steps = steps
+
+    def _load_template(self, path):
+        _require('cv2')
+        return cv2.imread(path)
+
+    def compile(self):
+        """Validates and pre-resolves self.steps; raises WorkflowCompileError."""
+        # An edited image file is reloaded and its cached match location dropped
+        self.program = compile_workflow(self.steps, self.templates, self._load_template,
+                                        self.locations.invalidate)
+        return self.program
         
-    def run(self):
+    def saved_checkpoint(self):
+        """The checkpoint a run of self.steps can resume from, or None."""
+        if not self.checkpoint_dir: return None
+        return load_checkpoint(checkpoint_path(self.checkpoint_dir, self.steps), self.steps)
+
+    def run(self, resume=False):
+        """Runs the workflow; resume=True continues from its saved checkpoint if there is one."""
         self.running = True
         self.current_step_index = 0
+        self.stats = {}
+        self.errors = []
+        self._ai = None
+        profiler = self.profiler
+        profiler.reset()
+        self.locations.reset_counters()
+        try:
+            program = self.compile()
+        except WorkflowCompileError as e:
+            print(f"Workflow not started:\n{e}")
+            self.running = False
+            return
+        dispatch = self._dispatch
+        settles = [self.settle_for(step) for step in program]
+        for step in program:
+            _require(*REQUIRES.get(step.action, ()))
+        if any(mode == 'stable' for mode, _ in settles):
+            _require('pyautogui')
+        counters = self.loop_counters = {}
+        n = len(program)
+        executed = 0
+        dead_time = 0.0
+        started = time.perf_counter()
+        pc = 0
+        resumed = None
+        writer = self.checkpoints = self._checkpoint_writer()
+        if resume and writer is not None:
+            state = load_checkpoint(writer.path, self.steps)
+            if state is not None and 0 <= state.get('pc', -1) < n:
+                pc = resumed = self._restore_checkpoint(state)
+                print(f"Resuming workflow at step {pc + 1}")
         
-        while self.running and self.current_step_index < len(self.steps):
+        while self.running and pc < n:
             if self.stop_event.is_set(): break
             
-            step = self.steps[self.current_step_index]
+            step = program[pc]
+            self.current_step_index = pc
             
             if self.highlight_callback:
-                self.highlight_callback(self.current_step_index)
+                self.highlight_callback(pc, [tuple(c) for c in counters.values()])
             
+            profiler.begin(pc, step.action)
+            nxt = None
             try:
-                self.execute_step(step)
+                nxt = dispatch[step.action](step)
             except Exception as e:
-                print(f"Error in step {self.current_step_index}: {e}")
+                print(f"Error in step {pc}: {e}")
+                self.errors.append((pc, str(e)))
+            executed += 1
+            if self.stop_event.is_set() and not step.control:
+                profiler.end()
+                break # the step may not have finished, so a resume runs it again
                 
-            self.current_step_index += 1
-            # Small delay between steps
-            time.sleep(0.1)
+            mode, seconds = settles[pc]
+            pc = pc + 1 if nxt is None else nxt
+            if mode != 'none' and pc < n:
+                with profiler.phase('settle'):
+                    dead_time += self._settle(mode, seconds)
+            profiler.end()
+            if writer is not None and pc < n and writer.due():
+                self._save_checkpoint(writer, pc)
             
+        self.current_step_index = pc
+        if writer is not None:
+            if pc < n:
+                self._save_checkpoint(writer, pc)
+            else:
+                writer.clear()
+        self.stats = {
+            'steps': executed,
+            'elapsed': time.perf_counter() - started,
+            'dead_time': dead_time,
+            'errors': len(self.errors),
+            'cache_hits': self.locations.hits,
+            'cache_misses': self.locations.misses,
+            'resumed_at': resumed,
+            'checkpoints': writer.writes if writer else 0,
+            'checkpoint_time': writer.seconds if writer else 0.0,
+        }
+        print(format_run_stats(self.stats))
         self.running = False
 
+    def _checkpoint_writer(self):
+        if not self.checkpoint_dir: return None
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Checkpoints disabled: {e}")
+            return None
+        path = checkpoint_path(self.checkpoint_dir, self.steps)
+        if self.checkpoint_interval is None:
+            return CheckpointWriter(path)
+        return CheckpointWriter(path, self.checkpoint_interval)
+
+    def _save_checkpoint(self, writer, pc):
+        """Saves the state needed to continue at step `pc`; a failed write only skips this checkpoint."""
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'workflow': workflow_key(self.steps),
+            'pc': pc,
+            'loops': [[start, it, count] for start, (it, count) in self.loop_counters.items()],
+            # Keys that aren't paths (templates given without one) can't outlive the process
+            'locations': [[key, e.x, e.y, e.w, e.h, e.confidence, e.window]
+                          for key, e in self.locations.entries.items() if isinstance(key, str)],
+            'saved': time.time(),
+        }
+        try:
+            writer.save(state)
+        except OSError as e:
+            print(f"Could not save checkpoint: {e}")
+
+    def _restore_checkpoint(self, state):
+        """Restores loop counters and cached locations; returns the step index to continue at."""
+        pc = state['pc']
+        program = self.program
+        for start, it, count in state.get('loops', ()):
+            # Only loops that enclose the resume point, in case the file was tampered with
+            if 0 <= start < pc and program[start].action == 'Loop' and pc <= program[start].end:
+                self.loop_counters[start] = [it, count]
+        for key, x, y, w, h, confidence, window in state.get('locations', ()):
+            self.locations.store(key, x, y, w, h, confidence, tuple(window) if window else None)
+        return pc
+
+    def settle_for(self, step):
+        """(mode, seconds) to wait after `step`: its own settle, else the workflow policy."""
+        if step.control:
+            return 'none', 0.0
+        if step.settle is not None:
+            return step.settle, step.settle_time
+        if self.settle == 'auto':
+            return AUTO_SETTLE.get(step.action, ('none', 0.0))
+        if self.settle_time is None:
+            return self.settle, SETTLE_DEFAULT_MS[self.settle] / 1000.0
+        return self.settle, self.settle_time
+
+    def _settle(self, mode, seconds):
+        """Waits per the settle mode; returns the seconds spent."""
+        start = time.perf_counter()
+        if mode == 'fixed':
+            self.stop_event.wait(seconds)
+        elif mode == 'stable':
+            self._wait_stable(start + seconds)
+        return time.perf_counter() - start
+
+    def _grab_frame(self):
+        """Small greyscale copy of the screen, cheap enough to diff every poll."""
+        frame = self._grab_screen()[::STABLE_STRIDE, ::STABLE_STRIDE]
+        if frame.ndim == 3:
+            frame = frame[..., :3].mean(axis=2)
+        return frame.astype(np.float32)
+
+    def _wait_stable(self, deadline):
+        """Returns True once two consecutive frames match, False at the deadline or on stop."""
+        try:
+            prev = self._grab_frame()
+            while not self.stop_event.wait(STABLE_POLL):
+                frame = self._grab_frame()
+                if frame.shape == prev.shape and np.abs(frame - prev).mean() <= STABLE_THRESHOLD:
+                    return True
+                if time.perf_counter() >= deadline: break
+                prev = frame
+        except Exception as e:
+            print(f"Error waiting for a stable screen: {e}")
+        return False
+
     def execute_step(self, step):
-        action = step.get('action')
-        params = step.get('params', {})
-        
-        if action == 'Delay':
-            time.sleep(float(params.get('duration', 1000)) / 1000.0)
-            
-        elif action == 'Click':
-            x = int(params.get('x', 0))
-            y = int(params.get('y', 0))
-            btn_str = params.get('button', 'left')
-            btn = getattr(Button, btn_str, Button.left)
-            clicks = 2 if params.get('type') == 'double' else 1
-            
+        """Runs one step (compiled Step or raw step dict)."""
+        if not isinstance(step, Step):
+            step = compile_step(step, self.current_step_index, self.templates, self._load_template)
+        _require(*REQUIRES.get(step.action, ()))
+        return self._dispatch[step.action](step)
+
+    def _run_delay(self, step):
+        time.sleep(step.seconds)
+
+    def _run_click(self, step):
+        with self.profiler.phase('inject'):
             # Optional move
-            pyautogui.moveTo(x, y) 
+            pyautogui.moveTo(step.x, step.y) 
             # Pynput click
-            self.mouse.position = (x, y)
-            self.mouse.click(btn, clicks)
-            
-        elif action == 'Key Press':
-            k_str = params.get('key', '')
-            if k_str:
-                keys = [k.strip().lower() for k in k_str.split('+')]
-                keys = ['win' if k == 'windows' else k for k in keys]
-                
-                if len(keys) > 1:
-                    pyautogui.hotkey(*keys)
-                else:
-                    pyautogui.press(keys[0])
-                    
-        elif action == 'Type Text':
-            text = params.get('text', '')
-            if text:
-                pyautogui.write(text, interval=0.05)
-                
-        elif action == 'Wait Image':
-            path = params.get('image_path')
-            timeout = float(params.get('timeout', 10))
-            threshold = float(params.get('confidence', 0.8))
-            
-            start = time.time()
-            found = False
-            while time.time() - start < timeout:
-                if self.stop_event.is_set(): return
-                pos = self._find_image(path, threshold)
-                if pos:
-                    found = True
-                    break
-                time.sleep(0.5)
-            
-            if not found:
-                print(f"Workflow: Image not found '{path}' within timeout.")
-                
-        elif action == 'Click Image':
-            path = params.get('image_path')
-            timeout = float(params.get('timeout', 5))
-            threshold = float(params.get('confidence', 0.8))
-            btn_str = params.get('button', 'left')
-            btn = getattr(Button, btn_str, Button.left)
-            
-            # Try to find
-            start = time.time()
-            pos = None
-            while time.time() - start < timeout:
-                if self.stop_event.is_set(): return
-                pos = self._find_image(path, threshold)
-                if pos: break
-                time.sleep(0.2)
-                
+            self.mouse.position = (step.x, step.y)
+            self.mouse.click(step.button, step.clicks)
+
+    def _run_key_press(self, step):
+        if not step.keys: return
+        with self.profiler.phase('inject'):
+            if len(step.keys) > 1:
+                pyautogui.hotkey(*step.keys)
+            else:
+                pyautogui.press(step.keys[0])
+
+    def _run_type_text(self, step):
+        if not step.text: return
+        with self.profiler.phase('inject'):
+            result = type_text(step.text, step.mode, step.interval, step.cps,
+                               keyboard=self.keyboard, gui=pyautogui, stop_event=self.stop_event)
+        self.profiler.count('chars', result['chars'])
+        if result['fallback']:
+            self.profiler.count(f"typed_{result['fallback']}")
+
+    def _run_wait_image(self, step):
+        start = time.time()
+        found = False
+        while time.time() - start < step.timeout:
+            if self.stop_event.is_set(): return
+            self.profiler.count('polls')
+            pos = self._find_image(step.image_path, step.confidence, step.template)
             if pos:
+                found = True
+                break
+            time.sleep(0.5)
+        
+        if not found:
+            print(f"Workflow: Image not found '{step.image_path}' within timeout.")
+
+    def _run_click_image(self, step):
+        # Try to find
+        start = time.time()
+        pos = None
+        while time.time() - start < step.timeout:
+            if self.stop_event.is_set(): return
+            self.profiler.count('polls')
+            pos = self._find_image(step.image_path, step.confidence, step.template)
+            if pos: break
+            time.sleep(0.2)
+            
+        if pos:
+            with self.profiler.phase('inject'):
                 self.mouse.position = pos
-                self.mouse.click(btn, 1)
-            else:
-                print(f"Workflow: Image for click not found '{path}'")
-                
-        elif action == 'AI Action':
+                self.mouse.click(step.button, 1)
+        else:
+            print(f"Workflow: Image for click not found '{step.image_path}'")
+
+    def _run_ai_action(self, step):
+        if not step.prompt: return
+        if self._ai is None:
             from src.ai_controller import AIController
-            prompt = params.get('prompt', '')
-            if prompt:
-                ai = AIController(self.api_key, self.stop_event)
-                ai.execute_prompt(prompt, callback=self.ai_debug_callback)
+            self._ai = AIController(self.api_key, self.stop_event)
+        with self.profiler.phase('ai'):
+            self._ai.execute_prompt(step.prompt, callback=self.ai_debug_callback)
+
+    # Control flow: handlers return the next step index, None falls through
+    def _run_noop(self, step):
+        return None
+
+    def _run_jump(self, step):
+        return step.target
+
+    def _run_goto(self, step):
+        return self._jump(step.target)
 
-    def _find_image(self, path, conf):
+    def _jump(self, target):
+        """Returns `target`, forgetting the counters of loops the jump leaves."""
+        program = self.program
+        for start in [s for s in self.loop_counters if not s < target <= program[s].end]:
+            del self.loop_counters[start]
+        return target
+
+    def _run_loop(self, step):
+        # Entering a loop again (by falling into it or via Goto) restarts its count
+        self.loop_counters.pop(step.index, None)
+        self.loop_counters[step.index] = [1, step.count]
+
+    def _run_end_loop(self, step):
+        counter = self.loop_counters.get(step.start)
+        if counter is None: return None # reached without entering the loop
+        if step.count == 0 or counter[0] < step.count:
+            counter[0] += 1
+            return step.start + 1
+        del self.loop_counters[step.start]
+        return None
+
+    def _run_if_image(self, step):
+        found = self._find_image(step.image_path, step.confidence, step.template) is not None
+        return None if found != step.negate else step.target
+
+    def _run_if_pixel(self, step):
+        with self.profiler.phase('capture'):
+            pixel = pyautogui.pixel(step.x, step.y)
+        match = all(abs(int(a) - b) <= step.tolerance for a, b in zip(pixel[:3], step.color))
+        return None if match != step.negate else step.target
+
+    def _run_wait_any(self, step):
+        hit = run_wait_any(step.watchers, self._grab_screen, self.stop_event)
+        if hit is None: return None # stopped
+        i, result = hit
+        watcher = step.watchers[i]
+        self.last_match = (watcher.name, result)
+        if i == len(step.watchers) - 1:
+            print(f"Workflow: nothing matched within {step.timeout}s")
+        target = step.targets[i]
+        return None if target is None else self._jump(target)
+
+    def _grab_screen(self):
+        _require('pyautogui')
+        with self.profiler.phase('capture'):
+            return np.asarray(pyautogui.screenshot())
+
+    def _find_image(self, path, conf, template=None):
+        _require('pyautogui', 'cv2')
+        from src.vision import match_best
         try:
-            if not path: return None
-            
-            template = cv2.imread(path)
-            if template is None: return None
+            if template is None:
+                if not path: return None
+                template = cv2.imread(path)
+                if template is None: return None
+            key = path or id(template)
+            window = _active_window()
+            if key in self.locations.entries:
+                pos = self._find_cached(key, template, conf, window)
+                if pos: return pos
             
-            screenshot = pyautogui.screenshot()
-            screen_np = np.array(screenshot)
-            screen_bgr = cv2.cvtColor(screen_np, cv2.COLOR_RGB2BGR)
+            with self.profiler.phase('capture'):
+                screenshot = pyautogui.screenshot()
+                screen_np = np.array(screenshot)
             
-            res = cv2.matchTemplate(screen_bgr, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            with self.profiler.phase('match'):
+                screen_bgr = cv2.cvtColor(screen_np, cv2.COLOR_RGB2BGR)
+                max_val, max_loc = match_best(screen_bgr, template)
             
             if max_val >= conf:
                 h, w = template.shape[:2]
                 cx = max_loc[0] + w // 2
                 cy = max_loc[1] + h // 2
+                self.locations.store(key, max_loc[0], max_loc[1], w, h, max_val, window)
                 return (cx, cy)
         except Exception as e:
             print(f"Error finding image: {e}")
         return None
+
+    def _find_cached(self, key, template, conf, window):
+        """
+        Checks the template's last known box; None (entry dropped) on a miss,
+        including when the check itself fails, e.g. a box that is off screen
+        after a resolution change, so the caller falls back to a full search.
+        """
+        locations, profiler = self.locations, self.profiler
+        hits = locations.hits
+        pos = None
+        try:
+            if locations.check_window(key, window):
+                region = locations.region(locations.get(key), pyautogui.size())
+                with profiler.phase('capture'):
+                    roi = np.asarray(pyautogui.screenshot(region=region))
+                with profiler.phase('match'):
+                    pos = locations.verify(key, roi, region, template, conf)
+        except Exception as e:
+            print(f"Cached location of {key} could not be checked: {e}")
+            if key in locations.entries:
+                locations.invalidate(key)
+                locations.misses += 1
+        profiler.count('cache_hits' if locations.hits > hits else 'cache_misses')
+        return pos
+
+
+def _active_window():
+    """Rect of the foreground window where pyautogui can tell (Windows), else None."""
+    try:
+        w = pyautogui.getActiveWindow()
+        return (w.left, w.top, w.width, w.height) if w else None
+    except Exception:
+        return None
+
+
+def format_run_stats(stats):
+    text = (f"Workflow finished: {stats['steps']} steps in {stats['elapsed']:.2f}s, "
+            f"{stats['dead_time']:.2f}s spent settling between steps")
+    lookups = stats.get('cache_hits', 0) + stats.get('cache_misses', 0)
+    if lookups:
+        text += f", image location cache {stats['cache_hits']}/{lookups} hits"
+    if stats.get('resumed_at') is not None:
+        text += f", resumed at step {stats['resumed_at'] + 1}"
+    if stats.get('checkpoints'):
+        text += f", {stats['checkpoints']} checkpoint(s) in {stats['checkpoint_time'] * 1000.0:.1f} ms"
+    return text
@@ -0,0 +1,88 @@
+import json
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src import batch
+
+
+def write_workflow(tmp_path, steps, name='flow.json'):
+    path = tmp_path / name
+    path.write_text(json.dumps(steps))
+    return str(path)
+
+
+def test_apply_params_replaces_known_placeholders_only():
+    steps = [{'action': 'Type Text', 'params': {'text': 'hi {user} {other}', 'n': 3}},
+             {'action': 'Wait Any', 'params': {'watch': [{'image_path': '{user}.png'}]}}]
+    out = batch.apply_params(steps, {'user': 'bob'})
+    assert out[0]['params'] == {'text': 'hi bob {other}', 'n': 3}
+    assert out[1]['params']['watch'][0]['image_path'] == 'bob.png'
+    assert steps[0]['params']['text'] == 'hi {user} {other}'
+
+
+def test_expand_jobs(tmp_path):
+    jobs = batch.expand_jobs([
+        {'workflow': 'login.json', 'params': {'user': 'alice'}},
+        {'workflow': 'login.json', 'params': [{'user': 'bob'}, {'user': 'carol'}], 'settle': 'none'},
+        {'workflow': 'plain.json', 'name': 'smoke'},
+    ], str(tmp_path))
+    assert [j['name'] for j in jobs] == ['login user=alice', 'login user=bob', 'login user=carol', 'smoke']
+    assert jobs[0]['workflow'] == os.path.join(str(tmp_path), 'login.json')
+    assert jobs[2]['settle'] == 'none' and jobs[3]['params'] == {}
+
+
+def test_free_displays_skips_locked(tmp_path):
+    with patch('src.batch.os.path.exists', side_effect=lambda p: p == '/tmp/.X100-lock'):
+        assert batch.free_displays(3, 99) == [99, 101, 102]
+
+
+def test_start_xvfb_waits_for_socket():
+    proc = MagicMock()
+    proc.poll.return_value = None
+    socket_checks = iter([False, False, True])
+    with patch('src.batch.shutil.which', return_value='/usr/bin/Xvfb'), \
+         patch('src.batch.subprocess.Popen', return_value=proc) as popen, \
+         patch('src.batch.os.path.exists', side_effect=lambda p: next(socket_checks)), \
+         patch('src.batch.time.sleep'):
+        assert batch.start_xvfb(42, '800x600x24') is proc
+    assert popen.call_args.args[0] == ['/usr/bin/Xvfb', ':42', '-screen', '0', '800x600x24', '-nolisten', 'tcp']
+
+
+def test_start_xvfb_missing_binary():
+    with patch('src.batch.shutil.which', return_value=None):
+        with pytest.raises(RuntimeError, match="Xvfb not found"):
+            batch.start_xvfb(42)
+
+
+def test_run_job_in_process(tmp_path):
+    path = write_workflow(tmp_path, [{'action': 'Delay', 'params': {'duration': '{ms}'}}])
+    with patch('src.workflow_runner.MouseController'):
+        result = batch.run_job({'name': 'j', 'workflow': path, 'params': {'ms': 5}})
+    assert result['ok'] and result['error'] is None
+    assert result['stats']['steps'] == 1
+    assert result['elapsed'] >= 0.005
+
+
+def test_run_job_reports_compile_errors(tmp_path):
+    path = write_workflow(tmp_path, [{'action': 'Delay', 'params': {'duration': '{ms}'}}])
+    with patch('src.workflow_runner.MouseController'):
+        result = batch.run_job({'name': 'j', 'workflow': path, 'params': {}})
+    assert not result['ok']
+    assert "Step 1 (Delay)" in result['error']
+
+
+def test_run_batch_on_process_pool(tmp_path):
+    ok = write_workflow(tmp_path, [{'action': 'Delay', 'params': {'duration': 20}}], 'ok.json')
+    jobs = batch.expand_jobs([
+        {'workflow': ok, 'params': [{'n': i} for i in range(4)]},
+        {'workflow': 'missing.json'},
+    ], str(tmp_path))
+    seen = []
+    results, summary = batch.run_batch(jobs, workers=2, xvfb=False, on_result=seen.append)
+    assert [r['name'] for r in results] == [j['name'] for j in jobs]
+    assert [r['ok'] for r in results] == [True] * 4 + [False]
+    assert len(seen) == 5
+    assert all(r['pid'] != os.getpid() for r in results)
+    assert (summary['jobs'], summary['ok'], summary['failed'], summary['workers']) == (5, 4, 1, 2)
+    assert "4/5 jobs ok" in batch.format_summary(summary)
@@ -0,0 +1,58 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+
+from src.checkpoint import CheckpointWriter, checkpoint_path, load_checkpoint, workflow_key, write_atomic, VERSION
+
+STEPS = [{'action': 'Key Press', 'params': {'key': 'a'}}]
+
+
+def test_workflow_key_follows_content():
+    assert workflow_key(STEPS) == workflow_key(json.loads(json.dumps(STEPS)))
+    assert workflow_key(STEPS) != workflow_key([{'action': 'Key Press', 'params': {'key': 'b'}}])
+
+
+def test_write_atomic_keeps_old_file_when_write_fails(tmp_path):
+    path = str(tmp_path / 'cp.json')
+    write_atomic(path, b'old')
+    with patch('os.replace', side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            write_atomic(path, b'new')
+    assert open(path, 'rb').read() == b'old'
+    assert os.listdir(tmp_path) == ['cp.json']
+
+
+def test_load_rejects_other_workflow_and_corrupt_files(tmp_path):
+    path = checkpoint_path(str(tmp_path), STEPS)
+    write_atomic(path, json.dumps({'version': VERSION, 'workflow': workflow_key(STEPS), 'pc': 3}).encode())
+    assert load_checkpoint(path, STEPS)['pc'] == 3
+    assert load_checkpoint(path, STEPS + STEPS) is None
+    write_atomic(path, b'{"version": 1, "pc"')
+    assert load_checkpoint(path) is None
+    assert load_checkpoint(str(tmp_path / 'missing.json')) is None
+
+
+def test_writer_is_due_after_interval_and_backs_off_when_slow(tmp_path):
+    now = [0.0]
+    writer = CheckpointWriter(str(tmp_path / 'cp.json'), interval=5.0, max_overhead=0.01, clock=lambda: now[0])
+    assert not writer.due()
+    now[0] = 5.0
+    assert writer.due()
+
+    def slow_write(path, data):
+        now[0] += 0.2  # 200 ms write -> next one no sooner than 20 s later
+    with patch('src.checkpoint.write_atomic', side_effect=slow_write):
+        writer.save({'pc': 1})
+    assert writer.writes == 1
+    assert writer.max_seconds == pytest.approx(0.2)
+    assert writer.next_due == pytest.approx(5.2 + 20.0)
+
+
+def test_writer_clear(tmp_path):
+    writer = CheckpointWriter(str(tmp_path / 'cp.json'))
+    writer.save({'pc': 1})
+    assert json.loads(open(writer.path).read()) == {'pc': 1}
+    writer.clear()
+    writer.clear()
+    assert not os.path.exists(writer.path)
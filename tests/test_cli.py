@@ -0,0 +1,126 @@
+import json
+import subprocess
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src import cli, macro_file
+from src.event_store import EventStore
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    monkeypatch.setenv('APPDATA', str(tmp_path / 'data'))
+    return tmp_path / 'data'
+
+
+@pytest.fixture
+def workflow(tmp_path):
+    def write(steps):
+        path = tmp_path / 'flow.json'
+        path.write_text(json.dumps(steps))
+        return str(path)
+    return write
+
+
+def test_run_workflow_repeats_and_reports(workflow, capsys):
+    path = workflow([{'action': 'Key Press', 'params': {'key': 'a'}}] * 2)
+    with patch('src.workflow_runner.pyautogui') as mock_pyautogui, \
+         patch('src.workflow_runner.MouseController'):
+        code = cli.main(['run', path, '--repeat', '3', '--report'])
+    assert code == cli.EXIT_OK
+    assert mock_pyautogui.press.call_count == 6
+    out = capsys.readouterr().out
+    assert "Run 3/3" in out
+    assert "1. Key Press" in out and "avg" in out
+    assert "3 runs: mean" in out
+
+
+def test_run_invalid_workflow_exits_with_error(workflow, capsys):
+    path = workflow([{'action': 'Delay', 'params': {'duration': 'soon'}}])
+    with patch('src.workflow_runner.MouseController'):
+        assert cli.main(['run', path]) == cli.EXIT_INVALID
+    assert "Step 1 (Delay)" in capsys.readouterr().err
+
+
+def test_run_writes_trace(workflow, tmp_path):
+    path = workflow([{'action': 'Delay', 'params': {'duration': 0}}])
+    trace = tmp_path / 'trace.json'
+    with patch('src.workflow_runner.MouseController'):
+        assert cli.main(['run', path, '--trace', str(trace)]) == cli.EXIT_OK
+    events = json.loads(trace.read_text())['traceEvents']
+    assert any(e.get('name') == '1. Delay' for e in events)
+
+
+def test_run_resumes_after_stop(workflow, capsys):
+    import threading
+    path = workflow([{'action': 'Key Press', 'params': {'key': k}} for k in 'abc'])
+    stop = threading.Event()
+    with patch('src.workflow_runner.pyautogui') as mock_pyautogui, \
+         patch('src.workflow_runner.MouseController'), \
+         patch('src.cli.threading.Event', return_value=stop):
+        mock_pyautogui.press.side_effect = lambda key: key == 'b' and stop.set()  # Ctrl+C during 'b'
+        assert cli.main(['run', path]) == cli.EXIT_STOPPED
+    with patch('src.workflow_runner.pyautogui') as mock_pyautogui, \
+         patch('src.workflow_runner.MouseController'):
+        assert cli.main(['run', path, '--resume']) == cli.EXIT_OK
+    assert [c.args[0] for c in mock_pyautogui.press.call_args_list] == ['b', 'c']
+    assert "Resuming workflow at step 2" in capsys.readouterr().out
+
+
+def test_play_macro_repeats(tmp_path, capsys):
+    store = EventStore()
+    store.add('move', 0.0, 10, 10)
+    store.add('click', 0.001, 10, 10, button='Button.left', pressed=True)
+    store.add('click', 0.002, 10, 10, button='Button.left', pressed=False)
+    path = str(tmp_path / 'm.acm')
+    macro_file.save_macro(path, store)
+    mouse = MagicMock()
+    with patch('src.player.MouseController', return_value=mouse), \
+         patch('src.player.KeyboardController'):
+        code = cli.main(['play', path, '--repeat', '2', '--speed', '2', '--report'])
+    assert code == cli.EXIT_OK
+    assert mouse.press.call_count == 2
+    out = capsys.readouterr().out
+    assert "Run 2/2: Played 3 events" in out
+
+
+def test_play_streams_and_releases_on_corrupt_chunk(tmp_path, capsys, monkeypatch):
+    """The first chunk plays before a damaged later one is found; held buttons are let go."""
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 2)
+    path = tmp_path / 'm.acm'
+    macro_file.save_macro(str(path), [
+        {'type': 'click', 'time': 0.0, 'x': 1, 'y': 1, 'button': 'left', 'pressed': True},
+        {'type': 'move', 'time': 0.001, 'x': 2, 'y': 2},
+        {'type': 'move', 'time': 0.002, 'x': 3, 'y': 3},
+        {'type': 'click', 'time': 0.003, 'x': 3, 'y': 3, 'button': 'left', 'pressed': False},
+    ])
+    with macro_file.MacroReader(str(path)) as reader:
+        offset, length = reader.index[1][:2]
+    data = bytearray(path.read_bytes())
+    data[offset:offset + length] = b'\xff' * length
+    path.write_bytes(bytes(data))
+    mouse = MagicMock()
+    with patch('src.player.MouseController', return_value=mouse), \
+         patch('src.player.KeyboardController'):
+        assert cli.main(['play', str(path)]) == cli.EXIT_INVALID
+    mouse.press.assert_called_once()
+    mouse.release.assert_called_once()
+    assert "Could not play" in capsys.readouterr().err
+
+
+def test_play_missing_file(tmp_path, capsys):
+    assert cli.main(['play', str(tmp_path / 'nope.acm')]) == cli.EXIT_INVALID
+    assert "Could not load" in capsys.readouterr().err
+
+
+def test_cli_does_not_import_qt_or_cv2(workflow):
+    path = workflow([{'action': 'Delay', 'params': {'duration': 0}}])
+    code = (
+        "import sys; from src import cli; rc = cli.main(['run', %r]); "
+        "heavy = [m for m in ('PySide6', 'cv2') if m in sys.modules]; "
+        "print(rc, heavy)" % path
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+    assert out.stdout.strip().splitlines()[-1] == "0 []", out.stderr
@@ -4,7 +4,7 @@ import threading
 import time
 
 # We patch pynput inside the test to prevent it from actually listening or moving the mouse during tests.
-from src.clicker import Clicker
+from src.clicker import Clicker, compile_pattern, parse_points
 from pynput.mouse import Button
 
 @pytest.fixture
@@ -93,3 +93,57 @@ def test_invalid_mouse_btn(clicker_instance):
     # The application currently does not catch AttributeError, so we test that it is raised.
     with pytest.raises(AttributeError):
         clicker_instance.run(config)
+
+def test_compile_pattern_grid_snake():
+    """Snake order reverses every other grid row so the cursor never jumps back."""
+    spec = {'kind': 'grid', 'origin': (100, 200), 'spacing': (10, 20), 'cols': 3, 'rows': 2}
+    pts = compile_pattern(spec, 'snake')
+    assert list(pts) == [100, 200, 110, 200, 120, 200, 120, 220, 110, 220, 100, 220]
+
+def test_compile_pattern_path_resampling():
+    """A path is resampled so points are evenly spaced along the polyline."""
+    spec = {'kind': 'path', 'points': [(0, 0), (10, 0), (10, 10)], 'step': 5}
+    pts = compile_pattern(spec)
+    assert list(pts) == [0, 0, 5, 0, 10, 0, 10, 5, 10, 10]
+
+def test_parse_points():
+    assert parse_points("100,200; 300, 400\n5,6;") == [[100, 200], [300, 400], [5, 6]]
+    with pytest.raises(ValueError, match="'1,2,3'"):
+        parse_points("1,2,3")
+
+def test_run_pattern_clicks_each_point(clicker_instance):
+    """Pattern mode moves to every compiled point and clicks it once per pass."""
+    config = {
+        'action_type': 'mouse', 'mouse_btn': 'left', 'click_type': 'single',
+        'pattern': {'kind': 'list', 'points': [(1, 2), (3, 4), (5, 6)]},
+        'dwell': 0, 'passes': 2
+    }
+    positions = []
+    clicker_instance.mouse.click.side_effect = lambda *a: positions.append(clicker_instance.mouse.position)
+
+    clicker_instance.run(config)
+
+    assert positions == [(1, 2), (3, 4), (5, 6)] * 2
+    clicker_instance.mouse.click.assert_called_with(Button.left, 1)
+
+
+def test_hold_mode_multiple_keys(clicker_instance):
+    """Hold mode presses every key in a combo, repeats on schedule and releases after hold_dur."""
+    keys = clicker_instance.resolve_keys('w+a')
+    assert keys == ['w', 'a']
+
+    config = {'hold_dur': 60, 'hold_delay': 0, 'hold_rate': 100}
+    stats = clicker_instance.run_hold(keys, config)
+
+    presses = [c.args[0] for c in clicker_instance.keyboard.press.call_args_list]
+    assert presses.count('w') == presses.count('a') == stats['repeats'] + 1
+    assert 2 <= stats['repeats'] <= 7
+    assert [c.args[0] for c in clicker_instance.keyboard.release.call_args_list] == ['a', 'w']
+    assert stats['held_for'] >= 0.06
+    assert clicker_instance.hold_stats is stats
+
+def test_hold_mode_stops_on_event(clicker_instance):
+    """A hold with no duration runs until the stop event and still releases the key."""
+    clicker_instance.stop_event.set()
+    clicker_instance.run_hold(['x'], {'hold_dur': 0, 'hold_rate': 30})
+    clicker_instance.keyboard.release.assert_called_once_with('x')
@@ -0,0 +1,84 @@
+import sys
+import pytest
+
+from src import event_store
+from src.event_store import EventStore
+
+SAMPLE = [
+    {'type': 'move', 'time': 0.01, 'x': 10, 'y': 20},
+    {'type': 'click', 'time': 0.02, 'x': 10, 'y': 20, 'button': 'left', 'pressed': True},
+    {'type': 'click', 'time': 0.03, 'x': 10.5, 'y': 20.25, 'button': 'left', 'pressed': False},
+    {'type': 'scroll', 'time': 0.04, 'x': 1, 'y': 2, 'dx': 0, 'dy': -1},
+    {'type': 'key_press', 'time': 0.05, 'key': 'a'},
+    {'type': 'key_release', 'time': 0.06, 'key': 'Key.space'},
+]
+
+def test_round_trip_dict_view():
+    """Every row comes back as the same dict it was stored from."""
+    store = EventStore(SAMPLE)
+    assert len(store) == len(SAMPLE)
+    assert store == SAMPLE
+    assert store.to_list() == SAMPLE
+    assert store[-1] == SAMPLE[-1]
+    assert isinstance(store[0]['x'], int)
+    assert isinstance(store[2]['x'], float)
+
+def test_unknown_fields_kept_in_extras():
+    store = EventStore()
+    store.add('custom', 1.0, foo='bar')
+    assert store[0] == {'type': 'custom', 'time': 1.0, 'foo': 'bar'}
+
+def test_partial_fields_round_trip_without_added_keys():
+    events = [
+        {'type': 'custom', 'time': 1.0, 'x': 5},
+        {'type': 'custom', 'time': 2.0, 'y': 1.5},
+        {'type': 'scroll', 'time': 3.0, 'dy': 70000},
+    ]
+    assert EventStore(events) == events
+
+def test_strings_are_interned():
+    store = EventStore(SAMPLE * 10)
+    # move, click, left, scroll, key_press, a, key_release, Key.space
+    assert len(store.strings) == 8
+
+def test_slice_across_chunks(monkeypatch):
+    """Slices re-chunk correctly and keep per-row extras aligned."""
+    monkeypatch.setattr(event_store, 'CHUNK_SIZE', 4)
+    store = EventStore()
+    for i in range(10):
+        store.add('move', i / 10, x=i, y=i)
+    store.add('custom', 1.0, foo='bar')
+
+    part = store[3:11]
+    assert len(part) == 8
+    assert len(part.chunks) == 2
+    assert [ev['x'] for ev in part[:7]] == [3, 4, 5, 6, 7, 8, 9]
+    assert part[7]['foo'] == 'bar'
+    assert store[:0] == []
+
+def test_index_out_of_range():
+    with pytest.raises(IndexError):
+        EventStore()[0]
+
+def test_memory_order_of_magnitude_smaller():
+    """Move events take roughly a tenth of the memory of the equivalent dicts."""
+    n = 20000
+    dicts = [{'type': 'move', 'time': i * 0.001, 'x': 300 + i % 1600, 'y': 300 + i % 700} for i in range(n)]
+    dict_bytes = sum(
+        8 + sys.getsizeof(d) + sys.getsizeof(d['time']) + sys.getsizeof(d['x']) + sys.getsizeof(d['y'])
+        for d in dicts
+    )
+
+    store = EventStore(dicts)
+    assert store.nbytes() * 10 < dict_bytes
+
+def test_column_spans_chunks():
+    from src.event_store import CHUNK_SIZE
+    store = EventStore()
+    for i in range(CHUNK_SIZE + 3):
+        store.add('move', i * 0.5, x=i, y=-i)
+    xs = store.column('x')
+    assert xs.typecode == 'i'
+    assert len(xs) == CHUNK_SIZE + 3
+    assert xs[-1] == CHUNK_SIZE + 2
+    assert store.column('time')[2] == 1.0
@@ -0,0 +1,78 @@
+import numpy as np
+from unittest.mock import MagicMock
+
+from src.location_cache import LocationCache
+from src.vision import match_best
+
+
+def make_screen(at=(40, 30), size=(120, 160)):
+    rng = np.random.default_rng(1)
+    screen = rng.integers(0, 40, size + (3,), dtype=np.uint8)
+    patch = rng.integers(100, 255, (12, 16, 3), dtype=np.uint8)
+    x, y = at
+    screen[y:y + 12, x:x + 16] = patch
+    return screen, np.ascontiguousarray(patch[..., ::-1])  # template is BGR like cv2.imread
+
+
+def crop(screen, region):
+    left, top, w, h = region
+    return screen[top:top + h, left:left + w]
+
+
+def test_region_is_clipped_to_screen():
+    cache = LocationCache(margin=10)
+    cache.store('a', 5, 100, 16, 12, 0.99)
+    assert cache.region(cache.get('a'), (160, 110)) == (0, 90, 31, 20)
+
+
+def test_verify_hits_then_uses_pixel_hash():
+    screen, template = make_screen()
+    cache = LocationCache()
+    cache.store('btn', 40, 30, 16, 12, 0.99)
+    region = cache.region(cache.get('btn'), (160, 120))
+    match = MagicMock(side_effect=match_best)
+    assert cache.verify('btn', crop(screen, region), region, template, 0.9, match) == (48, 36)
+    assert cache.verify('btn', crop(screen, region), region, template, 0.9, match) == (48, 36)
+    assert match.call_count == 1  # second lookup matched on the region hash
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_verify_follows_small_shift():
+    screen, template = make_screen(at=(40, 30))
+    moved, _ = make_screen(at=(45, 27))
+    cache = LocationCache(margin=16)
+    cache.store('btn', 40, 30, 16, 12, 0.99)
+    region = cache.region(cache.get('btn'), (160, 120))
+    assert cache.verify('btn', crop(moved, region), region, template, 0.9) == (53, 33)
+    assert (cache.get('btn').x, cache.get('btn').y) == (45, 27)
+
+
+def test_verify_miss_invalidates():
+    screen, template = make_screen(at=(40, 30))
+    gone, _ = make_screen(at=(120, 90))
+    cache = LocationCache()
+    cache.store('btn', 40, 30, 16, 12, 0.99)
+    region = cache.region(cache.get('btn'), (160, 120))
+    assert cache.verify('btn', crop(gone, region), region, template, 0.9) is None
+    assert cache.get('btn') is None
+    assert (cache.misses, cache.invalidations) == (1, 1)
+
+
+def test_confidence_drop_invalidates():
+    screen, template = make_screen()
+    cache = LocationCache(max_drop=0.1)
+    cache.store('btn', 40, 30, 16, 12, 0.99)
+    region = cache.region(cache.get('btn'), (160, 120))
+    match = MagicMock(return_value=(0.85, (16, 16)))
+    # Still above the step's 0.8, but 0.14 below what was cached
+    assert cache.verify('btn', crop(screen, region), region, template, 0.8, match) is None
+    assert cache.get('btn') is None
+
+
+def test_window_change_invalidates():
+    cache = LocationCache()
+    cache.store('btn', 1, 1, 4, 4, 0.9, window=(0, 0, 800, 600))
+    assert cache.check_window('btn', (0, 0, 800, 600))
+    assert not cache.check_window('btn', (50, 0, 800, 600))
+    assert cache.get('btn') is None
+    assert cache.hit_rate == 0.0
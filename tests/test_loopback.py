@@ -0,0 +1,39 @@
+import pytest
+from unittest.mock import MagicMock
+
+from src.loopback import build_report, format_report, _StampingController
+
+def test_build_report_rates_and_histogram():
+    """Achieved rate, histogram buckets and latency are derived from the timestamps."""
+    sent = [0.000, 0.010, 0.020, 0.030]
+    arrived = [0.001, 0.012, 0.021, 0.0335]
+
+    report = build_report(sent, arrived, target_interval=0.01, bins_ms=(5, 10, 20))
+
+    assert report['sent'] == 4 and report['arrived'] == 4 and report['lost'] == 0
+    assert report['target_rate'] == pytest.approx(100.0)
+    assert report['achieved_rate'] == pytest.approx(3 / 0.0325)
+    # Gaps are 11, 9 and 12.5 ms -> one lands in [5, 10), two in [10, 20)
+    assert report['histogram']['counts'] == [0, 1, 2, 0]
+    assert report['latency_ms']['max'] == pytest.approx(3.5)
+    assert "Achieved" in format_report(report)
+
+def test_build_report_counts_lost_events():
+    report = build_report([0.0, 0.1, 0.2], [0.001])
+    assert report['lost'] == 2
+    assert report['achieved_rate'] == 0.0
+
+def test_stamping_controller_records_each_click():
+    """Double clicks count as two sends so they pair with two arrivals."""
+    inner = MagicMock()
+    sent = []
+    ctrl = _StampingController(inner, sent)
+
+    ctrl.click('left', 2)
+    ctrl.press('a')
+    ctrl.position = (5, 5)
+
+    assert len(sent) == 3
+    inner.click.assert_called_once_with('left', 2)
+    inner.press.assert_called_once_with('a')
+    assert inner.position == (5, 5)
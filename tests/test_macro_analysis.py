@@ -0,0 +1,88 @@
+import pytest
+import random
+
+from src.event_store import EventStore
+from src.macro_analysis import cap_idle_gaps, find_loops, fold_loops, expand_loops, compact, LOOP
+
+def _farm_macro(reps=10, seed=1):
+    """A click/key sequence repeated `reps` times with small jitter, then a long idle gap."""
+    rnd = random.Random(seed)
+    events = [{'type': 'click', 'time': 0.0, 'x': 500, 'y': 500, 'button': 'right', 'pressed': True},
+              {'type': 'click', 'time': 0.05, 'x': 500, 'y': 500, 'button': 'right', 'pressed': False}]
+    t = 1.0
+    for _ in range(reps):
+        j = lambda: rnd.randint(-2, 2)
+        dt = lambda: rnd.uniform(-0.01, 0.01)
+        events += [
+            {'type': 'move', 'time': t + dt(), 'x': 100 + j(), 'y': 200 + j()},
+            {'type': 'click', 'time': t + 0.1 + dt(), 'x': 100 + j(), 'y': 200 + j(), 'button': 'left', 'pressed': True},
+            {'type': 'click', 'time': t + 0.2 + dt(), 'x': 100 + j(), 'y': 200 + j(), 'button': 'left', 'pressed': False},
+            {'type': 'key_press', 'time': t + 0.3 + dt(), 'key': 'e'},
+            {'type': 'key_release', 'time': t + 0.4 + dt(), 'key': 'e'},
+        ]
+        t += 1.0
+    events.append({'type': 'key_press', 'time': t + 30.0, 'key': 'q'})
+    return events
+
+def test_cap_idle_gaps_shortens_pauses_only():
+    events = [{'type': 'key_press', 'time': t, 'key': 'a'} for t in (0.0, 0.5, 10.5, 11.0, 71.0)]
+    out = cap_idle_gaps(events, 2.0)
+    assert [e['time'] for e in out] == pytest.approx([0.0, 0.5, 2.5, 3.0, 5.0])
+    assert [e['time'] for e in events] == [0.0, 0.5, 10.5, 11.0, 71.0]
+
+def test_find_loops_detects_jittered_repeats():
+    events = _farm_macro()
+    assert find_loops(events) == [(2, 5, 10)]
+
+def test_find_loops_respects_tolerance():
+    events = _farm_macro()
+    events[2 + 5 * 6 + 1]['x'] += 40  # 7th iteration's click lands elsewhere
+    loops = find_loops(events)
+    assert all(L == 5 for _, L, _ in loops)
+    assert sum(k for _, _, k in loops) < 10
+
+def test_fold_and_expand_round_trip():
+    events = _farm_macro()
+    folded = fold_loops(events)
+
+    assert len(folded) == 2 + 5 + 1 + 1
+    loop = folded[7]
+    assert loop['type'] == LOOP
+    assert (loop['length'], loop['count']) == (5, 10)
+
+    expanded = expand_loops(folded)
+    assert len(expanded) == len(events)
+    for a, b in zip(expanded, events):
+        assert a['type'] == b['type']
+        assert abs(a.get('x', 0) - b.get('x', 0)) <= 5
+        assert a['time'] == pytest.approx(b['time'], abs=0.05)
+    assert expanded[-1] == events[-1]
+
+def test_pure_mouse_paths_are_not_folded():
+    events = [{'type': 'move', 'time': i * 0.01, 'x': 10 * (i % 4), 'y': 0} for i in range(40)]
+    assert find_loops(events) == []
+
+def test_compact_reduces_size_and_duration():
+    events = _farm_macro()
+    out = compact(EventStore(events), max_gap=2.0)
+    assert len(out) < len(events) / 4
+    assert out[-1]['time'] < events[-1]['time'] - 25
+
+def test_compiled_plan_unrolls_loops():
+    from src.player import compile_plan
+    events = _farm_macro()
+    plan = compile_plan(fold_loops(events))
+    assert len(plan) == len(events)
+    assert plan.times[-1] == pytest.approx(events[-1]['time'])
+    assert list(plan.src) == sorted(plan.src)
+
+def test_simplify_keeps_loop_lengths_consistent():
+    from src.recorder import simplify_moves
+    body = [{'type': 'move', 'time': 0.01 * i, 'x': i, 'y': 0} for i in range(20)]  # collinear
+    body.append({'type': 'click', 'time': 0.2, 'x': 19, 'y': 0, 'button': 'left', 'pressed': True})
+    folded = body + [{'type': LOOP, 'time': 1.0, 'length': 21, 'count': 3, 'period': 1.0}]
+
+    out = simplify_moves(folded, 1.0)
+    assert len(out) == 4
+    assert out[-1]['length'] == 3
+    assert len(expand_loops(out)) == 9
@@ -0,0 +1,111 @@
+import json
+import os
+import pytest
+
+from src import macro_file
+from src.event_store import EventStore
+from src.macro_file import MacroReader, MacroFormatError, save_macro, load_macro
+
+def make_events(n):
+    events = []
+    for i in range(n):
+        t = i * 1_000_000 / 1e9  # 1ms steps, exact in nanoseconds
+        events.append({'type': 'move', 'time': t, 'x': 500 + i % 37, 'y': 300 - i % 11})
+        if i % 100 == 0:
+            events.append({'type': 'click', 'time': t, 'x': 500, 'y': 300, 'button': 'left', 'pressed': True})
+            events.append({'type': 'key_press', 'time': t, 'key': 'Key.shift'})
+            events.append({'type': 'scroll', 'time': t, 'x': 1, 'y': 1, 'dx': 0, 'dy': -3})
+    return events
+
+def test_round_trip_binary(tmp_path, monkeypatch):
+    """Events survive save/load exactly, across multiple chunks."""
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 100)
+    events = make_events(500)
+    path = str(tmp_path / "m.acm")
+
+    save_macro(path, events)
+    with MacroReader(path) as reader:
+        assert len(reader) == len(events)
+        assert len(reader.index) == (len(events) + 99) // 100
+        assert not reader.raw_time
+        assert list(reader.iter_events()) == events
+
+def test_partial_coordinates_round_trip(tmp_path):
+    events = [{'type': 'move', 'time': 0.0, 'x': 3}, {'type': 'move', 'time': 0.1, 'y': 4.5}]
+    path = str(tmp_path / "m.acm")
+    save_macro(path, events)
+    assert list(load_macro(path)) == events
+
+
+def test_binary_much_smaller_than_json(tmp_path):
+    events = make_events(5000)
+    acm = str(tmp_path / "m.acm")
+    js = str(tmp_path / "m.json")
+    save_macro(acm, events)
+    macro_file.export_json(events, js)
+    assert os.path.getsize(acm) * 10 < os.path.getsize(js)
+
+def test_json_import_export_lossless(tmp_path):
+    """Arbitrary float times and fractional coordinates still round-trip exactly."""
+    events = [
+        {'type': 'move', 'time': 0.123456789012345, 'x': 10.5, 'y': 20.25},
+        {'type': 'key_press', 'time': 1.7000000476837158, 'key': 'é'},
+        {'type': 'custom', 'time': 2.0, 'foo': [1, 2]},
+    ]
+    src = tmp_path / "in.json"
+    src.write_text(json.dumps(events))
+
+    store = macro_file.import_json(str(src))
+    acm = str(tmp_path / "m.acm")
+    save_macro(acm, store)
+    out = str(tmp_path / "out.json")
+    macro_file.export_json(load_macro(acm), out)
+
+    with open(out) as f:
+        assert json.load(f) == events
+
+def test_streaming_first_chunk(tmp_path, monkeypatch):
+    """A single chunk can be decoded without touching the rest of the file."""
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 50)
+    events = make_events(300)
+    path = str(tmp_path / "m.acm")
+    save_macro(path, EventStore(events))
+    with MacroReader(path) as reader:
+        assert list(reader.iter_chunk(1)) == events[50:100]
+
+def test_rejects_bad_magic(tmp_path):
+    path = tmp_path / "bad.acm"
+    path.write_bytes(b"NOPE" + b"\0" * 40)
+    with pytest.raises(MacroFormatError):
+        MacroReader(str(path))
+
+@pytest.mark.parametrize('cut', [-3, 'half', 40])
+def test_truncated_file_raises_format_error(tmp_path, monkeypatch, cut):
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 100)
+    path = tmp_path / "m.acm"
+    save_macro(str(path), make_events(500))
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2 if cut == 'half' else cut])
+    with pytest.raises(MacroFormatError):
+        load_macro(str(path))
+
+def test_corrupt_chunk_raises_format_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 100)
+    path = tmp_path / "m.acm"
+    save_macro(str(path), make_events(500))
+    with MacroReader(str(path)) as reader:
+        offset, length = reader.index[1][:2]
+    data = bytearray(path.read_bytes())
+    data[offset:offset + length] = b'\xff' * length  # one endless varint
+    path.write_bytes(bytes(data))
+    with MacroReader(str(path)) as reader:
+        assert len(list(reader.iter_chunk(0))) == 100
+        with pytest.raises(MacroFormatError):
+            list(reader.iter_chunk(1))
+
+def test_loop_events_round_trip(tmp_path):
+    events = [{'type': 'click', 'time': 0.0, 'x': 1, 'y': 1, 'button': 'left', 'pressed': True},
+              {'type': 'loop', 'time': 1.0, 'length': 1, 'count': 4, 'period': 1.0}]
+    path = tmp_path / "loop.acm"
+    save_macro(str(path), events)
+    assert load_macro(str(path)).to_list() == events
@@ -88,3 +88,30 @@ def test_stop_clicking(mock_thread_class, mock_clicker_class, main_tab, qtbot):
     assert main_tab.is_running is False
     assert main_tab.btn_start.text() == "Start (F6)"
     assert main_tab.spin_hours.isEnabled() is True
+
+
+def test_pattern_controls_fill_config(main_tab):
+    from PySide6.QtWidgets import QSpinBox
+    assert 'pattern' not in main_tab.build_config()
+
+    main_tab.combo_pattern.setCurrentText("Grid")
+    main_tab.combo_order.setCurrentText("Snake")
+    main_tab.spin_dwell.findChild(QSpinBox).setValue(40)
+    main_tab.spin_passes.findChild(QSpinBox).setValue(2)
+    main_tab.spin_grid_cols.findChild(QSpinBox).setValue(4)
+    config = main_tab.build_config()
+    assert config['pattern'] == {'kind': 'grid', 'origin': [100, 100], 'spacing': [50, 50], 'cols': 4, 'rows': 3}
+    assert (config['order'], config['dwell'], config['passes']) == ('snake', 40, 2)
+
+    main_tab.combo_pattern.setCurrentText("Path")
+    main_tab.input_points.setText("0,0; 100,0")
+    assert main_tab.build_config()['pattern'] == {'kind': 'path', 'points': [[0, 0], [100, 0]], 'step': 20}
+
+
+@patch('src.ui.tabs.main_tab.ClickerThread')
+def test_pattern_without_points_is_reported_not_started(mock_thread_class, main_tab):
+    main_tab.combo_pattern.setCurrentText("List")
+    main_tab.start_clicking()
+    mock_thread_class.assert_not_called()
+    assert main_tab.is_running is False
+    assert main_tab.lbl_measure.text() == "Pattern needs at least one point"
@@ -0,0 +1,65 @@
+import pytest
+
+from src.event_store import EventStore
+from src.path_engine import smooth_paths
+
+def _macro():
+    events = [{'type': 'click', 'time': 0.0, 'x': 0, 'y': 0, 'button': 'left', 'pressed': False}]
+    events += [{'type': 'move', 'time': 0.01 * i, 'x': 10 * i, 'y': (i * 7) % 13} for i in range(1, 11)]
+    events.append({'type': 'click', 'time': 0.1, 'x': 100, 'y': 5, 'button': 'left', 'pressed': True})
+    events.append({'type': 'key_press', 'time': 0.12, 'key': 'a'})
+    events.append({'type': 'move', 'time': 0.13, 'x': 120, 'y': 20})
+    return events
+
+def _moves(store):
+    return [e for e in store if e['type'] == 'move']
+
+def test_non_move_events_kept_in_order():
+    events = _macro()
+    out = smooth_paths(events, mode='curve')
+    assert isinstance(out, EventStore)
+    assert [e for e in out if e['type'] != 'move'] == [e for e in events if e['type'] != 'move']
+
+def test_straight_line_at_fixed_rate():
+    out = smooth_paths(_macro(), mode='straight', easing='linear', rate=250)
+    first_run = [e for e in _moves(out) if e['time'] <= 0.1]
+
+    gaps = [b['time'] - a['time'] for a, b in zip(first_run, first_run[1:])]
+    assert all(g == pytest.approx(0.004) for g in gaps[:-1])
+    assert gaps[-1] <= 0.004 + 1e-9
+    # Straight line from (0, 0) to the run's last move (100, 5)
+    assert (first_run[-1]['x'], first_run[-1]['y']) == (100, 5)
+    for e in first_run:
+        assert e['y'] == round(e['x'] * 5 / 100) or abs(e['y'] - e['x'] * 0.05) <= 1
+
+def test_easing_changes_spacing_not_endpoints():
+    lin = _moves(smooth_paths(_macro(), easing='linear'))
+    eased = _moves(smooth_paths(_macro(), easing='ease_in_out'))
+    assert len(lin) == len(eased)
+    assert eased[-1] == lin[-1]
+    assert eased[0]['x'] < lin[0]['x']  # slow start
+
+def test_run_after_key_starts_from_last_cursor_position():
+    out = smooth_paths(_macro(), easing='linear')
+    tail = [e for e in _moves(out) if e['time'] > 0.12]
+    # From the click at (100, 5), timed from the key press at 0.12
+    assert tail[0]['time'] == pytest.approx(0.124)
+    assert 100 < tail[0]['x'] < 120
+    assert (tail[-1]['x'], tail[-1]['y'], tail[-1]['time']) == (120, 20, 0.13)
+
+def test_resample_follows_recorded_path():
+    out = _moves(smooth_paths(_macro(), mode='resample'))
+    at = {round(e['time'], 3): (e['x'], e['y']) for e in out}
+    assert at[0.02] == (20, 1)
+    assert at[0.04] == (40, 2)
+
+def test_leading_moves_keep_first_position():
+    events = [{'type': 'move', 'time': 1.0, 'x': 5, 'y': 5}, {'type': 'move', 'time': 1.02, 'x': 25, 'y': 5}]
+    out = list(smooth_paths(events, easing='linear'))
+    assert out[0] == events[0]
+    assert out[-1] == events[-1]
+    assert len(out) == 6
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        smooth_paths(_macro(), mode='zigzag')
@@ -0,0 +1,262 @@
+import pytest
+from unittest.mock import MagicMock
+import threading
+import time
+
+from src.player import MacroPlayer
+from pynput.mouse import Button
+
+@pytest.fixture
+def player():
+    return MacroPlayer(threading.Event(), mouse=MagicMock(), keyboard=MagicMock())
+
+def test_deadline_playback_has_no_drift(player):
+    """Events fire on absolute deadlines, so total duration tracks the recording."""
+    events = [{'type': 'move', 'time': 5.0 + i * 0.002, 'x': i, 'y': i} for i in range(100)]
+    player.catch_up = float('inf')  # a stall on a loaded machine must not drop moves here
+
+    stats = player.play(events, speed=1.0)
+
+    assert stats['events'] == 100
+    assert stats['dropped_moves'] == 0
+    assert stats['target_elapsed'] == pytest.approx(0.198)
+    assert stats['elapsed'] - stats['target_elapsed'] < 0.02
+    assert player.mouse.position == (99, 99)
+
+def test_speed_multiplier_scales_deadlines(player):
+    events = [{'type': 'move', 'time': i * 0.01, 'x': i, 'y': 0} for i in range(21)]
+    stats = player.play(events, speed=2.0)
+    assert stats['target_elapsed'] == pytest.approx(0.1)
+
+def test_catch_up_drops_moves_but_never_clicks(player):
+    """When injection stalls, late moves are skipped while clicks and keys still fire in order."""
+    calls = []
+    player.mouse.press.side_effect = lambda b: (calls.append('press'), time.sleep(0.05))
+    player.mouse.release.side_effect = lambda b: calls.append('release')
+    player.keyboard.press.side_effect = lambda k: calls.append(k)
+
+    events = [{'type': 'click', 'time': 0.0, 'x': 0, 'y': 0, 'button': 'left', 'pressed': True}]
+    events += [{'type': 'move', 'time': 0.001 * i, 'x': i, 'y': 0} for i in range(1, 20)]
+    events += [
+        {'type': 'click', 'time': 0.02, 'x': 5, 'y': 5, 'button': 'left', 'pressed': False},
+        {'type': 'key_press', 'time': 0.021, 'key': 'a'},
+    ]
+
+    stats = player.play(events)
+
+    assert calls == ['press', 'release', 'a']
+    assert stats['dropped_moves'] == 19
+    assert stats['lateness_ms']['max'] > 10
+    player.mouse.release.assert_called_once_with(Button.left)
+
+def test_stop_event_aborts(player):
+    player.stop_event.set()
+    stats = player.play([{'type': 'key_press', 'time': 0, 'key': 'a'}])
+    assert stats['events'] == 0
+    player.keyboard.press.assert_not_called()
+
+def test_compile_plan_resolves_buttons_and_keys():
+    from pynput.keyboard import Key
+    from src.player import compile_plan, OP_BUTTON_DOWN, OP_KEY_DOWN, OP_KEY_UP, OP_SCROLL
+
+    plan = compile_plan([
+        {'type': 'click', 'time': 2.0, 'x': 1, 'y': 2, 'button': 'right', 'pressed': True},
+        {'type': 'key_press', 'time': 2.5, 'key': 'Key.space'},
+        {'type': 'key_release', 'time': 2.6, 'key': 'b'},
+        {'type': 'key_press', 'time': 2.7, 'key': 'Key.not_a_key'},
+        {'type': 'scroll', 'time': 3.0, 'x': 1, 'y': 2, 'dx': 0, 'dy': -3},
+    ])
+
+    assert list(plan.ops) == [OP_BUTTON_DOWN, OP_KEY_DOWN, OP_KEY_UP, OP_SCROLL]
+    assert list(plan.times) == pytest.approx([0.0, 0.5, 0.6, 1.0])
+    assert plan.args[:3] == [Button.right, Key.space, 'b']
+    assert plan.dys[3] == -3
+    assert plan.skipped == 1
+
+def test_plan_playback_presses_resolved_key(player):
+    """Special keys reach the backend as Key objects, not their recorded strings."""
+    from pynput.keyboard import Key
+    player.play([{'type': 'key_press', 'time': 0, 'key': 'Key.enter'},
+                 {'type': 'key_release', 'time': 0, 'key': 'Key.enter'}])
+    player.keyboard.press.assert_called_once_with(Key.enter)
+    player.keyboard.release.assert_called_once_with(Key.enter)
+
+def test_benchmark_reports_both_paths():
+    from src.player import benchmark, synthetic_macro
+    result = benchmark(synthetic_macro(2000), repeats=1)
+    assert result['events'] == 2000
+    assert result['dict_eps'] > 0 and result['plan_eps'] > 0
+
+class _SlowMouse:
+    """Backend whose position updates cost ~0.5ms, like a real injection call."""
+
+    def __init__(self):
+        self.log = []
+
+    @property
+    def position(self):
+        return self.log[-1] if self.log else (0, 0)
+
+    @position.setter
+    def position(self, pos):
+        end = time.perf_counter() + 0.0005
+        while time.perf_counter() < end: pass
+        self.log.append(pos)
+
+    def press(self, button):
+        self.log.append(('press', self.position))
+
+    def release(self, button):
+        self.log.append(('release', self.position))
+
+def test_coalesce_keeps_last_move_before_clicks_in_order():
+    from src.player import compile_plan, coalesce_plan, OP_MOVE, OP_BUTTON_DOWN, OP_BUTTON_UP
+    # At 2x with a 40ms tick, each tick covers 80ms of recording
+    events = [{'type': 'move', 'time': 0.005 + i * 0.01, 'x': i, 'y': 0} for i in range(10)]
+    events.append({'type': 'click', 'time': 0.1, 'x': 9, 'y': 0, 'button': 'left', 'pressed': True})
+    events += [{'type': 'move', 'time': 0.105 + i * 0.01, 'x': 100 + i, 'y': 0} for i in range(3)]
+    events.append({'type': 'click', 'time': 0.14, 'x': 102, 'y': 0, 'button': 'left', 'pressed': False})
+
+    plan = coalesce_plan(compile_plan(events), speed=2.0, tick=0.04)
+
+    rows = [(op, x) for op, x in zip(plan.ops, plan.xs)]
+    assert rows == [
+        (OP_MOVE, 7), (OP_MOVE, 9), (OP_BUTTON_DOWN, 9),
+        (OP_MOVE, 102), (OP_BUTTON_UP, 102),
+    ]
+
+def test_high_speed_playback_matches_target_duration():
+    """At 10x, a dense 2s macro replays in ~0.2s with every click preserved."""
+    mouse = _SlowMouse()
+    player = MacroPlayer(threading.Event(), mouse=mouse, keyboard=MagicMock())
+    events = []
+    for i in range(1000):
+        events.append({'type': 'move', 'time': i * 0.002, 'x': i, 'y': i})
+        if i % 100 == 99:
+            events.append({'type': 'click', 'time': i * 0.002, 'x': i, 'y': i, 'button': 'left', 'pressed': True})
+            events.append({'type': 'click', 'time': i * 0.002, 'x': i, 'y': i, 'button': 'left', 'pressed': False})
+
+    stats = player.play(events, speed=10.0)
+
+    assert stats['target_elapsed'] == pytest.approx(0.1998)
+    # 1000 moves over 0.2s of scaled time leave one per 4ms tick: 50 instead of 1000
+    assert stats['coalesced_moves'] == 950
+    assert stats['events'] + stats['dropped_moves'] == 70  # 50 moves + 20 clicks
+    moves = [e for e in mouse.log if e[0] not in ('press', 'release')]
+    assert len(moves) == 50 - stats['dropped_moves'] + 20  # clicks also position the cursor
+    clicks = [e for e in mouse.log if e[0] in ('press', 'release')]
+    assert clicks == [(kind, (i, i)) for i in range(99, 1000, 100) for kind in ('press', 'release')]
+
+def _held_macro():
+    return [
+        {'type': 'move', 'time': 0.0, 'x': 1, 'y': 1},
+        {'type': 'key_press', 'time': 0.125, 'key': 'Key.shift'},
+        {'type': 'click', 'time': 0.25, 'x': 5, 'y': 6, 'button': 'left', 'pressed': True},
+        {'type': 'move', 'time': 0.375, 'x': 50, 'y': 60},
+        {'type': 'key_press', 'time': 0.5, 'key': 'a'},
+        {'type': 'key_release', 'time': 0.5625, 'key': 'a'},
+        {'type': 'click', 'time': 0.625, 'x': 50, 'y': 60, 'button': 'left', 'pressed': False},
+        {'type': 'key_release', 'time': 0.75, 'key': 'Key.shift'},
+    ]
+
+def test_time_index_and_state_at():
+    from pynput.keyboard import Key
+    from src.player import compile_plan, OP_BUTTON_DOWN, OP_KEY_DOWN
+    plan = compile_plan(_held_macro())
+
+    assert plan.index_at(0.4) == 4
+    assert plan.index_after(0.5) == 5
+    assert plan.time_of_event(3) == 0.375
+    assert plan.state_at(4) == ((50, 60), [(OP_KEY_DOWN, Key.shift), (OP_BUTTON_DOWN, Button.left)])
+    assert plan.state_at(len(plan)) == ((50, 60), [])
+
+def test_seek_restores_held_state(player):
+    """Starting mid-macro re-presses what the skipped part left held."""
+    from pynput.keyboard import Key
+    calls = []
+    player.mouse.press.side_effect = lambda b: calls.append(('press', b))
+    player.mouse.release.side_effect = lambda b: calls.append(('release', b))
+    player.keyboard.press.side_effect = lambda k: calls.append(('key_down', k))
+    player.keyboard.release.side_effect = lambda k: calls.append(('key_up', k))
+
+    stats = player.play(_held_macro(), start=0.4)
+
+    assert calls == [
+        ('key_down', Key.shift), ('press', Button.left),  # restored in press order
+        ('key_down', 'a'), ('key_up', 'a'), ('release', Button.left), ('key_up', Key.shift),
+    ]
+    assert stats['events'] == 4
+    assert stats['target_elapsed'] == pytest.approx(0.25)
+
+def test_chunked_compile_matches_whole_compile():
+    """Loops whose body started in an earlier batch still unroll the same way."""
+    from src.player import PlanCompiler, compile_plan, iter_batches
+    events = [{'type': 'move', 'time': 1.0 + i * 0.01, 'x': i, 'y': 0} for i in range(5)]
+    events.append({'type': 'loop', 'time': 1.05, 'length': 3, 'count': 3, 'period': 0.03})
+    events.append({'type': 'key_press', 'time': 1.2, 'key': 'nope'})
+    whole = compile_plan(events)
+    compiler = PlanCompiler()
+    for batch in iter_batches(events, 2):
+        compiler.feed(batch)
+    parts = compiler.plan
+    assert len(whole) == 11
+    assert (parts.ops, parts.times, parts.xs, parts.src) == (whole.ops, whole.times, whole.xs, whole.src)
+    assert parts.skipped == whole.skipped == 1
+
+def test_play_chunks_starts_before_the_last_chunk_is_decoded(tmp_path, monkeypatch):
+    from src import macro_file
+    log = []
+
+    class Mouse:
+        def __setattr__(self, name, value):
+            log.append(('move', value))
+
+    monkeypatch.setattr(macro_file, 'CHUNK_EVENTS', 50)
+    events = [{'type': 'move', 'time': i * 0.0002, 'x': i, 'y': 0} for i in range(200)]
+    path = str(tmp_path / 'm.acm')
+    macro_file.save_macro(path, events)
+    player = MacroPlayer(threading.Event(), mouse=Mouse(), keyboard=MagicMock())
+    player.catch_up = float('inf')
+    with macro_file.MacroReader(path) as reader:
+        decode = reader.iter_chunk
+        monkeypatch.setattr(reader, 'iter_chunk', lambda i: (log.append(('decode', i)), decode(i))[1])
+        stats = player.play_chunks(reader.iter_chunks())
+
+    assert log.index(('move', (0, 0))) < log.index(('decode', 1)) < log.index(('decode', 3))
+    assert [v for kind, v in log if kind == 'move'] == [(i, 0) for i in range(200)]
+    assert stats['events'] == 200
+    assert len(player.plan) == 200  # complete, so it can be replayed without decoding again
+
+def test_play_chunks_restores_and_releases_held_state_across_chunks(player):
+    """A seek and a stop in later chunks see what earlier chunks left held."""
+    from pynput.keyboard import Key
+    from src.player import iter_batches
+    calls = []
+    player.mouse.press.side_effect = lambda b: calls.append(('press', b))
+    player.mouse.release.side_effect = lambda b: calls.append(('release', b))
+    player.keyboard.release.side_effect = lambda k: calls.append(('key_up', k))
+
+    def key_down(k):
+        calls.append(('key_down', k))
+        if k == 'a': player.stop_event.set()
+    player.keyboard.press.side_effect = key_down
+
+    stats = player.play_chunks(iter_batches(_held_macro(), 3), start=0.2)
+
+    assert calls == [
+        ('key_down', Key.shift),  # restored from the first chunk
+        ('press', Button.left), ('key_down', 'a'),  # stop
+        ('key_up', 'a'), ('release', Button.left), ('key_up', Key.shift),
+    ]
+    assert stats['events'] == 3
+    assert player.plan is None
+
+def test_partial_playback_releases_held_at_end(player):
+    from pynput.keyboard import Key
+    calls = []
+    player.mouse.release.side_effect = lambda b: calls.append(('release', b))
+    player.keyboard.release.side_effect = lambda k: calls.append(('key_up', k))
+    stats = player.play(_held_macro(), end=0.375)
+
+    assert stats['events'] == 4
+    assert calls == [('release', Button.left), ('key_up', Key.shift)]  # reverse press order
@@ -0,0 +1,103 @@
+import json
+from itertools import count
+
+from src.profiler import MAX_SPANS, StepProfiler, format_step_timing, format_phase_breakdown, typing_rate
+
+
+def fake_clock(step=0.001):
+    ticks = count()
+    return lambda: next(ticks) * step
+
+
+def test_records_phases_and_counters():
+    prof = StepProfiler(clock=fake_clock())
+    prof.begin(0, 'Click Image')           # t=1ms
+    with prof.phase('capture'):            # 2 -> 3
+        pass
+    with prof.phase('match'):              # 4 -> 5
+        pass
+    prof.count('polls')
+    prof.count('polls', 2)
+    prof.end()                             # 6
+    (rec,) = prof.records
+    assert rec.duration == 0.005
+    assert rec.phases == {'capture': 0.001, 'match': 0.001}
+    assert rec.counters == {'polls': 3}
+    assert [s[0] for s in rec.spans] == ['capture', 'match']
+
+
+def test_phase_outside_step_is_ignored():
+    prof = StepProfiler(clock=fake_clock())
+    with prof.phase('capture'):
+        pass
+    prof.count('polls')
+    assert not prof.records
+
+
+def test_step_totals_sum_loop_iterations():
+    prof = StepProfiler(clock=fake_clock())
+    for _ in range(3):
+        prof.begin(2, 'Key Press')
+        with prof.phase('inject'):
+            pass
+        prof.end()
+    totals = prof.step_totals()[2]
+    assert totals['runs'] == 3
+    assert abs(totals['total'] - 0.009) < 1e-12
+    assert abs(totals['inject'] - 0.003) < 1e-12
+    assert format_step_timing(totals) == "x3, avg 3.0 ms"
+    assert "inject: 1.0 ms" in format_phase_breakdown(totals)
+
+
+def test_chrome_trace_export(tmp_path):
+    prof = StepProfiler(clock=fake_clock())
+    prof.begin(0, 'Delay')
+    prof.end()
+    prof.begin(1, 'Wait Image')
+    with prof.phase('capture'):
+        pass
+    prof.count('polls')
+    prof.end()
+    path = tmp_path / 'trace.json'
+    prof.export_chrome_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    steps = [e for e in events if e.get('cat') == 'step']
+    phases = [e for e in events if e.get('cat') == 'phase']
+    assert [e['name'] for e in steps] == ['1. Delay', '2. Wait Image']
+    assert steps[1]['ts'] == 3000 and steps[1]['dur'] == 3000
+    assert steps[1]['args'] == {'index': 1, 'capture_ms': 1.0, 'polls': 1}
+    # Phases nest inside their step
+    assert steps[1]['ts'] <= phases[0]['ts'] and phases[0]['ts'] + phases[0]['dur'] <= steps[1]['ts'] + steps[1]['dur']
+    assert all(e['ph'] in ('X', 'M') for e in events)
+
+
+def test_typing_rate():
+    totals = {'action': 'Type Text', 'runs': 2, 'total': 0.5, 'inject': 0.4, 'chars': 200}
+    assert typing_rate(totals) == 500.0
+    assert "typed: 100 chars at 500 chars/s" in format_phase_breakdown(totals)
+    assert typing_rate({'inject': 0.1}) is None
+
+
+def test_memory_is_bounded_but_totals_cover_every_step():
+    prof = StepProfiler(clock=fake_clock(), max_records=5)
+    for i in range(1000):
+        prof.begin(i % 2, 'Key Press')
+        prof.count('polls')
+        prof.end()
+    assert len(prof.records) == 5
+    assert prof.dropped == 995
+    totals = prof.step_totals()
+    assert (totals[0]['runs'], totals[1]['runs'], totals[1]['polls']) == (500, 500, 500)
+    trace = prof.to_chrome_trace()
+    assert len([e for e in trace['traceEvents'] if e.get('cat') == 'step']) == 5
+    assert trace['otherData'] == {'dropped_steps': 995}
+
+def test_spans_per_step_are_capped():
+    prof = StepProfiler(clock=fake_clock())
+    prof.begin(0, 'Wait Image')
+    for _ in range(MAX_SPANS + 50):
+        with prof.phase('capture'):
+            pass
+    prof.end()
+    assert len(prof.records[0].spans) == MAX_SPANS
+    assert abs(prof.step_totals()[0]['capture'] - (MAX_SPANS + 50) * 0.001) < 1e-9
@@ -0,0 +1,124 @@
+import os
+import pytest
+import time
+from unittest.mock import patch
+from PySide6.QtCore import Qt
+
+from src.event_store import EventStore
+from src.ui.tabs.record_tab import RecordTab, EventListModel, EVENT_FILTERS
+
+pytestmark = pytest.mark.usefixtures("qapp")
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    """Keeps RecordTab away from the real user data dir (and any crash logs in it)."""
+    with patch('src.ui.tabs.record_tab.user_data_dir', return_value=str(tmp_path)):
+        yield tmp_path
+
+def _store(n):
+    store = EventStore()
+    for i in range(n):
+        if i % 100 == 0:
+            store.add('click', i * 0.001, x=i, y=i, button='left', pressed=True)
+        elif i % 100 == 50:
+            store.add('key_press', i * 0.001, key='a')
+        else:
+            store.add('move', i * 0.001, x=i, y=i)
+    return store
+
+def test_model_hides_moves_by_default():
+    model = EventListModel()
+    model.set_events(_store(1000))
+
+    assert model.rowCount() == 20
+    assert model.data(model.index(0)) == "000: Click left Down at (0, 0)"
+    assert model.data(model.index(1)) == "050: Key Press: a"
+    assert model.data(model.index(1), Qt.ToolTipRole) is None
+
+def test_model_type_filter():
+    model = EventListModel()
+    model.set_events(_store(1000))
+
+    model.set_types(EVENT_FILTERS["Keys"])
+    assert model.rowCount() == 10
+    assert model.event_index(0) == 50
+
+    model.set_types(EVENT_FILTERS["All"])
+    assert model.rowCount() == 1000
+    assert model.data(model.index(1)) == "001: Move to (1, 1)"
+
+def test_large_store_loads_without_formatting_rows():
+    store = _store(200000)
+    model = EventListModel()
+    start = time.perf_counter()
+    model.set_events(store)
+    model.set_types(EVENT_FILTERS["All"])
+    assert time.perf_counter() - start < 0.5
+    assert model.rowCount() == 200000
+
+def test_refresh_rec_list_uses_model():
+    tab = RecordTab()
+    tab.recorder.events = [
+        {'type': 'move', 'time': 0.0, 'x': 1, 'y': 2},
+        {'type': 'scroll', 'time': 0.5, 'x': 1, 'y': 2, 'dx': 0, 'dy': -1},
+    ]
+    tab.refresh_rec_list()
+
+    assert tab.list_events.model() is tab.event_model
+    assert tab.event_model.rowCount() == 1
+    assert tab.slider_seek.maximum() == 500
+    tab.combo_event_filter.setCurrentText("Moves")
+    assert tab.event_model.data(tab.event_model.index(0)) == "000: Move to (1, 2)"
+
+
+def test_interrupted_recording_is_offered_not_claimed(tmp_path):
+    from src.recording_log import RecordingLog
+    log = RecordingLog(str(tmp_path / "session-20240101-000000-1.acpl"))
+    log.append([{'type': 'move', 'time': 0.0, 'x': 1, 'y': 2}])
+    log._file.close()  # crashed writer
+    with patch('src.recording_log.pid_alive', return_value=False):
+        tab = RecordTab()
+        assert not tab.btn_recover.isHidden()
+        assert os.listdir(tmp_path) == ["session-20240101-000000-1.acpl"]  # nothing renamed yet
+
+        tab.recover_interrupted_recording()
+    assert len(tab.recorder.events) == 1
+    assert os.listdir(tmp_path) == ["session-20240101-000000-1.acpl.recovered"]
+    assert tab.btn_recover.isHidden()
+
+
+def test_compact_runs_off_the_gui_thread(qtbot):
+    import threading
+    tab = RecordTab()
+    tab.recorder.events = [{'type': 'move', 'time': i * 0.1, 'x': i, 'y': i} for i in range(5)]
+    tab.spin_max_idle.setValue(0)
+    threads = []
+    compact = tab.recorder.compact
+    def spy(*args):
+        threads.append(threading.current_thread())
+        compact(*args)
+
+    with patch.object(tab.recorder, 'compact', side_effect=spy):
+        tab.btn_compact.click()
+        assert not tab.btn_compact.isEnabled() and not tab.btn_restore.isEnabled()
+        qtbot.waitUntil(lambda: tab.compact_thread is None)
+    assert threads and threads[0] is not threading.main_thread()
+    assert tab.btn_compact.isEnabled() and tab.btn_restore.isEnabled()
+    assert tab.lbl_rec_status.text() == "Compacted 5 -> 5 events"
+    assert tab.recorder.original_events is not None
+
+
+def test_playback_streams_the_loaded_macro_file(tmp_path):
+    from src import macro_file
+    path = str(tmp_path / "m.acm")
+    macro_file.save_macro(path, [{'type': 'move', 'time': i * 0.01, 'x': i, 'y': i} for i in range(3)])
+    tab = RecordTab()
+    with patch('src.ui.tabs.record_tab.QFileDialog.getOpenFileName', return_value=(path, '')):
+        tab.load_macro()
+    with patch('src.ui.tabs.record_tab.MacroPlayerThread') as thread:
+        tab.start_playback()
+        assert thread.call_args.args[-1] == path
+        tab.is_playing = False
+        tab.recorder.simplify(1.0)  # edited since loading: play what's in memory
+        tab.start_playback()
+        assert thread.call_args.args[-1] is None
@@ -16,7 +16,12 @@ def mock_listeners():
 
 @pytest.fixture
 def recorder(mock_listeners):
-    return Recorder()
+    rec = Recorder()
+    yield rec
+    # start() spawns the ring-buffer consumer thread; a test that leaves it
+    # running would have it call whatever later tests patch (e.g. time.sleep)
+    if rec.recording: rec.stop()
+    assert rec._consumer is None
 
 def test_initialization(recorder):
     assert recorder.events == []
@@ -52,10 +57,10 @@ def test_stop_recording(recorder, mock_listeners):
     recorder.mouse_listener.stop.assert_called_once()
     recorder.key_listener.stop.assert_called_once()
 
-@patch('time.time', return_value=12355.0)
+@patch('time.perf_counter_ns', return_value=12355_000_000_000)
 def test_add_event(mock_time, recorder):
     recorder.recording = True
-    recorder.start_time = 12345.0
+    recorder.start_ns = 12345_000_000_000
     
     recorder._add_event("test_type", foo="bar")
     
@@ -63,7 +68,7 @@ def test_add_event(mock_time, recorder):
     event = recorder.events[0]
     assert event['type'] == 'test_type'
     assert event['foo'] == 'bar'
-    # time should be time.time() - start_time = 12355.0 - 12345.0 = 10.0
+    # time is monotonic: (perf_counter_ns() - start_ns) / 1e9 = 10.0
     assert event['time'] == 10.0
 
 def test_add_event_when_not_recording(recorder):
@@ -76,18 +81,21 @@ def test_mouse_events(recorder):
     recorder.start_time = time.time()
     
     recorder.on_move(100, 200)
+    recorder.flush()
     assert len(recorder.events) == 1
     assert recorder.events[-1]['type'] == 'move'
     assert recorder.events[-1]['x'] == 100
     assert recorder.events[-1]['y'] == 200
     
     recorder.on_click(150, 250, 'Button.left', True)
+    recorder.flush()
     assert len(recorder.events) == 2
     assert recorder.events[-1]['type'] == 'click'
     assert recorder.events[-1]['button'] == 'left' # The method strips 'Button.'
     assert recorder.events[-1]['pressed'] is True
     
     recorder.on_scroll(300, 400, 0, 1)
+    recorder.flush()
     assert len(recorder.events) == 3
     assert recorder.events[-1]['type'] == 'scroll'
     assert recorder.events[-1]['dx'] == 0
@@ -100,6 +108,7 @@ def test_keyboard_events(recorder):
     
     # Test ignored key
     recorder.on_press(Key.f6)
+    recorder.flush()
     assert len(recorder.events) == 0
     
     # Test normal char key
@@ -107,12 +116,14 @@ def test_keyboard_events(recorder):
         char = 'a'
     
     recorder.on_press(MockKey())
+    recorder.flush()
     assert len(recorder.events) == 1
     assert recorder.events[-1]['type'] == 'key_press'
     assert recorder.events[-1]['key'] == 'a'
     
     # Test special key without char attribute
     recorder.on_release(Key.space)
+    recorder.flush()
     assert len(recorder.events) == 2
     assert recorder.events[-1]['type'] == 'key_release'
     assert recorder.events[-1]['key'] == 'Key.space'
@@ -159,3 +170,83 @@ def test_stop_remove_last_click_not_at_end(recorder):
     
     # The clicks are not at the very end (index 0, 1 vs len 8), so they shouldn't be removed
     assert len(recorder.events) == 8
+
+def test_move_decimation_keeps_last_position(recorder):
+    """Moves inside the distance step are dropped, but the resting position before a click is kept."""
+    recorder.recording = True
+    recorder.start_time = time.time()
+    recorder.min_move_distance = 5
+
+    recorder.on_move(0, 0)
+    recorder.on_move(1, 1)
+    recorder.on_move(2, 2)
+    recorder.on_move(10, 0)
+    recorder.on_move(11, 0)
+    recorder.on_click(11, 0, 'Button.left', True)
+    recorder.flush()
+
+    moves = [(ev['x'], ev['y']) for ev in recorder.events if ev['type'] == 'move']
+    assert moves == [(0, 0), (10, 0), (11, 0)]
+    assert recorder.events[-1]['type'] == 'click'
+    assert recorder.raw_event_count == 6
+    assert recorder.reduction_ratio() == pytest.approx(1 - 4 / 6)
+
+def test_simplify_moves_straight_line():
+    """RDP collapses collinear moves to the segment endpoints and leaves other events alone."""
+    from src.recorder import simplify_moves
+    events = [{'type': 'move', 'time': i * 0.01, 'x': i, 'y': 2 * i} for i in range(50)]
+    events.append({'type': 'click', 'time': 1.0, 'x': 49, 'y': 98, 'button': 'left', 'pressed': True})
+    events += [{'type': 'move', 'time': 1 + i * 0.01, 'x': 49 + (i % 2) * 3, 'y': 98 + 2 * i} for i in range(5)]
+
+    out = simplify_moves(events, epsilon=1.0)
+
+    assert [(ev['x'], ev['y']) for ev in out[:2]] == [(0, 0), (49, 98)]
+    assert out[2]['type'] == 'click'
+    # The zig-zag after the click deviates by 3px so its corners survive
+    assert len(out) == 3 + 5
+
+def test_callbacks_only_enqueue(recorder):
+    """Listener callbacks push to the ring; nothing is stored until the consumer drains it."""
+    recorder.recording = True
+    recorder.start_ns = time.perf_counter_ns()
+
+    for i in range(1000):
+        recorder.on_move(i, i)
+    assert len(recorder.events) == 0
+
+    recorder.flush()
+    assert len(recorder.events) == 1000
+    times = [ev['time'] for ev in recorder.events]
+    assert times == sorted(times)
+
+    stats = recorder.callback_stats()
+    assert stats['count'] == 1000
+    assert stats['dropped'] == 0
+    # Generous bound for slow CI machines; typical cost is well under 5us
+    assert stats['mean_us'] < 100
+
+def test_event_ring_counts_overrun():
+    from src.recorder import EventRing
+    ring = EventRing(capacity=8)
+    for i in range(20):
+        ring.push(i, 0, i)
+    recs = ring.drain()
+    assert ring.dropped == 12
+    assert [r[3] for r in recs] == list(range(12, 20))
+    assert ring.drain() == []
+
+
+def test_compact_keeps_original_recoverable(recorder):
+    events = []
+    for i in range(6):
+        events += [{'type': 'click', 'time': i + 0.0, 'x': 10, 'y': 10, 'button': 'left', 'pressed': True},
+                   {'type': 'click', 'time': i + 0.1, 'x': 10, 'y': 10, 'button': 'left', 'pressed': False}]
+    recorder.events = events
+
+    recorder.compact(max_gap=None)
+    assert len(recorder.events) == 3
+    assert recorder.events[-1]['type'] == 'loop'
+
+    assert recorder.restore_original()
+    assert recorder.events == events
+    assert recorder.original_events is None
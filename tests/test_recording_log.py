@@ -0,0 +1,91 @@
+import os
+import pytest
+from unittest.mock import patch
+
+import subprocess
+import sys
+import time
+from src import recording_log
+from src.recording_log import RecordingLog, read_log, unfinished_logs
+
+def events(start, n):
+    return [{'type': 'move', 'time': (start + i) / 1000, 'x': i, 'y': -i} for i in range(n)]
+
+def test_clean_log_round_trip(tmp_path):
+    path = str(tmp_path / "s.acpl")
+    log = RecordingLog(path, fsync_interval=0)
+    log.append(events(0, 10))
+    log.append(events(10, 5))
+    log.close()
+
+    store, clean = read_log(path)
+    assert clean
+    assert store == events(0, 10) + events(10, 5)
+    assert log.fsyncs >= 2
+    assert unfinished_logs(str(tmp_path)) == []
+
+def test_truncated_log_recovers_intact_frames(tmp_path):
+    """A torn final frame is dropped; everything before it is recovered."""
+    path = str(tmp_path / "s.acpl")
+    log = RecordingLog(path)
+    log.append(events(0, 10))
+    log.append(events(10, 10))
+    log._file.flush()
+    size = os.path.getsize(path)
+    log._file.close()  # simulate a crash: no end frame
+
+    with open(path, 'r+b') as f:
+        f.truncate(size - 3)
+
+    store, clean = read_log(path)
+    assert not clean
+    assert store == events(0, 10)
+    assert unfinished_logs(str(tmp_path)) == [path]
+
+def test_streaming_recorder_keeps_memory_bounded(tmp_path):
+    """In streaming mode the recorder spills to disk and reloads the whole session on stop."""
+    with patch('src.recorder.pynput_mouse.Listener'), patch('src.recorder.pynput_keyboard.Listener'):
+        from src.recorder import Recorder
+        rec = Recorder()
+        rec.stream_dir = str(tmp_path)
+        rec.stream_interval = 3600  # spill manually below
+        rec.start()
+
+        for chunk in range(3):
+            for i in range(100):
+                rec.on_move(chunk * 100 + i, 0)
+            rec.flush()
+            assert len(rec.events) == 100
+            rec.spill()
+            assert len(rec.events) == 0
+
+        rec.stop()
+
+    assert len(rec.events) == 300
+    assert [ev['x'] for ev in rec.events] == list(range(300))
+    assert os.listdir(str(tmp_path)) == []
+
+
+def _crash_log(path):
+    log = RecordingLog(str(path))
+    log.append(events(0, 3))
+    log._file.close()  # no end frame
+    return str(path)
+
+def test_logs_of_running_writers_are_not_offered(tmp_path):
+    mine = _crash_log(tmp_path / f"session-20240101-000000-{os.getpid()}.acpl")
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    dead = _crash_log(tmp_path / f"session-20240101-000000-{proc.pid}.acpl")
+    assert unfinished_logs(str(tmp_path)) == [dead]
+    assert sorted(unfinished_logs(str(tmp_path), include_live=True)) == sorted([mine, dead])
+
+def test_recovered_logs_are_pruned_after_max_age(tmp_path):
+    path = _crash_log(tmp_path / "s.acpl")
+    recording_log.mark_recovered(path)
+    assert unfinished_logs(str(tmp_path)) == []
+    assert recording_log.prune_recovered(str(tmp_path)) == 0
+    old = time.time() - recording_log.RECOVERED_MAX_AGE - 60
+    os.utime(path + recording_log.RECOVERED_EXT, (old, old))
+    assert recording_log.prune_recovered(str(tmp_path)) == 1
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,186 @@
+import sys
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src import text_entry
+from src.text_entry import ClipboardError, can_write, paste_text, type_text
+
+SAMPLES = ["Hello World!", "line one\n\tline two", "Café naïve", "你好, мир ✓"]
+
+
+class FakeKeyboard:
+    """Records what pynput would type; characters in `missing` have no key on the layout."""
+
+    class InvalidCharacterException(Exception):
+        pass
+
+    def __init__(self, missing=''):
+        self.missing = missing
+        self.typed = ''
+
+    def type(self, text):
+        for i, ch in enumerate(text):
+            if ch in self.missing:
+                raise self.InvalidCharacterException(i, ch)
+            self.typed += ch
+
+
+class FakeClipboard:
+    class PyperclipException(Exception):
+        pass
+
+    def __init__(self, content="previous"):
+        self.content = content
+        self.copies = []
+
+    def copy(self, text):
+        self.copies.append(text)
+        self.content = text
+
+    def paste(self):
+        return self.content
+
+
+@pytest.fixture
+def clipboard():
+    clip = FakeClipboard()
+    with patch.dict(sys.modules, {'pyperclip': clip}), patch('time.sleep'):
+        yield clip
+
+
+def make_gui(clip=None):
+    """pyautogui stand-in whose write() and Ctrl+V both end up in gui.typed."""
+    gui = MagicMock()
+    gui.typed = ''
+
+    def write(text, interval=0.0):
+        gui.typed += text
+
+    def hotkey(*keys):
+        gui.typed += clip.content
+
+    gui.write.side_effect = write
+    gui.hotkey.side_effect = hotkey
+    return gui
+
+
+def test_can_write():
+    assert can_write("Hello World!\n\t~")
+    assert not can_write("Café")
+    assert not can_write("你好")
+
+
+def test_interval_mode_uses_pyautogui_write():
+    gui, kb = make_gui(), FakeKeyboard()
+    result = type_text("Hello", 'interval', interval=0.05, keyboard=kb, gui=gui)
+    gui.write.assert_called_once_with("Hello", interval=0.05)
+    assert kb.typed == ''
+    assert result['chars'] == 5 and result['fallback'] is None
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+@pytest.mark.parametrize('mode', text_entry.MODES)
+def test_every_mode_types_text_exactly(mode, text, clipboard):
+    gui, kb = make_gui(clipboard), FakeKeyboard()
+    with patch('src.text_entry.wait_until', return_value=True):
+        result = type_text(text, mode, interval=0.001, cps=1000, keyboard=kb, gui=gui)
+    assert kb.typed + gui.typed == text
+    assert result['chars'] == len(text)
+    assert result['mode'] == mode
+
+
+def test_interval_mode_types_non_ascii_through_pynput_at_the_same_rate():
+    gui, kb = make_gui(), FakeKeyboard()
+    with patch('src.text_entry.wait_until', return_value=True) as wait:
+        result = type_text("Café", 'interval', interval=0.05, keyboard=kb, gui=gui)
+    gui.write.assert_not_called()
+    assert kb.typed == "Café"
+    assert result['fallback'] == 'rate'
+    deadlines = [c.args[0] for c in wait.call_args_list]
+    assert [round(b - a, 6) for a, b in zip(deadlines, deadlines[1:])] == [0.05, 0.05]
+
+
+def test_batched_mode_pastes_the_rest_after_an_untypable_character(clipboard):
+    gui, kb = make_gui(clipboard), FakeKeyboard(missing='你')
+    result = type_text("ok 你好", 'batched', keyboard=kb, gui=gui)
+    assert kb.typed == "ok "
+    assert gui.typed == "你好"
+    assert result['fallback'] == 'paste'
+    assert result['chars'] == 5
+
+
+def test_rate_mode_reports_the_index_in_the_whole_text(clipboard):
+    gui, kb = make_gui(clipboard), FakeKeyboard(missing='é')
+    with patch('src.text_entry.wait_until', return_value=True):
+        type_text("Café!", 'rate', cps=100, keyboard=kb, gui=gui)
+    assert (kb.typed, gui.typed) == ("Caf", "é!")
+
+
+def test_rate_mode_stops_between_characters():
+    kb = FakeKeyboard()
+    stop = threading.Event()
+    with patch('src.text_entry.wait_until', side_effect=[True, False]):
+        result = type_text("abcdef", 'rate', cps=10, keyboard=kb, stop_event=stop)
+    assert kb.typed == "ab"
+    assert result['chars'] == 2
+
+
+def test_paste_restores_previous_clipboard(clipboard):
+    gui = make_gui(clipboard)
+    paste_text("secret", gui, paste_delay=0)
+    assert gui.typed == "secret"
+    assert clipboard.content == "previous"
+    gui.hotkey.assert_called_once_with('command' if sys.platform == 'darwin' else 'ctrl', 'v')
+
+
+def test_paste_restores_clipboard_when_hotkey_fails(clipboard):
+    gui = make_gui(clipboard)
+    gui.hotkey.side_effect = RuntimeError("no display")
+    with pytest.raises(RuntimeError):
+        paste_text("secret", gui)
+    assert clipboard.content == "previous"
+
+
+def test_paste_refuses_to_erase_non_text_clipboard(clipboard):
+    clipboard.content = ''  # what pyperclip reads while an image is on the clipboard
+    gui = make_gui(clipboard)
+    with patch('src.text_entry._clipboard_empty', return_value=False):
+        with pytest.raises(ClipboardError):
+            type_text("secret", 'paste', gui=gui)
+    gui.hotkey.assert_not_called()
+    assert clipboard.copies == []
+
+
+@pytest.mark.parametrize('empty', [True, None])  # known empty, or the platform can't tell
+def test_paste_into_empty_clipboard_leaves_it_empty(clipboard, empty):
+    clipboard.content = ''
+    gui = make_gui(clipboard)
+    with patch('src.text_entry._clipboard_empty', return_value=empty):
+        paste_text("secret", gui, paste_delay=0)
+    assert gui.typed == "secret"
+    assert clipboard.content == ''
+
+
+@pytest.mark.parametrize('stdout, expected', [('', True), ('image/png\n', False), (OSError(), None)])
+def test_clipboard_empty_lists_formats(monkeypatch, stdout, expected):
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    monkeypatch.setenv('WAYLAND_DISPLAY', 'wayland-0')
+    run = MagicMock(side_effect=stdout) if isinstance(stdout, Exception) else MagicMock(return_value=MagicMock(stdout=stdout))
+    with patch('src.text_entry.subprocess.run', run):
+        assert text_entry._clipboard_empty() is expected
+    assert run.call_args.args[0] == ['wl-paste', '--list-types']
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        type_text("x", 'teleport')
+
+
+def test_result_reports_chars_per_second():
+    kb = FakeKeyboard()
+    with patch('src.text_entry.time.perf_counter', side_effect=[10.0, 10.5]):
+        result = type_text("x" * 100, 'batched', keyboard=kb)
+    assert result['seconds'] == 0.5
+    assert result['cps'] == 200.0
+    assert text_entry.format_typing_result(result) == "batched: 100 chars in 0.500s (200 chars/s)"
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.watchers import (
+    Frame, FrameStream, ImageWatcher, PixelWatcher, TimeoutWatcher, Watcher,
+    run_wait_any, wait_any,
+)
+
+
+def screen(color=(0, 0, 0), size=(20, 30)):
+    img = np.zeros(size + (3,), dtype=np.uint8)
+    img[:] = color
+    return img
+
+
+def test_frame_bgr_is_reversed_and_cached():
+    f = Frame(screen((10, 20, 30)))
+    assert tuple(f.bgr[0, 0]) == (30, 20, 10)
+    assert f.bgr is f.bgr
+
+
+def test_pixel_watcher_fires_when_color_appears():
+    frames = [screen(), screen(), screen((250, 0, 5))]
+    grab = MagicMock(side_effect=lambda: frames.pop(0) if len(frames) > 1 else frames[0])
+    hit = run_wait_any([PixelWatcher(3, 4, (255, 0, 0), tolerance=10)], grab, interval=0.01)
+    assert hit == (0, (3, 4))
+    assert grab.call_count >= 3
+
+
+def test_pixel_watcher_outside_the_frame_never_matches():
+    grab = MagicMock(return_value=screen((7, 7, 7)))
+    watchers = [PixelWatcher(-1, 0, (7, 7, 7), 0), PixelWatcher(0, 500, (7, 7, 7), 0), TimeoutWatcher(0.05)]
+    assert run_wait_any(watchers, grab, interval=0.01) == (2, True)
+
+
+def test_watcher_without_check_fails_on_construction():
+    class NoCheck(Watcher):
+        pass
+    with pytest.raises(TypeError):
+        NoCheck()
+
+
+def test_watchers_share_one_frame_stream():
+    grab = MagicMock(return_value=screen())
+    watchers = [PixelWatcher(1, 1, (255, 255, 255), 0), PixelWatcher(2, 2, (9, 9, 9), 0), TimeoutWatcher(0.2)]
+    i, _ = run_wait_any(watchers, grab, interval=0.02)
+    assert i == 2
+    # One grab per tick regardless of the number of image/pixel watchers
+    assert 3 <= grab.call_count <= 14
+
+
+def test_first_match_wins_and_lowest_index_on_ties():
+    grab = MagicMock(return_value=screen((7, 7, 7)))
+    watchers = [PixelWatcher(0, 0, (0, 0, 0), 0), PixelWatcher(0, 0, (7, 7, 7), 0), PixelWatcher(1, 1, (7, 7, 7), 0)]
+    assert run_wait_any(watchers, grab) == (1, (0, 0))
+
+
+def test_image_watcher_uses_template_matching():
+    with patch('src.watchers.match_template', return_value=(50, 60)) as match:
+        tpl = np.zeros((4, 4, 3), dtype=np.uint8)
+        hit = run_wait_any([ImageWatcher(tpl, 0.9)], MagicMock(return_value=screen()))
+    assert hit == (0, (50, 60))
+    _, template, confidence = match.call_args.args
+    assert template is tpl and confidence == 0.9
+
+
+def test_losers_are_cancelled():
+    cancelled = []
+
+    class Slow(TimeoutWatcher):
+        async def watch(self, stream):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+    hit = run_wait_any([Slow(10), TimeoutWatcher(0.01)], MagicMock())
+    assert hit == (1, True)
+    assert cancelled == [True]
+
+
+def test_stop_event_returns_none():
+    stop = threading.Event()
+    threading.Timer(0.05, stop.set).start()
+    start = time.perf_counter()
+    assert run_wait_any([TimeoutWatcher(10)], MagicMock(), stop) is None
+    assert time.perf_counter() - start < 1
+
+
+def test_grab_errors_are_raised():
+    grab = MagicMock(side_effect=OSError("no display"))
+    with pytest.raises(OSError):
+        run_wait_any([PixelWatcher(0, 0, (0, 0, 0))], grab)
@@ -0,0 +1,167 @@
+import pytest
+from unittest.mock import MagicMock
+
+from pynput.mouse import Button
+from src.workflow_compiler import (
+    compile_workflow, compile_step, WorkflowCompileError,
+    DelayStep, ClickStep, KeyPressStep, ClickImageStep
+)
+
+def test_compiles_typed_steps():
+    loader = MagicMock(return_value='IMG')
+    steps = compile_workflow([
+        {'action': 'Delay', 'params': {'duration': '250'}},
+        {'action': 'Click', 'params': {'x': 10.0, 'y': '20', 'button': 'right', 'type': 'double'}},
+        {'action': 'Key Press', 'params': {'key': 'Windows + R'}},
+        {'action': 'Click Image', 'params': {'image_path': 'a.png', 'timeout': 3, 'confidence': 0.9}},
+    ], loader=loader)
+
+    delay, click, key, img = steps
+    assert isinstance(delay, DelayStep) and delay.seconds == 0.25
+    assert isinstance(click, ClickStep)
+    assert (click.x, click.y, click.button, click.clicks) == (10, 20, Button.right, 2)
+    assert isinstance(key, KeyPressStep) and key.keys == ('win', 'r')
+    assert isinstance(img, ClickImageStep)
+    assert (img.template, img.timeout, img.confidence, img.button) == ('IMG', 3.0, 0.9, Button.left)
+
+def test_reports_every_error_up_front():
+    loader = MagicMock(return_value=None)
+    with pytest.raises(WorkflowCompileError) as exc:
+        compile_workflow([
+            {'action': 'Delay', 'params': {'duration': 'soon'}},
+            {'action': 'Click', 'params': {'x': 1, 'y': 2}},
+            {'action': 'Click', 'params': {'button': 'thumb'}},
+            {'action': 'Wait Image', 'params': {'image_path': 'missing.png', 'confidence': 3}},
+            {'action': 'Teleport', 'params': {}},
+        ], loader=loader)
+
+    errors = exc.value.errors
+    assert [i for i, _, _ in errors] == [0, 2, 3, 3, 4]
+    assert "cannot read image 'missing.png'" in str(exc.value)
+    assert "Step 5 (Teleport)" in str(exc.value)
+
+def test_templates_loaded_once_and_cached():
+    loader = MagicMock(return_value='IMG')
+    templates = {}
+    raw = [{'action': 'Wait Image', 'params': {'image_path': 'same.png'}}] * 3
+    compile_workflow(raw, templates, loader)
+    compile_workflow(raw, templates, loader)
+    loader.assert_called_once_with('same.png')
+    assert templates == {'same.png': (None, 'IMG')}
+
+def test_changed_template_file_is_reloaded(tmp_path):
+    path = tmp_path / 'button.png'
+    path.write_bytes(b'old')
+    loader = MagicMock(side_effect=['OLD', 'NEW'])
+    on_reload = MagicMock()
+    templates = {}
+    raw = [{'action': 'Wait Image', 'params': {'image_path': str(path)}}]
+    assert compile_workflow(raw, templates, loader, on_reload)[0].template == 'OLD'
+    assert compile_workflow(raw, templates, loader, on_reload)[0].template == 'OLD'
+    on_reload.assert_not_called()
+
+    path.write_bytes(b'recaptured')
+    assert compile_workflow(raw, templates, loader, on_reload)[0].template == 'NEW'
+    on_reload.assert_called_once_with(str(path))
+    assert loader.call_count == 2
+
+def test_compile_step_raises_for_bad_step():
+    with pytest.raises(WorkflowCompileError):
+        compile_step({'action': 'Delay', 'params': {'duration': 'soon'}})
+
+def test_empty_key_text_and_prompt_compile_to_no_ops():
+    assert compile_step({'action': 'Type Text', 'params': {'text': ' '}}).text == ' '
+    assert compile_step({'action': 'Type Text', 'params': {'text': ''}}).text == ''
+    assert compile_step({'action': 'Key Press', 'params': {'key': ''}}).keys == ()
+    assert compile_step({'action': 'AI Action', 'params': {}}).prompt == ''
+
+def test_type_text_params():
+    step = compile_step({'action': 'Type Text', 'params': {'text': 'hi'}})
+    assert (step.mode, step.interval, step.cps) == ('interval', 0.05, 20)
+    step = compile_step({'action': 'Type Text', 'params': {'text': 'hi', 'mode': 'rate', 'cps': 150}})
+    assert (step.mode, step.cps) == ('rate', 150)
+    with pytest.raises(WorkflowCompileError) as e:
+        compile_step({'action': 'Type Text', 'params': {'text': 'hi', 'mode': 'telepathy'}})
+    assert 'mode must be one of interval, batched, rate, paste' in str(e.value)
+
+def test_settle_params():
+    step = compile_step({'action': 'Click', 'params': {'settle': 'stable', 'settle_ms': 500}})
+    assert (step.settle, step.settle_time) == ('stable', 0.5)
+    step = compile_step({'action': 'Click', 'params': {'settle': 'fixed'}})
+    assert (step.settle, step.settle_time) == ('fixed', 0.1)
+    step = compile_step({'action': 'Click', 'params': {'settle': 'default', 'settle_ms': 500}})
+    assert step.settle is None
+
+def test_invalid_settle_reported():
+    with pytest.raises(WorkflowCompileError) as e:
+        compile_step({'action': 'Key Press', 'params': {'key': 'a', 'settle': 'later'}})
+    assert 'settle must be one of' in str(e.value)
+
+def test_links_loops_ifs_and_gotos():
+    loader = MagicMock(return_value='IMG')
+    steps = compile_workflow([
+        {'action': 'Label', 'params': {'name': 'top'}},                 # 0
+        {'action': 'Loop', 'params': {'count': 3}},                     # 1
+        {'action': 'If Image', 'params': {'image_path': 'a.png'}},      # 2
+        {'action': 'Key Press', 'params': {'key': 'a'}},                # 3
+        {'action': 'Else', 'params': {}},                               # 4
+        {'action': 'Key Press', 'params': {'key': 'b'}},                # 5
+        {'action': 'End If', 'params': {}},                             # 6
+        {'action': 'End Loop', 'params': {}},                           # 7
+        {'action': 'If Pixel', 'params': {'color': '#FF8000', 'when': 'differs'}},  # 8
+        {'action': 'Goto', 'params': {'label': 'top'}},                 # 9
+        {'action': 'End If', 'params': {}},                             # 10
+    ], loader=loader)
+    assert (steps[1].count, steps[1].end) == (3, 7)
+    assert (steps[7].start, steps[7].count) == (1, 3)
+    assert steps[2].target == 5 and steps[4].target == 7
+    assert steps[8].target == 11 and steps[8].color == (255, 128, 0) and steps[8].negate
+    assert steps[9].target == 0
+
+def test_reports_broken_structure():
+    with pytest.raises(WorkflowCompileError) as exc:
+        compile_workflow([
+            {'action': 'End If', 'params': {}},
+            {'action': 'Loop', 'params': {'count': 2}},
+            {'action': 'If Pixel', 'params': {'color': '1,2,3'}},
+            {'action': 'End Loop', 'params': {}},
+            {'action': 'Goto', 'params': {'label': 'nowhere'}},
+            {'action': 'Label', 'params': {'name': 'x'}},
+            {'action': 'Label', 'params': {'name': 'x'}},
+        ])
+    text = str(exc.value)
+    assert "Step 1 (End If): End If without a matching If" in text
+    assert "Step 4 (End Loop): End Loop closes If Pixel at step 3" in text
+    assert "unknown label 'nowhere'" in text
+    assert "label 'x' already defined at step 6" in text
+    assert "Step 2 (Loop): Loop is never closed" in text
+    assert [i for i, _, _ in exc.value.errors] == sorted(i for i, _, _ in exc.value.errors)
+
+def test_wait_any_spec_and_targets():
+    loader = MagicMock(return_value='IMG')
+    steps = compile_workflow([
+        {'action': 'Wait Any', 'params': {
+            'watch': 'ok.png -> done; pixel 10,20 #FF0000 -> failed\nother.png',
+            'timeout': 3, 'timeout_label': 'failed'}},
+        {'action': 'Label', 'params': {'name': 'done'}},
+        {'action': 'Label', 'params': {'name': 'failed'}},
+    ], loader=loader)
+    step = steps[0]
+    assert [type(w).__name__ for w in step.watchers] == ['ImageWatcher', 'PixelWatcher', 'ImageWatcher', 'TimeoutWatcher']
+    assert step.targets == [1, 2, None, 2]
+    pixel = step.watchers[1]
+    assert (pixel.x, pixel.y, pixel.color) == (10, 20, (255, 0, 0))
+    assert step.watchers[-1].seconds == 3.0
+
+def test_wait_any_errors():
+    with pytest.raises(WorkflowCompileError) as exc:
+        compile_workflow([
+            {'action': 'Wait Any', 'params': {'watch': ''}},
+            {'action': 'Wait Any', 'params': {'watch': [{'x': 1, 'y': 1, 'color': 'red', 'label': 'nope'}]}},
+            {'action': 'Wait Any', 'params': {'watch': 'pixel -5,20 #FF0000'}},
+        ])
+    text = str(exc.value)
+    assert "watch needs at least one image or pixel" in text
+    assert "color must be #RRGGBB or r,g,b, got 'red'" in text
+    assert "unknown label 'nope'" in text
+    assert "x must be at least 0, got -5" in text
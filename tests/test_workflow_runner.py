@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import MagicMock, patch
+import os
 import threading
 import time
 
@@ -10,6 +11,7 @@ from pynput.mouse import Button
 def mock_dependencies():
     with patch('src.workflow_runner.pyautogui') as mock_pyautogui, \
          patch('src.workflow_runner.cv2') as mock_cv2, \
+         patch('src.vision.cv2', mock_cv2), \
          patch('src.workflow_runner.MouseController') as mock_mouse, \
          patch('time.sleep') as mock_sleep:
         yield {
@@ -87,6 +89,32 @@ def test_execute_type_text_action(runner, mock_dependencies):
     runner.execute_step(step)
     mock_dependencies['pyautogui'].write.assert_called_once_with('Hello World!', interval=0.05)
 
+def test_empty_fields_are_no_ops(runner, mock_dependencies):
+    runner.set_steps([
+        {'action': 'Key Press', 'params': {'key': ''}},
+        {'action': 'Type Text', 'params': {'text': ''}},
+        {'action': 'AI Action', 'params': {'prompt': ''}},
+        {'action': 'Type Text', 'params': {'text': ' '}},
+    ])
+    runner.run()
+    pg = mock_dependencies['pyautogui']
+    assert not pg.press.called and not pg.hotkey.called and runner._ai is None
+    pg.write.assert_called_once_with(' ', interval=0.05)
+    assert runner.errors == []
+
+def test_type_text_modes_use_step_settings(runner, mock_dependencies):
+    runner.keyboard = MagicMock()
+    runner.execute_step({'action': 'Type Text', 'params': {'text': 'abc', 'interval': 0}})
+    mock_dependencies['pyautogui'].write.assert_called_once_with('abc', interval=0.0)
+    runner.execute_step({'action': 'Type Text', 'params': {'text': 'Grüße', 'mode': 'batched'}})
+    runner.keyboard.type.assert_called_once_with('Grüße')
+
+def test_type_text_profiles_characters(runner, mock_dependencies):
+    runner.keyboard = MagicMock()
+    runner.set_steps([{'action': 'Type Text', 'params': {'text': 'x' * 40, 'mode': 'batched'}}])
+    runner.run()
+    assert runner.profiler.step_totals()[0]['chars'] == 40
+
 @patch('time.time')
 def test_wait_image_action_success(mock_time, runner, mock_dependencies):
     """Test Wait Image succeeds when image is found within timeout."""
@@ -139,3 +167,305 @@ def test_find_image(runner, mock_dependencies):
     
     # Found pos = loc + (w/2, h/2) = (100 + 50, 100 + 25) = (150, 125)
     assert res == (150, 125)
+
+def test_run_refuses_invalid_workflow(runner, mock_dependencies):
+    """Compile errors stop the run before any step executes."""
+    runner.set_steps([
+        {'action': 'Click', 'params': {'x': 1, 'y': 1}},
+        {'action': 'Delay', 'params': {'duration': 'abc'}},
+    ])
+    runner.run()
+    runner.mouse.click.assert_not_called()
+    assert not runner.running
+
+def test_ai_controller_created_once_per_run(runner, mock_dependencies):
+    runner.set_steps([{'action': 'AI Action', 'params': {'prompt': 'Open Notepad'}}] * 2)
+    with patch('src.ai_controller.AIController') as mock_ai:
+        runner.run()
+    mock_ai.assert_called_once_with(runner.api_key, runner.stop_event)
+    assert mock_ai.return_value.execute_prompt.call_count == 2
+
+def test_key_press_chain_runs_back_to_back(runner, mock_dependencies):
+    """Under the default 'auto' policy only clicks settle; keys have no dead time."""
+    runner.stop_event.wait = MagicMock(return_value=False)
+    runner.set_steps([{'action': 'Key Press', 'params': {'key': 'tab'}}] * 5)
+    runner.run()
+    assert mock_dependencies['pyautogui'].press.call_count == 5
+    runner.stop_event.wait.assert_not_called()
+    mock_dependencies['sleep'].assert_not_called()
+    assert runner.stats['steps'] == 5
+    assert runner.stats['dead_time'] < 0.05
+
+def test_settle_after_click_but_not_after_last_step(runner, mock_dependencies):
+    runner.stop_event.wait = MagicMock(return_value=False)
+    runner.set_steps([{'action': 'Click', 'params': {'x': 1, 'y': 1}}] * 3)
+    runner.run()
+    assert runner.stop_event.wait.call_count == 2
+    runner.stop_event.wait.assert_called_with(0.1)
+
+def test_step_settle_overrides_workflow_policy(runner, mock_dependencies):
+    runner.stop_event.wait = MagicMock(return_value=False)
+    runner.settle, runner.settle_time = 'fixed', 0.25
+    runner.set_steps([
+        {'action': 'Key Press', 'params': {'key': 'a'}},
+        {'action': 'Key Press', 'params': {'key': 'b', 'settle': 'none'}},
+        {'action': 'Key Press', 'params': {'key': 'c', 'settle': 'fixed', 'settle_ms': 40}},
+        {'action': 'Key Press', 'params': {'key': 'd'}},
+    ])
+    runner.run()
+    assert [c.args for c in runner.stop_event.wait.call_args_list] == [(0.25,), (0.04,)]
+
+def test_stable_settle_waits_for_matching_frames(runner, mock_dependencies):
+    import numpy as np
+    busy = [np.full((64, 64, 3), v, dtype=np.uint8) for v in (0, 80, 160)]
+    still = np.full((64, 64, 3), 200, dtype=np.uint8)
+    mock_dependencies['pyautogui'].screenshot.side_effect = busy + [still, still, still]
+    runner.stop_event.wait = MagicMock(return_value=False)
+    assert runner._wait_stable(time.perf_counter() + 10)
+    assert mock_dependencies['pyautogui'].screenshot.call_count == 5
+
+def test_stable_settle_gives_up_at_deadline(runner, mock_dependencies):
+    import numpy as np
+    frames = iter(np.full((16, 16), v % 256, dtype=np.uint8) for v in range(0, 10000, 50))
+    mock_dependencies['pyautogui'].screenshot.side_effect = lambda: next(frames)
+    runner.stop_event.wait = MagicMock(return_value=False)
+    assert not runner._wait_stable(time.perf_counter() - 1)
+    assert mock_dependencies['pyautogui'].screenshot.call_count == 2
+
+def test_loop_runs_body_count_times_and_reports_counters(runner, mock_dependencies):
+    seen = []
+    runner.highlight_callback = lambda i, loops: seen.append((i, loops))
+    runner.set_steps([
+        {'action': 'Loop', 'params': {'count': 2}},
+        {'action': 'Loop', 'params': {'count': 3}},
+        {'action': 'Key Press', 'params': {'key': 'a'}},
+        {'action': 'End Loop', 'params': {}},
+        {'action': 'End Loop', 'params': {}},
+        {'action': 'Key Press', 'params': {'key': 'b'}},
+    ])
+    runner.run()
+    presses = [c.args[0] for c in mock_dependencies['pyautogui'].press.call_args_list]
+    assert presses == ['a'] * 6 + ['b']
+    assert [loops for i, loops in seen if i == 2] == [
+        [(o, 2), (n, 3)] for o in (1, 2) for n in (1, 2, 3)]
+    assert seen[-1] == (5, [])
+
+def test_if_image_branches(runner, mock_dependencies):
+    mock_dependencies['cv2'].imread.return_value = MagicMock()
+    runner._find_image = MagicMock(side_effect=[(1, 1), None])
+    steps = [
+        {'action': 'If Image', 'params': {'image_path': 'ok.png'}},
+        {'action': 'Key Press', 'params': {'key': 'y'}},
+        {'action': 'Else', 'params': {}},
+        {'action': 'Key Press', 'params': {'key': 'n'}},
+        {'action': 'End If', 'params': {}},
+    ]
+    runner.set_steps(steps + steps)
+    runner.run()
+    presses = [c.args[0] for c in mock_dependencies['pyautogui'].press.call_args_list]
+    assert presses == ['y', 'n']
+
+def test_if_pixel_and_goto(runner, mock_dependencies):
+    # Pixel turns red on the third check; Goto retries until then
+    mock_dependencies['pyautogui'].pixel.side_effect = [(0, 0, 0), (5, 5, 5), (250, 3, 0)]
+    runner.set_steps([
+        {'action': 'Label', 'params': {'name': 'retry'}},
+        {'action': 'Key Press', 'params': {'key': 'r'}},
+        {'action': 'If Pixel', 'params': {'x': 5, 'y': 6, 'color': '#FF0000', 'when': 'differs'}},
+        {'action': 'Goto', 'params': {'label': 'retry'}},
+        {'action': 'End If', 'params': {}},
+    ])
+    runner.run()
+    assert mock_dependencies['pyautogui'].press.call_count == 3
+    mock_dependencies['pyautogui'].pixel.assert_called_with(5, 6)
+
+def test_goto_out_of_loop_drops_its_counter(runner, mock_dependencies):
+    seen = []
+    runner.highlight_callback = lambda i, loops: seen.append((i, loops))
+    runner.set_steps([
+        {'action': 'Loop', 'params': {'count': 0}},
+        {'action': 'Goto', 'params': {'label': 'out'}},
+        {'action': 'End Loop', 'params': {}},
+        {'action': 'Label', 'params': {'name': 'out'}},
+    ])
+    runner.run()
+    assert seen == [(0, []), (1, [(1, 0)]), (3, [])]
+
+def test_wait_any_jumps_to_matched_label(runner, mock_dependencies):
+    import numpy as np
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    frame[2, 3] = (0, 255, 0)
+    mock_dependencies['pyautogui'].screenshot.return_value = frame
+    runner.set_steps([
+        {'action': 'Wait Any', 'params': {'watch': 'pixel 3,2 #FF0000 -> red; pixel 3,2 #00FF00 -> green', 'timeout': 5}},
+        {'action': 'Label', 'params': {'name': 'red'}},
+        {'action': 'Key Press', 'params': {'key': 'r'}},
+        {'action': 'Label', 'params': {'name': 'green'}},
+        {'action': 'Key Press', 'params': {'key': 'g'}},
+    ])
+    runner.run()
+    presses = [c.args[0] for c in mock_dependencies['pyautogui'].press.call_args_list]
+    assert presses == ['g']
+    assert runner.last_match == ('pixel 3,2', (3, 2))
+
+def test_wait_any_timeout_falls_through(runner, mock_dependencies, capsys):
+    import numpy as np
+    mock_dependencies['pyautogui'].screenshot.return_value = np.zeros((4, 4, 3), dtype=np.uint8)
+    runner.set_steps([
+        {'action': 'Wait Any', 'params': {'watch': 'pixel 1,1 #FFFFFF', 'timeout': 0.05}},
+        {'action': 'Key Press', 'params': {'key': 'x'}},
+    ])
+    runner.run()
+    mock_dependencies['pyautogui'].press.assert_called_once_with('x')
+    assert runner.last_match == ('timeout', True)
+    assert "nothing matched within 0.05s" in capsys.readouterr().out
+
+def test_run_profiles_each_step(runner, mock_dependencies):
+    runner._find_image = MagicMock(side_effect=[None, None, (1, 1)])
+    mock_dependencies['cv2'].imread.return_value = MagicMock()
+    runner.set_steps([
+        {'action': 'Key Press', 'params': {'key': 'a'}},
+        {'action': 'Wait Image', 'params': {'image_path': 'x.png', 'timeout': 60}},
+    ])
+    runner.run()
+    totals = runner.profiler.step_totals()
+    assert totals[0]['runs'] == 1 and 'inject' in totals[0]
+    assert totals[1]['polls'] == 3
+    trace = runner.profiler.to_chrome_trace()
+    assert [e['name'] for e in trace['traceEvents'] if e.get('cat') == 'step'] == ['1. Key Press', '2. Wait Image']
+
+def test_click_image_uses_cached_location(runner, mock_dependencies):
+    import cv2 as real_cv2
+    import numpy as np
+    rng = np.random.default_rng(7)
+    screen = rng.integers(0, 40, (200, 300, 3), dtype=np.uint8)
+    button = rng.integers(100, 255, (10, 20, 3), dtype=np.uint8)
+    screen[50:60, 70:90] = button
+
+    def screenshot(region=None):
+        if region is None: return screen
+        left, top, w, h = region
+        return screen[top:top + h, left:left + w]
+
+    pg = mock_dependencies['pyautogui']
+    pg.screenshot.side_effect = screenshot
+    pg.size.return_value = (300, 200)
+    mock_cv2 = mock_dependencies['cv2']
+    for name in ('cvtColor', 'matchTemplate', 'minMaxLoc', 'COLOR_RGB2BGR', 'TM_CCOEFF_NORMED'):
+        setattr(mock_cv2, name, getattr(real_cv2, name))
+    mock_cv2.imread.return_value = np.ascontiguousarray(button[..., ::-1])
+
+    runner.set_steps([
+        {'action': 'Loop', 'params': {'count': 5}},
+        {'action': 'Click Image', 'params': {'image_path': 'btn.png', 'timeout': 5, 'confidence': 0.9}},
+        {'action': 'End Loop', 'params': {}},
+    ])
+    runner.run()
+    assert runner.mouse.click.call_count == 5
+    assert runner.mouse.position == (80, 55)
+    full = [c for c in pg.screenshot.call_args_list if not c.kwargs]
+    assert len(full) == 1  # only the first iteration searched the whole screen
+    assert (runner.stats['cache_hits'], runner.stats['cache_misses']) == (4, 0)
+    assert runner.profiler.step_totals()[1]['cache_hits'] == 4
+    from src.workflow_runner import format_run_stats
+    assert "image location cache 4/4 hits" in format_run_stats(runner.stats)
+
+LOOPED = [
+    {'action': 'Loop', 'params': {'count': 3}},
+    {'action': 'Key Press', 'params': {'key': 'a'}},
+    {'action': 'Key Press', 'params': {'key': 'b'}},
+    {'action': 'End Loop', 'params': {}},
+    {'action': 'Key Press', 'params': {'key': 'c'}},
+]
+
+def test_stopped_run_resumes_at_interrupted_step(runner, mock_dependencies, tmp_path):
+    runner.checkpoint_dir = str(tmp_path)
+    runner.set_steps(LOOPED)
+    presses = []
+    def press(key):
+        presses.append(key)
+        if presses == ['a', 'b', 'a', 'b']: runner.stop_event.set()  # F6 during the second 'b'
+    mock_dependencies['pyautogui'].press.side_effect = press
+    runner.run()
+    saved = runner.saved_checkpoint()
+    assert (saved['pc'], saved['loops']) == (2, [[0, 2, 3]])
+
+    runner.stop_event.clear()
+    presses.clear()
+    runner.run(resume=True)
+    assert presses == ['b', 'a', 'b', 'c']
+    assert runner.stats['resumed_at'] == 2
+    assert runner.saved_checkpoint() is None  # finished runs leave no checkpoint
+    assert os.listdir(tmp_path) == []
+
+def test_crashed_run_resumes_from_periodic_checkpoint(runner, mock_dependencies, tmp_path):
+    runner.checkpoint_dir = str(tmp_path)
+    runner.set_steps(LOOPED)
+    runner.locations.store('btn.png', 10, 20, 30, 40, 0.95, (0, 0, 800, 600))
+    def press(key):
+        if key == 'c': raise KeyboardInterrupt  # the process dies mid-step
+    mock_dependencies['pyautogui'].press.side_effect = press
+    with patch('src.checkpoint.CheckpointWriter.due', return_value=True), pytest.raises(KeyboardInterrupt):
+        runner.run()
+
+    fresh = WorkflowRunner(threading.Event())
+    fresh.checkpoint_dir = str(tmp_path)
+    fresh.set_steps(LOOPED)
+    mock_dependencies['pyautogui'].press.side_effect = None
+    mock_dependencies['pyautogui'].press.reset_mock()
+    fresh.run(resume=True)
+    assert [c.args[0] for c in mock_dependencies['pyautogui'].press.call_args_list] == ['c']
+    entry = fresh.locations.get('btn.png')
+    assert (entry.x, entry.y, entry.window) == (10, 20, (0, 0, 800, 600))
+
+def test_resume_ignores_checkpoint_of_edited_workflow(runner, mock_dependencies, tmp_path):
+    runner.checkpoint_dir = str(tmp_path)
+    runner.set_steps(LOOPED)
+    mock_dependencies['pyautogui'].press.side_effect = lambda key: runner.stop_event.set()
+    runner.run()
+    runner.stop_event.clear()
+    mock_dependencies['pyautogui'].press.side_effect = None
+    runner.set_steps(LOOPED[:-1])
+    runner.run(resume=True)
+    assert runner.stats['resumed_at'] is None
+    assert mock_dependencies['pyautogui'].press.call_count == 7  # 1 before the stop + 6
+
+def test_checkpoint_overhead_is_measured(runner, mock_dependencies, tmp_path):
+    runner.checkpoint_dir = str(tmp_path)
+    runner.set_steps(LOOPED)
+    with patch('src.checkpoint.CheckpointWriter.due', return_value=True):
+        runner.run()
+    assert runner.stats['checkpoints'] == 10  # after every step but the last
+    assert runner.stats['checkpoint_time'] > 0
+    from src.workflow_runner import format_run_stats
+    assert "10 checkpoint(s) in" in format_run_stats(runner.stats)
+
+def test_recaptured_template_drops_cached_location(runner, mock_dependencies, tmp_path):
+    path = tmp_path / 'btn.png'
+    path.write_bytes(b'v1')
+    mock_dependencies['cv2'].imread.side_effect = ['OLD', 'NEW']
+    runner.set_steps([{'action': 'Click Image', 'params': {'image_path': str(path)}}])
+    runner.compile()
+    runner.locations.store(str(path), 1, 2, 3, 4, 0.9)
+    runner.compile()
+    assert runner.locations.get(str(path)) is not None
+    path.write_bytes(b'version 2')
+    assert runner.compile()[0].template == 'NEW'
+    assert runner.locations.get(str(path)) is None
+
+def test_failed_cache_check_falls_back_to_full_search(runner, mock_dependencies):
+    pg, mock_cv2 = mock_dependencies['pyautogui'], mock_dependencies['cv2']
+    template = MagicMock(shape=(10, 20, 3))
+    runner.locations.store('btn.png', 100, 100, 20, 10, 0.99)
+
+    def screenshot(region=None):
+        if region is not None: raise OSError("region outside the screen")
+        return MagicMock()
+    pg.screenshot.side_effect = screenshot
+    pg.size.return_value = (1920, 1080)
+    mock_cv2.minMaxLoc.return_value = (None, 0.95, None, (40, 50))
+
+    assert runner._find_image('btn.png', 0.9, template) == (50, 55)
+    entry = runner.locations.get('btn.png')
+    assert (entry.x, entry.y) == (40, 50)  # re-cached from the full search
+    assert (runner.locations.hits, runner.locations.misses) == (0, 1)